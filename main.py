@@ -2,13 +2,15 @@
 PsicolaRG - Sistema de Gestión para Psicólogos
 Aplicación de escritorio para gestión de pacientes, sesiones y análisis con IA
 """
+from src.ui.tiempos_arranque import tiempos_arranque  # Primero: marca el inicio del arranque
 import sys
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication
-from src.ui.main_window import MainWindow
 from src.ui.login_dialog import LoginDialog, ConfigurarPasswordDialog
 from src.services.security_service import security_service
 
 def main():
+    tiempos_arranque.marcar('importaciones')
     app = QApplication(sys.argv)
     app.setApplicationName("PsicolaRG")
     app.setOrganizationName("PsicolaRG")
@@ -16,6 +18,9 @@ def main():
     # Inicializar seguridad
     security_service.inicializar_seguridad()
     
+    # El primer diálogo que se muestre marca el login (se dispara al entrar a su bucle)
+    QTimer.singleShot(0, lambda: tiempos_arranque.marcar('login'))
+    
     # Verificar si hay contraseña configurada
     if not security_service.password_configurado():
         # Primera vez: configurar contraseña
@@ -28,10 +33,22 @@ def main():
     if dialogo_login.exec() != 1 or not dialogo_login.autenticado:
         return 0
     
-    # Usuario autenticado correctamente
+    # Usuario autenticado correctamente; la ventana principal (y la base de
+    # datos, los controladores y las vistas) se importa recién ahora
+    tiempos_arranque.marcar('autenticado')
+    from src.database.db_manager import db
+    from src.ui.main_window import MainWindow
+    
     window = MainWindow()
+    tiempos_arranque.marcar('ventana')
     window.show()
     
+    def dashboard_visible():
+        tiempos_arranque.marcar('dashboard')
+        tiempos_arranque.finalizar(db.directorio_datos / 'logs' / 'arranque.log')
+    
+    QTimer.singleShot(0, dashboard_visible)
+    
     sys.exit(app.exec())
 
 if __name__ == "__main__":
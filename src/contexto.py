@@ -0,0 +1,171 @@
+"""
+Contexto de aplicación
+Reúne la base de datos y los servicios de seguridad, backup e IA de una
+instancia de la aplicación, con sus rutas explícitas. Cada servicio se crea
+la primera vez que se usa, y ninguno toca el disco al crearse: los
+directorios se crean al escribir en ellos.
+
+Los nombres globales de siempre (db, security_service, backup_service,
+ia_service) delegan en el contexto actual, así los controladores no cambian.
+Para trabajar sobre otra instancia (un benchmark junto a la base real, una
+base temporal) se usa otro contexto:
+
+    with usar_contexto(ContextoAplicacion.en_directorio(tmp)) as contexto:
+        contexto.db.connect()
+        PacienteController.obtener_todos_pacientes()
+"""
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class ContextoAplicacion:
+    """
+    Base de datos y servicios de una instancia de la aplicación
+    
+    Attributes:
+        db_path: Archivo de la base de datos
+        directorio_config: Clave de cifrado y contraseña maestra
+        directorio_backups: Backups y su configuración
+        directorio_cache_llm: Respuestas guardadas del LLM
+    """
+    
+    def __init__(self, db_path="data/psicolarg.db", directorio_config="config",
+                 directorio_backups="backups", directorio_cache_llm=None, gestor=None):
+        """
+        Args:
+            db_path: Archivo de la base de datos
+            directorio_config: Directorio de la clave y la contraseña
+            directorio_backups: Directorio de los backups
+            directorio_cache_llm: Directorio de la caché del LLM (por
+                defecto llm_cache en el directorio de datos de la base)
+            gestor: DatabaseManager ya creado (por ejemplo una base en
+                memoria); si se indica, reemplaza a db_path. Con una base en
+                memoria los backups se crean con la API de backup de SQLite,
+                pero no se pueden restaurar sobre ella
+        """
+        if gestor is not None:
+            db_path = gestor.db_path
+            directorio_datos = gestor.directorio_datos
+        else:
+            directorio_datos = Path(db_path).parent
+        self.db_path = Path(db_path)
+        self.directorio_config = Path(directorio_config)
+        self.directorio_backups = Path(directorio_backups)
+        self.directorio_cache_llm = Path(directorio_cache_llm or directorio_datos / 'llm_cache')
+        self._servicios = {} if gestor is None else {'db': gestor}
+        self._lock = threading.RLock()
+    
+    @classmethod
+    def en_directorio(cls, raiz):
+        """
+        Contexto con todas sus rutas bajo un directorio
+        
+        Args:
+            raiz: Directorio con la misma estructura que la instalación
+                (data/, config/ y backups/)
+        """
+        raiz = Path(raiz)
+        return cls(raiz / 'data' / 'psicolarg.db', raiz / 'config', raiz / 'backups')
+    
+    def _servicio(self, nombre, crear):
+        servicio = self._servicios.get(nombre)
+        if servicio is None:
+            with self._lock:
+                servicio = self._servicios.get(nombre)
+                if servicio is None:
+                    servicio = self._servicios[nombre] = crear()
+        return servicio
+    
+    @property
+    def db(self):
+        """DatabaseManager de este contexto (sin conectar hasta llamar a connect)"""
+        from src.database.db_manager import DatabaseManager
+        return self._servicio('db', lambda: DatabaseManager(str(self.db_path)))
+    
+    @property
+    def seguridad(self):
+        """SecurityService de este contexto"""
+        from src.services.security_service import SecurityService
+        return self._servicio('seguridad', lambda: SecurityService(self.directorio_config))
+    
+    @property
+    def backup(self):
+        """BackupService de este contexto (usa su base y su clave)"""
+        from src.services.backup_service import BackupService
+        return self._servicio('backup', lambda: BackupService(
+            self.db_path, self.directorio_backups, seguridad=self.seguridad, gestor=self.db
+        ))
+    
+    @property
+    def ia(self):
+        """IAAnalysisService de este contexto"""
+        from src.services.ia_analysis_service import IAAnalysisService
+        return self._servicio('ia', lambda: IAAnalysisService(self.directorio_cache_llm))
+    
+    def cerrar(self):
+        """Desconecta la base si se llegó a crear"""
+        gestor = self._servicios.get('db')
+        if gestor is not None and gestor.conectado:
+            gestor.disconnect()
+
+
+class Delegado:
+    """
+    Nombre global que delega atributos (lectura y asignación) en un
+    servicio del contexto actual
+    
+    El servicio se busca en cada acceso, así un cambio de contexto
+    (usar_contexto) alcanza también a quien importó el nombre antes.
+    """
+    
+    def __init__(self, servicio: str):
+        """
+        Args:
+            servicio: Propiedad de ContextoAplicacion ('db', 'seguridad', ...)
+        """
+        object.__setattr__(self, '_servicio', servicio)
+    
+    def __getattr__(self, nombre):
+        return getattr(getattr(_actual, self._servicio), nombre)
+    
+    def __setattr__(self, nombre, valor):
+        setattr(getattr(_actual, self._servicio), nombre, valor)
+    
+    def __repr__(self):
+        return f"<Delegado de contexto.{self._servicio}>"
+
+
+def contexto_actual() -> ContextoAplicacion:
+    """Contexto en el que delegan los nombres globales"""
+    return _actual
+
+
+def activar_contexto(contexto: ContextoAplicacion) -> ContextoAplicacion:
+    """
+    Cambia el contexto en el que delegan los nombres globales
+    
+    Returns:
+        El contexto que estaba activo
+    """
+    global _actual
+    anterior, _actual = _actual, contexto
+    return anterior
+
+
+@contextmanager
+def usar_contexto(contexto: ContextoAplicacion):
+    """
+    Activa un contexto durante el bloque y luego restaura el anterior
+    
+    Al salir se desconecta la base del contexto usado.
+    """
+    anterior = activar_contexto(contexto)
+    try:
+        yield contexto
+    finally:
+        activar_contexto(anterior)
+        contexto.cerrar()
+
+# Contexto por defecto: rutas relativas al directorio de trabajo
+_actual = ContextoAplicacion()
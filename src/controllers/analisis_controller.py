@@ -0,0 +1,372 @@
+"""
+Controlador de Análisis
+Guarda y recupera los análisis de IA de cada sesión (tabla analisis_ia)
+"""
+import hashlib
+import json
+from itertools import groupby
+from src.database.db_manager import DatabaseManager, db
+from src.models.sesion import Sesion
+from src.services.metricas import metricas, cache_metricas
+from src.controllers.sesion_controller import SesionController
+from src.controllers.corpus_controller import CorpusController
+from src.services.ia_analysis_service import ia_service
+from src.services.series_sentimiento import VALORES_SENTIMIENTO, analizar_series
+
+@metricas.instrumentar_controlador
+class AnalisisController:
+    
+    TIPO_SESION = 'sesion'
+    TIPO_LONGITUDINAL = 'longitudinal'
+    TIPO_HISTORIA = 'resumen_historia'
+    
+    _BORRAR_ANALISIS = 'DELETE FROM analisis_ia WHERE sesion_id = ? AND tipo_analisis = ?'
+    
+    _INSERTAR_ANALISIS = '''
+        INSERT INTO analisis_ia (paciente_id, sesion_id, tipo_analisis, palabras_clave,
+                                patrones_detectados, sentimiento, recomendaciones,
+                                hash_contenido, resultado)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    @staticmethod
+    def hash_contenido(texto, version=None):
+        """Hash del texto analizado junto con la versión del analizador (por defecto, la actual)"""
+        contenido = f"{version or ia_service.version_analizador}\0{texto}"
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def obtener_analisis_guardado(sesion_id, hash_contenido):
+        """Devuelve el análisis guardado de una sesión si el hash coincide"""
+        query = '''
+            SELECT resultado FROM analisis_ia
+            WHERE sesion_id = ? AND tipo_analisis = ? AND hash_contenido = ?
+            ORDER BY id DESC
+            LIMIT 1
+        '''
+        row = db.fetch_one(query, (sesion_id, AnalisisController.TIPO_SESION, hash_contenido))
+        if row is None or not row['resultado']:
+            cache_metricas.incrementar(cache='analisis', resultado='fallo')
+            return None
+        cache_metricas.incrementar(cache='analisis', resultado='acierto')
+        return json.loads(row['resultado'])
+    
+    @staticmethod
+    def guardar_analisis(sesion, hash_contenido, analisis):
+        """Guarda (reemplazando el anterior, en una transacción) el análisis de una sesión"""
+        with db.transaccion() as cursor:
+            cursor.execute(AnalisisController._BORRAR_ANALISIS, (sesion.id, AnalisisController.TIPO_SESION))
+            cursor.execute(
+                AnalisisController._INSERTAR_ANALISIS,
+                AnalisisController._parametros_analisis(sesion, hash_contenido, analisis)
+            )
+    
+    @staticmethod
+    def guardar_analisis_lote(items):
+        """
+        Guarda los análisis de muchas sesiones en una sola transacción
+        
+        Args:
+            items: Lista de (sesion, hash_contenido, analisis)
+        """
+        with db.transaccion() as cursor:
+            cursor.executemany(
+                AnalisisController._BORRAR_ANALISIS,
+                [(sesion.id, AnalisisController.TIPO_SESION) for sesion, _, _ in items]
+            )
+            cursor.executemany(
+                AnalisisController._INSERTAR_ANALISIS,
+                [AnalisisController._parametros_analisis(*item) for item in items]
+            )
+    
+    @staticmethod
+    def _parametros_analisis(sesion, hash_contenido, analisis):
+        """Arma los parámetros del INSERT de un análisis de sesión"""
+        return (
+            sesion.paciente_id, sesion.id, AnalisisController.TIPO_SESION,
+            json.dumps(analisis.get('palabras_clave', []), ensure_ascii=False),
+            json.dumps(analisis.get('temas_principales', []), ensure_ascii=False),
+            analisis.get('sentimiento'),
+            json.dumps(analisis.get('recomendaciones', []), ensure_ascii=False),
+            hash_contenido,
+            json.dumps(analisis, ensure_ascii=False)
+        )
+    
+    @staticmethod
+    def hashes_guardados(sesion_ids):
+        """Devuelve {sesion_id: hash_contenido} de los análisis guardados de esas sesiones"""
+        if not sesion_ids:
+            return {}
+        marcadores = ", ".join("?" * len(sesion_ids))
+        query = f'''
+            SELECT sesion_id, hash_contenido FROM analisis_ia
+            WHERE tipo_analisis = ? AND sesion_id IN ({marcadores})
+        '''
+        rows = db.fetch_all(query, (AnalisisController.TIPO_SESION, *sesion_ids))
+        return {row['sesion_id']: row['hash_contenido'] for row in rows}
+    
+    @staticmethod
+    def analizar_sesion(sesion):
+        """
+        Devuelve el análisis de una sesión, usando el guardado si sigue vigente
+        
+        Se recalcula (y se guarda) cuando cambió el texto de la sesión o la
+        versión del analizador.
+        """
+        texto = sesion.texto_analisis
+        hash_contenido = AnalisisController.hash_contenido(texto)
+        
+        analisis = AnalisisController.obtener_analisis_guardado(sesion.id, hash_contenido)
+        if analisis is None:
+            CorpusController.estadisticas()  # Palabras clave por TF-IDF
+            analisis = ia_service.analizar_sesion(texto)
+            AnalisisController.guardar_analisis(sesion, hash_contenido, analisis)
+        
+        return analisis
+    
+    @staticmethod
+    def sesiones_sin_analisis(paciente_id):
+        """
+        Devuelve las sesiones de un paciente sin análisis guardado vigente
+        
+        Returns:
+            Lista de (sesion, texto, hash_contenido)
+        """
+        sesiones = SesionController.obtener_sesiones_paciente(paciente_id)
+        guardados = AnalisisController.hashes_guardados([sesion.id for sesion in sesiones])
+        pendientes = []
+        for sesion in sesiones:
+            texto = sesion.texto_analisis
+            hash_contenido = AnalisisController.hash_contenido(texto)
+            if guardados.get(sesion.id) != hash_contenido:
+                pendientes.append((sesion, texto, hash_contenido))
+        return pendientes
+    
+    @staticmethod
+    def huella_historia(paciente_id):
+        """
+        Hash que identifica la historia de un paciente para el resumen con el LLM
+        
+        Combina la versión del analizador con la cantidad, el último ID y la
+        última edición de sus sesiones (una consulta, sin leer los textos):
+        cambia con cada alta, edición o baja.
+        """
+        row = db.fetch_one('''
+            SELECT COUNT(*) as total, MAX(id) as ultimo, MAX(updated_at) as modificada
+            FROM sesiones WHERE paciente_id = ?
+        ''', (paciente_id,))
+        contenido = f"{ia_service.version_analizador}\0{row['total']}\0{row['ultimo']}\0{row['modificada']}"
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def obtener_resumen_historia(paciente_id, huella):
+        """Devuelve el resumen de la historia guardado si sigue vigente (misma huella_historia)"""
+        query = '''
+            SELECT resultado FROM analisis_ia
+            WHERE paciente_id = ? AND sesion_id IS NULL AND tipo_analisis = ? AND hash_contenido = ?
+            ORDER BY id DESC
+            LIMIT 1
+        '''
+        row = db.fetch_one(query, (paciente_id, AnalisisController.TIPO_HISTORIA, huella))
+        if row is None or not row['resultado']:
+            cache_metricas.incrementar(cache='historia', resultado='fallo')
+            return None
+        cache_metricas.incrementar(cache='historia', resultado='acierto')
+        return json.loads(row['resultado'])
+    
+    @staticmethod
+    def guardar_resumen_historia(paciente_id, huella, resumen):
+        """Guarda (reemplazando el anterior, en una transacción) el resumen de la historia de un paciente"""
+        query = '''
+            INSERT INTO analisis_ia (paciente_id, sesion_id, tipo_analisis, hash_contenido, resultado)
+            VALUES (?, NULL, ?, ?, ?)
+        '''
+        params = (paciente_id, AnalisisController.TIPO_HISTORIA, huella, json.dumps(resumen, ensure_ascii=False))
+        with db.transaccion() as cursor:
+            cursor.execute(
+                'DELETE FROM analisis_ia WHERE paciente_id = ? AND sesion_id IS NULL AND tipo_analisis = ?',
+                (paciente_id, AnalisisController.TIPO_HISTORIA)
+            )
+            cursor.execute(query, params)
+    
+    @staticmethod
+    def textos_historia(paciente_id, gestor=None):
+        """
+        Textos de las sesiones de un paciente en orden cronológico
+        
+        Args:
+            paciente_id: Paciente
+            gestor: DatabaseManager a usar (por defecto el global)
+        """
+        gestor = db if gestor is None else gestor
+        rows = gestor.fetch_all(
+            'SELECT * FROM sesiones WHERE paciente_id = ? ORDER BY fecha, id', (paciente_id,)
+        )
+        return [Sesion.from_db_row(row).texto_analisis for row in rows]
+    
+    @staticmethod
+    def lector_textos_historia(paciente_id):
+        """
+        Función sin argumentos que devuelve textos_historia, para llamarla
+        desde otro hilo (ver AnalisisLocalWorker)
+        
+        Con la base en un archivo la función abre su propia conexión de solo
+        lectura (la global pertenece al hilo principal). Una base en memoria
+        no se puede abrir desde otra conexión, así que se lee acá.
+        """
+        if db.en_memoria:
+            textos = AnalisisController.textos_historia(paciente_id)
+            return lambda: textos
+        
+        ruta = db.db_path
+        
+        def leer():
+            gestor = DatabaseManager.abrir_solo_lectura(ruta)
+            try:
+                return AnalisisController.textos_historia(paciente_id, gestor)
+            finally:
+                gestor.disconnect()
+        return leer
+    
+    @staticmethod
+    def analisis_longitudinal(paciente_id):
+        """
+        Devuelve el análisis longitudinal de un paciente, actualizado en forma incremental
+        
+        Se parte del estado guardado y solo se incorporan las sesiones creadas
+        o editadas desde la última actualización (updated_at >= watermark);
+        las sesiones eliminadas se quitan del estado.
+        """
+        estado, sesiones, cambiado = AnalisisController.preparar_longitudinal(paciente_id)
+        
+        for sesion, hash_contenido, analisis in sesiones:
+            if analisis is None:
+                analisis = ia_service.analizar_sesion(sesion.texto_analisis)
+                AnalisisController.guardar_analisis(sesion, hash_contenido, analisis)
+            AnalisisController.fusionar_longitudinal(estado, sesion, analisis)
+        
+        if sesiones or cambiado:
+            AnalisisController.guardar_estado_longitudinal(paciente_id, estado)
+        
+        return ia_service.resultado_longitudinal(estado)
+    
+    @staticmethod
+    def preparar_longitudinal(paciente_id):
+        """
+        Hace las consultas necesarias para actualizar el análisis longitudinal
+        
+        Separa el acceso a la base (que debe hacerse en el hilo de la conexión)
+        del cálculo de los análisis faltantes, que puede hacerse en otro hilo
+        con fusionar_longitudinal.
+        
+        Returns:
+            Tupla (estado, sesiones, cambiado): el estado sin las sesiones
+            eliminadas, la lista de (sesion, hash_contenido, analisis guardado
+            o None) a incorporar, y si el estado cambió aunque no haya sesiones
+        """
+        estado = AnalisisController._obtener_estado_longitudinal(paciente_id)
+        
+        # Quitar sesiones eliminadas
+        ids_actuales = {
+            str(row['id']) for row in
+            db.fetch_all('SELECT id FROM sesiones WHERE paciente_id = ?', (paciente_id,))
+        }
+        eliminadas = [sesion_id for sesion_id in estado['sesiones'] if sesion_id not in ids_actuales]
+        for sesion_id in eliminadas:
+            ia_service.quitar_sesion(estado, sesion_id)
+        
+        # Sesiones nuevas o editadas desde el último watermark
+        if estado['watermark']:
+            sesiones = SesionController.obtener_sesiones_modificadas(paciente_id, estado['watermark'])
+        else:
+            sesiones = SesionController.obtener_sesiones_paciente(paciente_id)
+        
+        if sesiones:
+            CorpusController.estadisticas()  # Palabras clave por TF-IDF
+        pendientes = []
+        for sesion in sesiones:
+            hash_contenido = AnalisisController.hash_contenido(sesion.texto_analisis)
+            analisis = AnalisisController.obtener_analisis_guardado(sesion.id, hash_contenido)
+            pendientes.append((sesion, hash_contenido, analisis))
+        
+        return estado, pendientes, bool(eliminadas) or not estado['watermark']
+    
+    @staticmethod
+    def fusionar_longitudinal(estado, sesion, analisis):
+        """Incorpora el análisis de una sesión al estado longitudinal y avanza el watermark"""
+        ia_service.fusionar_sesion(estado, sesion.id, str(sesion.fecha), analisis)
+        if sesion.updated_at and (estado['watermark'] is None or sesion.updated_at > estado['watermark']):
+            estado['watermark'] = sesion.updated_at
+    
+    @staticmethod
+    def tendencias_pacientes(estado='activo'):
+        """
+        Estadísticas de la serie de sentimiento de todos los pacientes a la vez
+        
+        Usa los análisis de sesión ya guardados (por ejemplo por el análisis
+        por lotes) leídos en una sola consulta, y calcula todas las series en
+        una sola llamada vectorizada.
+        
+        Args:
+            estado: Estado de los pacientes a incluir (None: todos)
+        
+        Returns:
+            Dict paciente_id -> serie (ver series_sentimiento.analizar_series)
+        """
+        query = '''
+            SELECT s.paciente_id, s.fecha, a.sentimiento,
+                   json_extract(a.resultado, '$.puntaje_sentimiento') as puntaje
+            FROM analisis_ia a
+            JOIN sesiones s ON s.id = a.sesion_id
+            JOIN pacientes p ON p.id = s.paciente_id
+            WHERE a.tipo_analisis = ? AND (? IS NULL OR p.estado = ?)
+            ORDER BY s.paciente_id, s.fecha, s.id
+        '''
+        rows = db.fetch_all(query, (AnalisisController.TIPO_SESION, estado, estado))
+        
+        pacientes = []
+        series = []
+        for paciente_id, filas in groupby(rows, key=lambda row: row['paciente_id']):
+            filas = list(filas)
+            pacientes.append(paciente_id)
+            series.append((
+                [str(row['fecha']) for row in filas],
+                [row['puntaje'] if row['puntaje'] is not None
+                 else VALORES_SENTIMIENTO.get(row['sentimiento'], 0.0) for row in filas]
+            ))
+        
+        return dict(zip(pacientes, analizar_series(series)))
+    
+    @staticmethod
+    def _obtener_estado_longitudinal(paciente_id):
+        """Carga el estado longitudinal guardado (o uno vacío si no hay o cambió el analizador)"""
+        query = '''
+            SELECT resultado FROM analisis_ia
+            WHERE paciente_id = ? AND sesion_id IS NULL AND tipo_analisis = ?
+            ORDER BY id DESC
+            LIMIT 1
+        '''
+        row = db.fetch_one(query, (paciente_id, AnalisisController.TIPO_LONGITUDINAL))
+        if row and row['resultado']:
+            estado = json.loads(row['resultado'])
+            if estado.get('version') == ia_service.version_analizador:
+                return estado
+        return ia_service.estado_longitudinal_vacio()
+    
+    @staticmethod
+    def guardar_estado_longitudinal(paciente_id, estado):
+        """Guarda (reemplazando el anterior, en una transacción) el estado longitudinal de un paciente"""
+        query = '''
+            INSERT INTO analisis_ia (paciente_id, sesion_id, tipo_analisis, hash_contenido, resultado)
+            VALUES (?, NULL, ?, ?, ?)
+        '''
+        params = (
+            paciente_id, AnalisisController.TIPO_LONGITUDINAL,
+            estado['version'], json.dumps(estado, ensure_ascii=False)
+        )
+        with db.transaccion() as cursor:
+            cursor.execute(
+                'DELETE FROM analisis_ia WHERE paciente_id = ? AND sesion_id IS NULL AND tipo_analisis = ?',
+                (paciente_id, AnalisisController.TIPO_LONGITUDINAL)
+            )
+            cursor.execute(query, params)
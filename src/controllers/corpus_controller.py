@@ -0,0 +1,200 @@
+"""
+Controlador del Corpus
+Mantiene las frecuencias de documento de los términos de todas las sesiones
+(tablas corpus_terminos y corpus_sesiones) para ordenar palabras clave por TF-IDF
+"""
+import json
+from src.database.db_manager import db
+from src.services.metricas import metricas
+from src.models.sesion import Sesion
+from src.services.ia_analysis_service import ia_service
+from src.services.tfidf import EstadisticasCorpus
+
+@metricas.instrumentar_controlador
+class CorpusController:
+    
+    # Incrementar si cambia qué términos se indexan: fuerza la reconstrucción
+    VERSION = 1
+    CLAVE_VERSION = 'corpus_version'
+    
+    _estadisticas = None
+    _conexion = None
+    # Sesiones altas, editadas o eliminadas mientras faltan las estadísticas:
+    # se vuelven a registrar al guardar la reconstrucción
+    _tocadas = set()
+    
+    @staticmethod
+    def estadisticas(reconstruir=False):
+        """
+        Devuelve las estadísticas del corpus, cargándolas si hace falta
+        
+        Se cargan una vez por conexión (al restaurar un backup la conexión
+        cambia y se vuelven a leer) y quedan disponibles en ia_service.corpus.
+        
+        Args:
+            reconstruir: Si faltan (o son de otra versión), reconstruirlas en
+                el acto; si no, se devuelve None y las palabras clave se
+                ordenan por frecuencia hasta que se reconstruyan en segundo
+                plano (ver ReconstruccionIndices)
+        """
+        if CorpusController._estadisticas is None or CorpusController._conexion is not db.connection:
+            if CorpusController.necesita_reconstruccion():
+                CorpusController._publicar(None)
+                if reconstruir:
+                    CorpusController.reconstruir()
+            else:
+                CorpusController._cargar()
+        return CorpusController._estadisticas
+    
+    @staticmethod
+    def necesita_reconstruccion():
+        """Indica si las estadísticas guardadas faltan o son de otra versión"""
+        return db.obtener_configuracion(CorpusController.CLAVE_VERSION) != str(CorpusController.VERSION)
+    
+    @staticmethod
+    def registrar_sesion(sesion):
+        """Incorpora (o actualiza) los términos de una sesión alta o editada"""
+        estadisticas = CorpusController.estadisticas()
+        if estadisticas is None:
+            CorpusController._tocadas.add(sesion.id)
+            return
+        nuevos = ia_service.terminos_indexables(sesion.texto_analisis)
+        
+        row = db.fetch_one('SELECT terminos FROM corpus_sesiones WHERE sesion_id = ?', (sesion.id,))
+        anteriores = set(json.loads(row['terminos'])) if row else set()
+        agregados = [t for t in nuevos if t not in anteriores]
+        quitados = anteriores.difference(nuevos)
+        if row and not agregados and not quitados:
+            return
+        
+        with db.transaccion() as cursor:
+            CorpusController._aplicar_diferencia(cursor, agregados, quitados)
+            cursor.execute(
+                'INSERT OR REPLACE INTO corpus_sesiones (sesion_id, terminos) VALUES (?, ?)',
+                (sesion.id, json.dumps(nuevos, ensure_ascii=False))
+            )
+        estadisticas.actualizar(agregados, quitados, 0 if row else 1)
+    
+    @staticmethod
+    def quitar_sesion(sesion_id):
+        """Quita los términos de una sesión eliminada"""
+        estadisticas = CorpusController.estadisticas()
+        if estadisticas is None:
+            CorpusController._tocadas.add(sesion_id)
+            return
+        row = db.fetch_one('SELECT terminos FROM corpus_sesiones WHERE sesion_id = ?', (sesion_id,))
+        if not row:
+            return
+        
+        quitados = json.loads(row['terminos'])
+        with db.transaccion() as cursor:
+            CorpusController._aplicar_diferencia(cursor, [], quitados)
+            cursor.execute('DELETE FROM corpus_sesiones WHERE sesion_id = ?', (sesion_id,))
+        estadisticas.actualizar([], quitados, -1)
+    
+    @staticmethod
+    def reconstruir():
+        """Recalcula las estadísticas desde cero a partir de todas las sesiones (bloquea)"""
+        CorpusController.guardar_reconstruccion(*CorpusController.calcular(CorpusController.leer_textos()))
+    
+    @staticmethod
+    def leer_textos(despues_de_id=0, limite=None):
+        """
+        Textos de las sesiones, por bloques en orden de ID, para calcular las
+        estadísticas
+        
+        Paginación por clave, como SimilitudController.leer_sesiones. El
+        primer bloque (despues_de_id=0) empieza la lectura: lo que cambie
+        desde ahí se vuelve a registrar al guardar la reconstrucción.
+        
+        Args:
+            despues_de_id: Último ID del bloque anterior
+            limite: Cantidad máxima de sesiones (None: todas las que siguen)
+        
+        Returns:
+            Lista de (sesion_id, texto)
+        """
+        if despues_de_id == 0:
+            CorpusController._tocadas.clear()
+        rows = db.fetch_all('SELECT * FROM sesiones WHERE id > ? ORDER BY id LIMIT ?',
+                            (despues_de_id, -1 if limite is None else limite))
+        return [(row['id'], Sesion.from_db_row(row).texto_analisis) for row in rows]
+    
+    @staticmethod
+    def calcular(textos, al_avanzar=None):
+        """
+        Calcula las frecuencias de documento (no usa la base: puede correr en otro hilo)
+        
+        Args:
+            textos: Lista de (sesion_id, texto) de leer_textos
+            al_avanzar: Callback (procesadas, total) cada 500 sesiones
+        
+        Returns:
+            Tupla (frecuencias, filas) para guardar_reconstruccion
+        """
+        frecuencias = {}
+        filas = []
+        for i, (sesion_id, texto) in enumerate(textos, 1):
+            terminos = ia_service.terminos_indexables(texto)
+            for termino in terminos:
+                frecuencias[termino] = frecuencias.get(termino, 0) + 1
+            filas.append((sesion_id, json.dumps(terminos, ensure_ascii=False)))
+            if al_avanzar is not None and i % 500 == 0:
+                al_avanzar(i, len(textos))
+        return frecuencias, filas
+    
+    @staticmethod
+    def guardar_reconstruccion(frecuencias, filas):
+        """
+        Guarda y publica las estadísticas calculadas con calcular
+        
+        Las sesiones que cambiaron desde leer_textos se registran de nuevo.
+        """
+        with db.transaccion() as cursor:
+            cursor.execute('DELETE FROM corpus_terminos')
+            cursor.execute('DELETE FROM corpus_sesiones')
+            cursor.executemany('INSERT INTO corpus_terminos (termino, documentos) VALUES (?, ?)',
+                               frecuencias.items())
+            cursor.executemany('INSERT INTO corpus_sesiones (sesion_id, terminos) VALUES (?, ?)', filas)
+        db.guardar_configuracion(CorpusController.CLAVE_VERSION, CorpusController.VERSION)
+        
+        CorpusController._publicar(EstadisticasCorpus.desde_frecuencias(frecuencias, len(filas)))
+        
+        tocadas = list(CorpusController._tocadas)
+        CorpusController._tocadas.clear()
+        for sesion_id in tocadas:
+            row = db.fetch_one('SELECT * FROM sesiones WHERE id = ?', (sesion_id,))
+            if row:
+                CorpusController.registrar_sesion(Sesion.from_db_row(row))
+            else:
+                CorpusController.quitar_sesion(sesion_id)
+    
+    @staticmethod
+    def _cargar():
+        """Lee las estadísticas guardadas"""
+        frecuencias = {
+            row['termino']: row['documentos']
+            for row in db.fetch_all('SELECT termino, documentos FROM corpus_terminos')
+        }
+        total = db.fetch_one('SELECT COUNT(*) as total FROM corpus_sesiones')['total']
+        CorpusController._publicar(EstadisticasCorpus.desde_frecuencias(frecuencias, total))
+    
+    @staticmethod
+    def _publicar(estadisticas):
+        CorpusController._estadisticas = estadisticas
+        CorpusController._conexion = db.connection
+        ia_service.corpus = estadisticas
+    
+    @staticmethod
+    def _aplicar_diferencia(cursor, agregados, quitados):
+        """Actualiza las frecuencias guardadas con los términos que entran y salen de una sesión"""
+        cursor.executemany('''
+            INSERT INTO corpus_terminos (termino, documentos) VALUES (?, 1)
+            ON CONFLICT(termino) DO UPDATE SET documentos = documentos + 1
+        ''', [(t,) for t in agregados])
+        cursor.executemany(
+            'UPDATE corpus_terminos SET documentos = documentos - 1 WHERE termino = ?',
+            [(t,) for t in quitados]
+        )
+        if quitados:
+            cursor.execute('DELETE FROM corpus_terminos WHERE documentos <= 0')
@@ -3,9 +3,11 @@ Controlador de Pacientes
 Maneja la lógica de negocio para la gestión de pacientes
 """
 from src.database.db_manager import db
+from src.services.metricas import metricas
 from src.models.paciente import Paciente
 from datetime import datetime
 
+@metricas.instrumentar_controlador
 class PacienteController:
     
     @staticmethod
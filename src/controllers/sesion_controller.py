@@ -3,9 +3,13 @@ Controlador de Sesiones
 Maneja la lógica de negocio para la gestión de sesiones
 """
 from src.database.db_manager import db
+from src.services.metricas import metricas
 from src.models.sesion import Sesion
+from src.controllers.corpus_controller import CorpusController
+from src.controllers.similitud_controller import SimilitudController
 from datetime import datetime
 
+@metricas.instrumentar_controlador
 class SesionController:
     
     @staticmethod
@@ -23,6 +27,8 @@ class SesionController:
         )
         cursor = db.execute_query(query, params)
         sesion.id = cursor.lastrowid
+        CorpusController.registrar_sesion(sesion)
+        SimilitudController.indexar_sesion(sesion)
         return sesion
     
     @staticmethod
@@ -43,6 +49,17 @@ class SesionController:
         rows = db.fetch_all(query, (paciente_id,))
         return [Sesion.from_db_row(row) for row in rows]
     
+    @staticmethod
+    def obtener_sesiones_modificadas(paciente_id, desde):
+        """Obtiene las sesiones de un paciente creadas o editadas desde una fecha/hora"""
+        query = '''
+            SELECT * FROM sesiones
+            WHERE paciente_id = ? AND updated_at >= ?
+            ORDER BY fecha DESC
+        '''
+        rows = db.fetch_all(query, (paciente_id, desde))
+        return [Sesion.from_db_row(row) for row in rows]
+    
     @staticmethod
     def obtener_ultima_sesion(paciente_id):
         """Obtiene la última sesión de un paciente"""
@@ -55,6 +72,35 @@ class SesionController:
         row = db.fetch_one(query, (paciente_id,))
         return Sesion.from_db_row(row)
     
+    @staticmethod
+    def obtener_sesiones_pacientes_activos(despues_de_id, limite):
+        """
+        Obtiene sesiones de pacientes activos por bloques, en orden de ID
+        
+        Paginación por clave: cada bloque empieza después del último ID del
+        anterior, así el costo no crece con el avance (a diferencia de OFFSET).
+        """
+        query = '''
+            SELECT s.* FROM sesiones s
+            JOIN pacientes p ON p.id = s.paciente_id
+            WHERE p.estado = 'activo' AND s.id > ?
+            ORDER BY s.id
+            LIMIT ?
+        '''
+        rows = db.fetch_all(query, (despues_de_id, limite))
+        return [Sesion.from_db_row(row) for row in rows]
+    
+    @staticmethod
+    def contar_sesiones_pacientes_activos(despues_de_id=0):
+        """Cuenta las sesiones de pacientes activos con ID mayor al indicado"""
+        query = '''
+            SELECT COUNT(*) as total FROM sesiones s
+            JOIN pacientes p ON p.id = s.paciente_id
+            WHERE p.estado = 'activo' AND s.id > ?
+        '''
+        row = db.fetch_one(query, (despues_de_id,))
+        return row['total'] if row else 0
+    
     @staticmethod
     def actualizar_sesion(sesion):
         """Actualiza los datos de una sesión"""
@@ -71,13 +117,44 @@ class SesionController:
             sesion.proxima_sesion, sesion.id
         )
         db.execute_query(query, params)
+        CorpusController.registrar_sesion(sesion)
+        SimilitudController.indexar_sesion(sesion)
         return sesion
     
     @staticmethod
     def eliminar_sesion(sesion_id):
         """Elimina una sesión"""
+        # Las claves foráneas no están activas: borrar los análisis a mano
+        db.execute_query('DELETE FROM analisis_ia WHERE sesion_id = ?', (sesion_id,))
+        CorpusController.quitar_sesion(sesion_id)
         query = 'DELETE FROM sesiones WHERE id = ?'
         db.execute_query(query, (sesion_id,))
+        SimilitudController.quitar_sesion(sesion_id)
+    
+    @staticmethod
+    def buscar_sesiones_similares(sesion, k=5, paciente_id=None):
+        """
+        Busca las sesiones con contenido más parecido a una sesión
+        
+        Args:
+            sesion: Sesión de referencia
+            k: Cantidad de resultados
+            paciente_id: Limitar la búsqueda a un paciente (None: todos)
+        
+        Returns:
+            Lista de (Sesion, similitud) de mayor a menor similitud (sin las
+            que no comparten ningún término), o None si el índice se está
+            reconstruyendo
+        """
+        similares = SimilitudController.sesiones_similares(sesion, k, paciente_id)
+        if similares is None:
+            return None
+        resultados = []
+        for sesion_id, similitud in similares:
+            similar = SesionController.obtener_sesion(sesion_id)
+            if similar and similitud > 0:
+                resultados.append((similar, similitud))
+        return resultados
     
     @staticmethod
     def contar_sesiones_paciente(paciente_id):
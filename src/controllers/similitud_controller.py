@@ -0,0 +1,219 @@
+"""
+Controlador de Similitud
+Mantiene el índice vectorial de sesiones (en disco, junto a la base de datos)
+y responde consultas de sesiones parecidas
+"""
+import numpy as np
+from src.database.db_manager import db
+from src.services.metricas import metricas
+from src.models.sesion import Sesion
+from src.services.ia_analysis_service import ia_service, PALABRAS_COMUNES
+from src.services.indice_vectorial import IndiceVectorial, VectorizadorHashing
+
+@metricas.instrumentar_controlador
+class SimilitudController:
+    
+    DIMENSIONES = 1024
+    DIRECTORIO = 'indice_sesiones'
+    
+    _indice = None
+    _conexion = None
+    _vigente = False
+    # Sesiones altas, editadas o eliminadas mientras el índice no está al día:
+    # se vuelven a indexar al guardar la reconstrucción
+    _tocadas = set()
+    # Huella de la base al empezar la lectura de la reconstrucción en curso
+    _huella_lectura = None
+    _vectorizador = VectorizadorHashing(DIMENSIONES)
+    
+    @staticmethod
+    def indice(reconstruir=False):
+        """
+        Devuelve el índice de la base actual, abriéndolo si hace falta
+        
+        Se abre una vez por conexión. Si su huella no coincide con la de la
+        base (índice nuevo, borrado o de un backup restaurado) no está al día.
+        
+        Args:
+            reconstruir: Si no está al día, reconstruirlo en el acto; si no,
+                se devuelve None hasta que se reconstruya en segundo plano
+                (ver ReconstruccionIndices)
+        """
+        if SimilitudController._indice is None or SimilitudController._conexion is not db.connection:
+            if SimilitudController._indice is not None:
+                SimilitudController._indice.cerrar()
+            directorio = db.directorio_datos / SimilitudController.DIRECTORIO
+            SimilitudController._indice = IndiceVectorial(directorio, SimilitudController.DIMENSIONES)
+            SimilitudController._conexion = db.connection
+            SimilitudController._vigente = SimilitudController._indice.huella == SimilitudController.huella_base()
+        
+        if not SimilitudController._vigente:
+            if not reconstruir:
+                return None
+            SimilitudController.reconstruir()
+        return SimilitudController._indice
+    
+    @staticmethod
+    def huella_base():
+        """
+        Huella del contenido de la tabla de sesiones
+        
+        Cambia con cada alta, edición o baja (y de una base a otra), así un
+        índice de otra base o de un backup restaurado no pasa por vigente.
+        """
+        # Subconsultas separadas: así cada MAX se resuelve con un índice
+        row = db.fetch_one('''
+            SELECT (SELECT COUNT(*) FROM sesiones) as total,
+                   (SELECT MAX(id) FROM sesiones) as ultimo,
+                   (SELECT MAX(updated_at) FROM sesiones) as modificada
+        ''')
+        return [row['total'], row['ultimo'], row['modificada']]
+    
+    @staticmethod
+    def necesita_reconstruccion():
+        """Indica si el índice de la base actual no está al día"""
+        return SimilitudController.indice() is None
+    
+    @staticmethod
+    def invalidar(gestor=None):
+        """
+        Descarta el índice guardado de una base (por ejemplo al reemplazarla
+        con un backup); se reconstruye en el próximo uso
+        
+        Args:
+            gestor: DatabaseManager de la base (por defecto el global)
+        """
+        directorio = (gestor or db).directorio_datos / SimilitudController.DIRECTORIO
+        indice = SimilitudController._indice
+        if indice is not None and indice.directorio == directorio:
+            SimilitudController._indice = None
+            SimilitudController._vigente = False
+        IndiceVectorial(directorio, SimilitudController.DIMENSIONES).limpiar()
+    
+    @staticmethod
+    def vectorizar(sesion):
+        """Vector de hashing del texto de una sesión"""
+        return SimilitudController.vectorizar_texto(sesion.texto_analisis)
+    
+    @staticmethod
+    def vectorizar_texto(texto):
+        """Vector de hashing de un texto"""
+        terminos = [
+            palabra for palabra in ia_service.tokenizar(texto).tokens
+            if len(palabra) > 2 and palabra not in PALABRAS_COMUNES
+        ]
+        return SimilitudController._vectorizador.vectorizar(terminos)
+    
+    @staticmethod
+    def indexar_sesion(sesion):
+        """Agrega (o actualiza) una sesión en el índice (después de guardarla en la base)"""
+        indice = SimilitudController.indice()
+        if indice is None:
+            SimilitudController._tocadas.add(sesion.id)
+            return
+        indice.agregar(sesion.id, sesion.paciente_id, SimilitudController.vectorizar(sesion))
+        indice.huella = SimilitudController.huella_base()
+        indice.guardar()
+    
+    @staticmethod
+    def quitar_sesion(sesion_id):
+        """Quita una sesión eliminada del índice (después de borrarla de la base)"""
+        indice = SimilitudController.indice()
+        if indice is None:
+            SimilitudController._tocadas.add(sesion_id)
+            return
+        indice.quitar(sesion_id)
+        indice.huella = SimilitudController.huella_base()
+        indice.guardar()
+    
+    @staticmethod
+    def reconstruir():
+        """Vuelve a indexar todas las sesiones desde cero (bloquea)"""
+        SimilitudController.guardar_reconstruccion(*SimilitudController.calcular(SimilitudController.leer_sesiones()))
+    
+    @staticmethod
+    def leer_sesiones(despues_de_id=0, limite=None):
+        """
+        Sesiones a indexar, por bloques en orden de ID
+        
+        Paginación por clave: cada bloque empieza después del último ID del
+        anterior. El primer bloque (despues_de_id=0) empieza la lectura: guarda
+        la huella de la base, y lo que cambie desde ahí se indexa de nuevo al
+        guardar la reconstrucción.
+        
+        Args:
+            despues_de_id: Último ID del bloque anterior
+            limite: Cantidad máxima de sesiones (None: todas las que siguen)
+        
+        Returns:
+            Lista de (sesion_id, paciente_id, texto)
+        """
+        if despues_de_id == 0:
+            SimilitudController._tocadas.clear()
+            SimilitudController._huella_lectura = SimilitudController.huella_base()
+        rows = db.fetch_all('SELECT * FROM sesiones WHERE id > ? ORDER BY id LIMIT ?',
+                            (despues_de_id, -1 if limite is None else limite))
+        return [(row['id'], row['paciente_id'], Sesion.from_db_row(row).texto_analisis) for row in rows]
+    
+    @staticmethod
+    def calcular(sesiones, al_avanzar=None):
+        """
+        Vectoriza las sesiones (no usa la base: puede correr en otro hilo)
+        
+        Args:
+            sesiones: Lista de (sesion_id, paciente_id, texto) de leer_sesiones
+            al_avanzar: Callback (procesadas, total) cada 500 sesiones
+        
+        Returns:
+            Tupla (sesiones, pacientes, vectores) para guardar_reconstruccion
+        """
+        vectores = np.zeros((len(sesiones), SimilitudController.DIMENSIONES), dtype=np.float16)
+        for i, (_, _, texto) in enumerate(sesiones):
+            vectores[i] = SimilitudController.vectorizar_texto(texto)
+            if al_avanzar is not None and (i + 1) % 500 == 0:
+                al_avanzar(i + 1, len(sesiones))
+        ids = np.array([sesion_id for sesion_id, _, _ in sesiones], dtype=np.int64)
+        pacientes = np.array([paciente_id or 0 for _, paciente_id, _ in sesiones], dtype=np.int64)
+        return ids, pacientes, vectores
+    
+    @staticmethod
+    def guardar_reconstruccion(sesiones, pacientes, vectores):
+        """
+        Reemplaza el índice con los vectores calculados con calcular
+        
+        Queda con la huella del comienzo de la lectura; las sesiones que
+        cambiaron desde entonces se indexan de nuevo.
+        """
+        huella = SimilitudController._huella_lectura
+        if SimilitudController._indice is None or SimilitudController._conexion is not db.connection:
+            SimilitudController.indice()
+        SimilitudController._indice.reemplazar(sesiones, pacientes, vectores, huella)
+        SimilitudController._vigente = True
+        
+        tocadas = list(SimilitudController._tocadas)
+        SimilitudController._tocadas.clear()
+        for sesion_id in tocadas:
+            row = db.fetch_one('SELECT * FROM sesiones WHERE id = ?', (sesion_id,))
+            if row:
+                SimilitudController.indexar_sesion(Sesion.from_db_row(row))
+            else:
+                SimilitudController.quitar_sesion(sesion_id)
+    
+    @staticmethod
+    def sesiones_similares(sesion, k=5, paciente_id=None):
+        """
+        Busca las sesiones más parecidas a una sesión
+        
+        Args:
+            sesion: Sesión de referencia (queda excluida del resultado)
+            k: Cantidad de resultados
+            paciente_id: Limitar la búsqueda a un paciente (None: todos)
+        
+        Returns:
+            Lista de (sesion_id, similitud coseno) de mayor a menor, o None si
+            el índice se está reconstruyendo
+        """
+        indice = SimilitudController.indice()
+        if indice is None:
+            return None
+        return indice.buscar(SimilitudController.vectorizar(sesion), k, paciente_id, excluir=sesion.id)
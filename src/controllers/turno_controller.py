@@ -3,9 +3,11 @@ Controlador de Turnos
 Maneja la lógica de negocio para la gestión de turnos
 """
 from src.database.db_manager import db
+from src.services.metricas import metricas
 from src.models.turno import Turno
 from datetime import datetime, date
 
+@metricas.instrumentar_controlador
 class TurnoController:
     
     @staticmethod
@@ -3,33 +3,212 @@ Gestor de base de datos SQLite con cifrado
 """
 import sqlite3
 import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from cryptography.fernet import Fernet
 from datetime import datetime
+from src.contexto import Delegado
+from src.database.instrumentacion import InstrumentacionConsultas
+from src.services.metricas import metricas
+
+# Ruta de una base en memoria privada de su conexión
+MEMORIA = ":memory:"
+
+_DURACION_CONSULTAS = metricas.histograma('psicolarg_consulta_segundos', "Duración de las consultas SQL",
+                                          ('operacion',))
 
 class DatabaseManager:
-    def __init__(self, db_path="data/psicolarg.db"):
+    
+    # Configuración guardada: umbral (ms) de consulta lenta si la instrumentación está activa
+    CLAVE_UMBRAL_LENTO = 'sql_umbral_lento_ms'
+    
+    def __init__(self, db_path="data/psicolarg.db", directorio_datos=None):
+        """
+        Args:
+            db_path: Archivo de la base, MEMORIA o una URI de base en memoria
+                compartida (ver crear_en_memoria)
+            directorio_datos: Directorio de los archivos derivados (índices,
+                registros); por defecto el de la base
+        """
         self.db_path = db_path
-        self._ensure_db_directory()
         self.connection = None
         self.cursor = None
+        self._borrar_al_cerrar = None
+        self._directorio_datos = Path(directorio_datos) if directorio_datos else None
+        self._directorio_temporal = None
+        self.instrumentacion = None
+        self.ultima_consulta = None  # Para el informe de bloqueos de la interfaz
+        
+    @classmethod
+    def crear_en_memoria(cls, nombre: str = None, directorio_datos=None):
+        """
+        Crea un gestor sobre una base en memoria (sin archivo ni fsync)
+        
+        Sin nombre, la base es privada de la conexión y desaparece al
+        desconectar. Con nombre, usa caché compartida: todos los gestores del
+        proceso que se conecten con el mismo nombre (por ejemplo uno por hilo)
+        ven la misma base, que existe mientras alguno siga conectado. La caché
+        compartida bloquea por tabla, así que una escritura concurrente con
+        otra conexión puede fallar con "database table is locked".
         
+        Args:
+            nombre: Nombre de la base compartida (None para una privada)
+            directorio_datos: Directorio de los archivos derivados (por
+                defecto uno temporal que se borra al desconectar)
+        """
+        ruta = f"file:{nombre}?mode=memory&cache=shared" if nombre else MEMORIA
+        return cls(ruta, directorio_datos)
+    
+    @classmethod
+    def desde_serializado(cls, datos: bytes):
+        """
+        Crea un gestor de solo lectura sobre una base serializada en memoria
+        
+        Args:
+            datos: Contenido completo de un archivo SQLite
+        """
+        gestor = cls(MEMORIA)
+        gestor.connection = sqlite3.connect(MEMORIA)
+        gestor.connection.deserialize(datos)
+        gestor._configurar_solo_lectura()
+        return gestor
+    
+    def clonar_en_memoria(self, nombre: str = None, directorio_datos=None):
+        """
+        Copia la base conectada a una nueva base en memoria (API de backup de SQLite)
+        
+        Copiar una base ya creada y cargada es mucho más rápido que crearla y
+        poblarla de nuevo: sirve para partir de la misma plantilla en cada
+        prueba o benchmark.
+        
+        Args:
+            nombre: Nombre de la base compartida (None para una privada)
+            directorio_datos: Ver crear_en_memoria
+        
+        Returns:
+            DatabaseManager conectado a la copia
+        """
+        copia = self.crear_en_memoria(nombre, directorio_datos)
+        copia.connection = sqlite3.connect(copia.db_path, uri=nombre is not None)
+        self.connection.backup(copia.connection)
+        copia.connection.row_factory = sqlite3.Row
+        copia.cursor = copia.connection.cursor()
+        return copia
+    
+    @classmethod
+    def abrir_solo_lectura(cls, db_path, temporal=False):
+        """
+        Abre un archivo de base de datos en modo de solo lectura
+        
+        Args:
+            db_path: Ruta al archivo SQLite
+            temporal: Si es True, el archivo se elimina al desconectar
+        """
+        gestor = cls(db_path)
+        uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        gestor.connection = sqlite3.connect(uri, uri=True)
+        # Leer mediante mmap en lugar de copiar páginas al caché
+        gestor.connection.execute("PRAGMA mmap_size = 268435456")
+        gestor._configurar_solo_lectura()
+        if temporal:
+            gestor._borrar_al_cerrar = Path(db_path)
+        return gestor
+    
+    def _configurar_solo_lectura(self):
+        """Prepara una conexión ya abierta para consultas de solo lectura"""
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA query_only = ON")
+        self.cursor = self.connection.cursor()
+    
     def _ensure_db_directory(self):
         """Crea el directorio de datos si no existe"""
+        if self.en_memoria:
+            return
         db_dir = Path(self.db_path).parent
         db_dir.mkdir(parents=True, exist_ok=True)
     
+    @property
+    def en_memoria(self) -> bool:
+        """Indica si la base vive en memoria (privada o con caché compartida)"""
+        return self.db_path == MEMORIA or 'mode=memory' in str(self.db_path)
+    
+    @property
+    def directorio_datos(self) -> Path:
+        """
+        Directorio de los archivos derivados de la base (índices, registros)
+        
+        Es el de la base; una base en memoria sin directorio explícito usa
+        uno temporal, que se borra al desconectar.
+        """
+        if self._directorio_datos is not None:
+            return self._directorio_datos
+        if not self.en_memoria:
+            return Path(self.db_path).parent
+        if self._directorio_temporal is None:
+            self._directorio_temporal = Path(tempfile.mkdtemp(prefix="psicolarg_memoria_"))
+        return self._directorio_temporal
+    
     def connect(self):
         """Establece conexión con la base de datos"""
-        self.connection = sqlite3.connect(self.db_path)
+        self._ensure_db_directory()
+        self.connection = sqlite3.connect(self.db_path, uri=str(self.db_path).startswith('file:'))
         self.connection.row_factory = sqlite3.Row
         self.cursor = self.connection.cursor()
         self._create_tables()
         
+        umbral = self.obtener_configuracion(self.CLAVE_UMBRAL_LENTO)
+        if umbral:
+            self.activar_instrumentacion(float(umbral))
+        
     def disconnect(self):
         """Cierra la conexión con la base de datos"""
         if self.connection:
             self.connection.close()
+        self.connection = None
+        self.cursor = None
+        if self._borrar_al_cerrar is not None:
+            if self._borrar_al_cerrar.exists():
+                self._borrar_al_cerrar.unlink()
+            self._borrar_al_cerrar = None
+        if self._directorio_temporal is not None:
+            shutil.rmtree(self._directorio_temporal, ignore_errors=True)
+            self._directorio_temporal = None
+    
+    def reconectar(self):
+        """
+        Cierra y vuelve a abrir la conexión sobre el archivo actual
+        
+        Necesario cuando el archivo de la base de datos fue reemplazado
+        (por ejemplo al restaurar un backup): la conexión anterior seguiría
+        apuntando al archivo viejo.
+        """
+        self.disconnect()
+        self.connect()
+    
+    @property
+    def conectado(self) -> bool:
+        """Indica si hay una conexión abierta"""
+        return self.connection is not None
+    
+    @contextmanager
+    def usar_temporalmente(self, otro):
+        """
+        Redirige temporalmente las consultas de este gestor a otro
+        
+        Permite usar los controladores (que trabajan con la instancia global)
+        contra otra base, por ejemplo un backup abierto en solo lectura.
+        
+        Args:
+            otro: DatabaseManager ya conectado
+        """
+        anterior = (self.connection, self.cursor)
+        self.connection, self.cursor = otro.connection, otro.cursor
+        try:
+            yield self
+        finally:
+            self.connection, self.cursor = anterior
     
     def _create_tables(self):
         """Crea las tablas de la base de datos"""
@@ -120,32 +299,153 @@ class DatabaseManager:
             )
         ''')
         
+        # Estadísticas del corpus de sesiones para TF-IDF
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS corpus_terminos (
+                termino TEXT PRIMARY KEY,
+                documentos INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS corpus_sesiones (
+                sesion_id INTEGER PRIMARY KEY,
+                terminos TEXT NOT NULL
+            )
+        ''')
+        
+        # Columnas agregadas después de la versión inicial
+        self._agregar_columna('analisis_ia', 'hash_contenido', 'TEXT')
+        self._agregar_columna('analisis_ia', 'resultado', 'TEXT')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_analisis_ia_sesion
+            ON analisis_ia (sesion_id, tipo_analisis)
+        ''')
+        
+        # Índices de las consultas de los controladores
+        # (verificar con: python -m src.database.verificar_planes)
+        indices = {
+            'idx_pacientes_estado': 'pacientes (estado, apellido, nombre)',
+            'idx_pacientes_apellido': 'pacientes (apellido, nombre)',
+            'idx_turnos_fecha': 'turnos (fecha, hora_inicio)',
+            'idx_turnos_paciente': 'turnos (paciente_id, fecha, hora_inicio)',
+            'idx_sesiones_paciente': 'sesiones (paciente_id, fecha)',
+            'idx_sesiones_modificacion': 'sesiones (updated_at)',
+        }
+        for nombre, definicion in indices.items():
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {definicion}")
+        
         self.connection.commit()
     
+    def _agregar_columna(self, tabla, columna, tipo):
+        """Agrega una columna a una tabla existente si todavía no la tiene"""
+        columnas = [fila['name'] for fila in self.cursor.execute(f"PRAGMA table_info({tabla})")]
+        if columna not in columnas:
+            self.cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+    
+    def activar_instrumentacion(self, umbral_ms=100):
+        """
+        Empieza a medir las consultas de execute_query, fetch_all y fetch_one
+        
+        Las que tardan umbral_ms o más se registran en data/logs/consultas_lentas.log
+        con su plan de ejecución.
+        """
+        if self.instrumentacion is None:
+            ruta_log = self.directorio_datos / 'logs' / 'consultas_lentas.log'
+            self.instrumentacion = InstrumentacionConsultas(umbral_ms, ruta_log)
+        self.instrumentacion.umbral_ms = umbral_ms
+    
+    def desactivar_instrumentacion(self):
+        """Deja de medir las consultas (y descarta lo acumulado)"""
+        self.instrumentacion = None
+    
     def execute_query(self, query, params=None):
         """Ejecuta una consulta SQL"""
+        self.ultima_consulta = query
+        inicio = time.perf_counter()
         if params:
             self.cursor.execute(query, params)
         else:
             self.cursor.execute(query)
         self.connection.commit()
+        _DURACION_CONSULTAS.observar(time.perf_counter() - inicio, operacion='execute_query')
+        if self.instrumentacion is not None:
+            self.instrumentacion.registrar(self.connection, query, params, self.cursor.rowcount, inicio)
         return self.cursor
     
     def fetch_all(self, query, params=None):
         """Ejecuta una consulta y devuelve todos los resultados"""
+        self.ultima_consulta = query
+        inicio = time.perf_counter()
         if params:
             self.cursor.execute(query, params)
         else:
             self.cursor.execute(query)
-        return self.cursor.fetchall()
+        rows = self.cursor.fetchall()
+        _DURACION_CONSULTAS.observar(time.perf_counter() - inicio, operacion='fetch_all')
+        if self.instrumentacion is not None:
+            self.instrumentacion.registrar(self.connection, query, params, len(rows), inicio)
+        return rows
+    
+    @contextmanager
+    def transaccion(self):
+        """
+        Agrupa varias escrituras en una sola transacción
+        
+        Hace commit al salir del bloque, o rollback si hubo una excepción.
+        Dentro del bloque usar el cursor devuelto (execute_query hace commit).
+        """
+        try:
+            yield self.cursor
+        except Exception:
+            self.connection.rollback()
+            raise
+        self.connection.commit()
+    
+    def obtener_configuracion(self, clave, defecto=None):
+        """Lee un valor de la tabla de configuración"""
+        row = self.fetch_one('SELECT valor FROM configuracion WHERE clave = ?', (clave,))
+        return row['valor'] if row else defecto
+    
+    def guardar_configuracion(self, clave, valor):
+        """Guarda un valor en la tabla de configuración (None lo borra)"""
+        if valor is None:
+            self.execute_query('DELETE FROM configuracion WHERE clave = ?', (clave,))
+            return
+        query = '''
+            INSERT INTO configuracion (clave, valor, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor, updated_at = CURRENT_TIMESTAMP
+        '''
+        self.execute_query(query, (clave, str(valor)))
     
     def fetch_one(self, query, params=None):
         """Ejecuta una consulta y devuelve un resultado"""
+        self.ultima_consulta = query
+        inicio = time.perf_counter()
         if params:
             self.cursor.execute(query, params)
         else:
             self.cursor.execute(query)
-        return self.cursor.fetchone()
+        row = self.cursor.fetchone()
+        _DURACION_CONSULTAS.observar(time.perf_counter() - inicio, operacion='fetch_one')
+        if self.instrumentacion is not None:
+            self.instrumentacion.registrar(self.connection, query, params, 0 if row is None else 1, inicio)
+        return row
+    
+    def tamaño_archivo(self) -> int:
+        """Tamaño en bytes del archivo de la base (en memoria, el de sus páginas; 0 si no existe)"""
+        if self.en_memoria:
+            if self.connection is None:
+                return 0
+            paginas = self.connection.execute("PRAGMA page_count").fetchone()[0]
+            return paginas * self.connection.execute("PRAGMA page_size").fetchone()[0]
+        try:
+            return os.path.getsize(self.db_path)
+        except OSError:
+            return 0
+
+# Instancia global del gestor de base de datos (la del contexto de aplicación actual)
+db = Delegado('db')
 
-# Instancia global del gestor de base de datos
-db = DatabaseManager()
+metricas.medidor('psicolarg_base_datos_bytes', "Tamaño del archivo de la base de datos",
+                 funcion=lambda: db.tamaño_archivo())
@@ -0,0 +1,384 @@
+"""
+Generador de datos sintéticos
+Carga pacientes, turnos y sesiones con texto de estilo clínico en español
+para pruebas de carga, benchmarks y la verificación de planes. Es
+determinista (la misma semilla produce los mismos datos) y escribe con
+inserciones por lotes, sin pasar por los controladores.
+
+Uso:
+    python -m src.database.generador_datos data/carga.db --pacientes 20000 --turnos 1200000 --sesiones 1000000
+
+Los índices derivados (corpus TF-IDF, índice de similitud) no se cargan:
+se reconstruyen solos la primera vez que se usan.
+"""
+import argparse
+import sys
+import time
+from datetime import date
+from pathlib import Path
+import numpy as np
+from src.database.db_manager import DatabaseManager, db
+
+NOMBRES = [
+    'María', 'Juan', 'Lucía', 'Martín', 'Sofía', 'Diego', 'Valentina', 'Pablo', 'Camila', 'Nicolás',
+    'Florencia', 'Federico', 'Julieta', 'Santiago', 'Agustina', 'Matías', 'Carolina', 'Gonzalo',
+    'Paula', 'Lucas', 'Victoria', 'Facundo', 'Micaela', 'Tomás', 'Laura', 'Sebastián', 'Ana',
+    'Javier', 'Natalia', 'Ignacio', 'Romina', 'Emiliano', 'Belén', 'Hernán', 'Daniela', 'Andrés'
+]
+
+APELLIDOS = [
+    'González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez', 'García',
+    'Sánchez', 'Romero', 'Sosa', 'Álvarez', 'Torres', 'Ruiz', 'Ramírez', 'Flores', 'Acosta',
+    'Benítez', 'Medina', 'Suárez', 'Herrera', 'Aguirre', 'Pereyra', 'Gutiérrez', 'Giménez',
+    'Molina', 'Silva', 'Castro', 'Rojas', 'Ortiz', 'Núñez', 'Luna', 'Juárez', 'Cabrera', 'Ríos'
+]
+
+# Proporción de pacientes por obra social ('' = sin obra social)
+OBRAS_SOCIALES = {
+    'OSDE': 0.20, 'IOMA': 0.15, 'Swiss Medical': 0.12, 'PAMI': 0.10, 'Galeno': 0.08,
+    'OSECAC': 0.08, 'Medifé': 0.05, 'OSDEPYM': 0.04, '': 0.18
+}
+
+# Proporción de estados de los turnos ya pasados (los futuros quedan 'programado')
+ESTADOS_TURNO = {'realizado': 0.78, 'cancelado': 0.12, 'ausente': 0.07, 'programado': 0.03}
+
+MOTIVOS_CONSULTA = [
+    'Ansiedad generalizada', 'Ataques de pánico', 'Duelo reciente', 'Conflictos de pareja',
+    'Estrés laboral', 'Síntomas depresivos', 'Dificultades en la crianza', 'Baja autoestima',
+    'Insomnio', 'Problemas de adaptación a un cambio', 'Consumo problemático', 'Orientación vocacional'
+]
+
+DERIVACIONES = ['', '', '', 'Médico clínico', 'Psiquiatra', 'Obra social', 'Escuela', 'Otro paciente']
+
+TIPOS_TURNO = {'sesion': 0.85, 'seguimiento': 0.10, 'evaluacion': 0.05}
+
+_VERBOS = ['Refiere', 'Manifiesta', 'Relata', 'Comenta', 'Describe']
+
+_NEGATIVAS = [
+    'ansiedad intensa antes de ir al trabajo', 'dificultad para dormir durante la semana',
+    'sentirse triste y sin energía', 'preocupación constante por su familia',
+    'una crisis de angustia el fin de semana', 'conflictos con su pareja que lo dejan mal',
+    'dolor de cabeza asociado al estrés laboral', 'recuerdos de la infancia que le generan malestar',
+    'problemas con su jefe y sus compañeros', 'poca confianza en sí mismo y baja autoestima',
+    'estar nervioso ante cualquier cambio de rutina', 'sentirse peor que al inicio del tratamiento'
+]
+
+_POSITIVAS = [
+    'una mejoría en el manejo de la ansiedad', 'sentirse mejor y más optimista',
+    'avances en la relación con su familia', 'un logro importante en el trabajo',
+    'estar contento con el progreso del tratamiento', 'dormir bien la mayor parte de la semana',
+    'más confianza para expresar lo que siente', 'estar satisfecho con los cambios en su rutina',
+    'un avance al enfrentar situaciones que antes evitaba', 'sentirse feliz después de retomar una amistad'
+]
+
+_TEMAS = [
+    'los vínculos familiares', 'la organización de la rutina diaria',
+    'las situaciones que disparan la angustia', 'los registros de pensamientos de la semana',
+    'la relación con sus compañeros de trabajo', 'estrategias de respiración y relajación',
+    'los objetivos planteados al inicio del tratamiento', 'recuerdos significativos de su historia',
+    'la comunicación con su pareja', 'la valoración que hace de sí mismo'
+]
+
+_ACCIONES = ['Se trabaja sobre', 'Se conversa acerca de', 'Se exploran', 'Se revisan', 'Se retoman']
+
+_COMPLEMENTOS = ['', ' desde la última sesión', ' en los últimos días', ' con mayor frecuencia', ' durante el mes']
+
+OBJETIVOS = [
+    'Reducir la ansiedad anticipatoria', 'Mejorar la calidad del sueño', 'Fortalecer la autoestima',
+    'Trabajar la comunicación con la pareja', 'Identificar pensamientos automáticos',
+    'Sostener una rutina de actividad física', 'Elaborar el duelo', 'Disminuir las conductas de evitación'
+]
+
+INTERVENCIONES = [
+    'Psicoeducación sobre ansiedad', 'Reestructuración cognitiva', 'Técnicas de respiración diafragmática',
+    'Registro de pensamientos', 'Escucha activa y validación emocional', 'Exposición gradual',
+    'Entrenamiento en resolución de problemas', 'Trabajo con genograma familiar'
+]
+
+PROXIMAS_SESIONES = [
+    'Revisar el registro de la semana', 'Continuar con el trabajo sobre autoestima',
+    'Evaluar la respuesta a la exposición', 'Retomar el tema familiar', 'Cerrar los objetivos del mes', ''
+]
+
+
+class GeneradorDatos:
+    """
+    Genera datos clínicos sintéticos con distribuciones configurables
+    
+    Las sesiones de cada paciente son aproximadamente semanales a partir de
+    su fecha de alta. Cada paciente tiene una tendencia (mejora, empeora o
+    se mantiene) que inclina el texto de sus notas hacia frases positivas o
+    negativas a lo largo del tratamiento, para que los análisis
+    longitudinales tengan algo que encontrar.
+    """
+    
+    LOTE = 50000  # Filas por executemany
+    
+    def __init__(self, semilla=1, duracion=(50, 8), oraciones=(3, 9), estados_turno=None,
+                 obras_sociales=None, concentracion=0.8, activos=0.8, inicio=date(2020, 1, 1), dias=2190):
+        """
+        Args:
+            semilla: Semilla del generador (mismos parámetros y semilla, mismos datos)
+            duracion: (media, desvío) en minutos de la duración de las sesiones
+            oraciones: (mínimo, máximo) de oraciones de las notas de cada sesión
+            estados_turno: Proporciones de estados de los turnos pasados (ver ESTADOS_TURNO)
+            obras_sociales: Proporción de pacientes por obra social (ver OBRAS_SOCIALES)
+            concentracion: Dispersión (log-normal) de la cantidad de sesiones
+                y turnos por paciente; 0 los reparte por igual
+            activos: Proporción de pacientes activos
+            inicio: Primera fecha posible de turnos y sesiones
+            dias: Cantidad de días del período generado
+        """
+        self.semilla = semilla
+        self.duracion = duracion
+        self.oraciones = oraciones
+        self.estados_turno = estados_turno or ESTADOS_TURNO
+        self.obras_sociales = obras_sociales or OBRAS_SOCIALES
+        self.concentracion = concentracion
+        self.activos = activos
+        self.inicio = np.datetime64(inicio, 'D')
+        self.dias = dias
+        
+        self.negativas = [f"{v} {t}{c}." for v in _VERBOS for t in _NEGATIVAS for c in _COMPLEMENTOS]
+        self.positivas = [f"{v} {t}{c}." for v in _VERBOS for t in _POSITIVAS for c in _COMPLEMENTOS]
+        self.neutras = [f"{a} {t}{c}." for a in _ACCIONES for t in _TEMAS for c in _COMPLEMENTOS]
+    
+    def generar(self, pacientes, turnos, sesiones, gestor=None):
+        """
+        Agrega los datos generados a una base conectada
+        
+        Args:
+            pacientes: Cantidad de pacientes
+            turnos: Cantidad total de turnos
+            sesiones: Cantidad total de sesiones
+            gestor: DatabaseManager conectado (por defecto la instancia global)
+        
+        Returns:
+            Dict con las cantidades insertadas, el primer ID de cada tabla y los segundos que llevó
+        """
+        gestor = gestor or db
+        azar = np.random.default_rng(self.semilla)
+        comienzo = time.perf_counter()
+        
+        primeros = {
+            tabla: gestor.fetch_one(f'SELECT COALESCE(MAX(id), 0) + 1 AS id FROM {tabla}')['id']
+            for tabla in ('pacientes', 'turnos', 'sesiones')
+        }
+        
+        # Escribir sin esperar al disco: si se interrumpe, la base se descarta
+        anteriores = {
+            pragma: gestor.connection.execute(f"PRAGMA {pragma}").fetchone()[0]
+            for pragma in ('synchronous', 'journal_mode')
+        }
+        gestor.connection.execute("PRAGMA synchronous = OFF")
+        gestor.connection.execute("PRAGMA journal_mode = MEMORY")
+        try:
+            with gestor.transaccion() as cursor:
+                altas = self._insertar_pacientes(cursor, azar, pacientes, primeros['pacientes'])
+                if pacientes:
+                    self._insertar_turnos(cursor, azar, turnos, altas, primeros['pacientes'])
+                    self._insertar_sesiones(cursor, azar, sesiones, altas, primeros['pacientes'])
+        finally:
+            gestor.connection.execute(f"PRAGMA journal_mode = {anteriores['journal_mode']}")
+            gestor.connection.execute(f"PRAGMA synchronous = {anteriores['synchronous']}")
+        
+        return {
+            'pacientes': pacientes,
+            'turnos': turnos if pacientes else 0,
+            'sesiones': sesiones if pacientes else 0,
+            'primeros_ids': primeros,
+            'segundos': time.perf_counter() - comienzo
+        }
+    
+    def _repartir(self, azar, total, cantidad):
+        """Reparte un total entre `cantidad` pacientes (sesgado según la concentración)"""
+        pesos = azar.lognormal(0.0, self.concentracion, cantidad) if self.concentracion else np.ones(cantidad)
+        return azar.multinomial(total, pesos / pesos.sum())
+    
+    def _elegir(self, azar, proporciones, cantidad):
+        """Elige `cantidad` claves de un dict de proporciones"""
+        claves = list(proporciones)
+        pesos = np.array([proporciones[c] for c in claves], dtype=np.float64)
+        return np.array(claves, dtype=object)[azar.choice(len(claves), cantidad, p=pesos / pesos.sum())]
+    
+    def _fechas(self, dias):
+        """Convierte días desde el inicio en fechas ISO"""
+        return (self.inicio + dias.astype('timedelta64[D]')).astype(str)
+    
+    def _calendario(self, azar, por_paciente, altas, intervalo_maximo):
+        """
+        Fechas (en días desde el inicio) de eventos periódicos de cada paciente
+        
+        Returns:
+            Tupla (paciente, posicion, dias): índice del paciente, número de
+            evento dentro del paciente y día, en orden cronológico por paciente
+        """
+        total = int(por_paciente.sum())
+        paciente = np.repeat(np.arange(len(por_paciente)), por_paciente)
+        inicios = np.concatenate(([0], np.cumsum(por_paciente)[:-1]))
+        posicion = np.arange(total) - inicios[paciente]
+        disponibles = np.maximum(self.dias - altas, 1)
+        intervalo = np.clip(disponibles // np.maximum(por_paciente, 1), 1, intervalo_maximo)
+        dias = altas[paciente] + posicion * intervalo[paciente] + azar.integers(0, 2, total)
+        return paciente, posicion, np.minimum(dias, self.dias - 1)
+    
+    def _insertar_pacientes(self, cursor, azar, cantidad, primer_id):
+        """Inserta los pacientes y devuelve el día de alta de cada uno"""
+        altas = azar.integers(0, max(self.dias - 30, 1), cantidad)
+        nombres = azar.integers(0, len(NOMBRES), cantidad)
+        apellidos = azar.integers(0, len(APELLIDOS), cantidad)
+        nacimientos = self._fechas(azar.integers(-25000, -6500, cantidad))
+        obras = self._elegir(azar, self.obras_sociales, cantidad)
+        motivos = azar.integers(0, len(MOTIVOS_CONSULTA), cantidad)
+        derivaciones = azar.integers(0, len(DERIVACIONES), cantidad)
+        activos = azar.random(cantidad) < self.activos
+        fechas_alta = self._fechas(altas)
+        
+        def filas():
+            for i in range(cantidad):
+                paciente_id = primer_id + i
+                nombre, apellido = NOMBRES[nombres[i]], APELLIDOS[apellidos[i]]
+                obra = obras[i]
+                yield (
+                    paciente_id, nombre, apellido, str(20000000 + paciente_id), nacimientos[i],
+                    f"11{40000000 + paciente_id * 7 % 59999999:08d}",
+                    f"{nombre.lower()}.{apellido.lower()}{paciente_id}@example.com",
+                    f"Calle {apellido} {100 + paciente_id % 4900}", obra,
+                    f"{paciente_id:010d}" if obra else '', MOTIVOS_CONSULTA[motivos[i]],
+                    DERIVACIONES[derivaciones[i]], fechas_alta[i], 'activo' if activos[i] else 'inactivo'
+                )
+        
+        self._insertar(cursor, '''
+            INSERT INTO pacientes (id, nombre, apellido, dni, fecha_nacimiento, telefono, email, direccion,
+                                   obra_social, numero_afiliado, motivo_consulta, derivado_por,
+                                   fecha_alta, estado)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', filas())
+        return altas
+    
+    def _insertar_turnos(self, cursor, azar, cantidad, altas, primer_paciente):
+        """Inserta los turnos, semanales desde el alta de cada paciente"""
+        por_paciente = self._repartir(azar, cantidad, len(altas))
+        paciente, _, dias = self._calendario(azar, por_paciente, altas, 7)
+        fechas = self._fechas(dias)
+        horas = azar.integers(8, 21, cantidad)
+        estados = self._elegir(azar, self.estados_turno, cantidad)
+        # Los turnos de los últimos 30 días del período todavía no ocurrieron
+        estados[dias >= self.dias - 30] = 'programado'
+        tipos = self._elegir(azar, TIPOS_TURNO, cantidad)
+        
+        def filas():
+            for i in range(cantidad):
+                yield (
+                    primer_paciente + int(paciente[i]), fechas[i], f"{horas[i]:02d}:00", f"{horas[i]:02d}:50",
+                    estados[i], tipos[i], int(estados[i] == 'realizado')
+                )
+        
+        self._insertar(cursor, '''
+            INSERT INTO turnos (paciente_id, fecha, hora_inicio, hora_fin, estado, tipo, recordatorio_enviado)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', filas())
+    
+    def _insertar_sesiones(self, cursor, azar, cantidad, altas, primer_paciente):
+        """Inserta las sesiones, con notas cuyo tono sigue la tendencia de cada paciente"""
+        por_paciente = self._repartir(azar, cantidad, len(altas))
+        paciente, posicion, dias = self._calendario(azar, por_paciente, altas, 14)
+        fechas = self._fechas(dias)
+        duraciones = np.clip(np.rint(azar.normal(*self.duracion, cantidad)), 20, 120).astype(np.int64)
+        
+        # Oraciones de las notas: cada una es negativa, neutra o positiva con
+        # una probabilidad que se desplaza con el avance del tratamiento
+        minimo, maximo = self.oraciones
+        largos = azar.integers(minimo, maximo + 1, cantidad)
+        sesion = np.repeat(np.arange(cantidad), largos)
+        avance = posicion / np.maximum(por_paciente[paciente] - 1, 1) * 2 - 1
+        tendencia = azar.uniform(-1, 1, len(altas))
+        sesgo = (0.3 * tendencia[paciente] * avance)[sesion]
+        sorteo = azar.random(len(sesion))
+        negativa = sorteo < 0.3 - sesgo
+        positiva = sorteo > 0.7 - sesgo
+        
+        frases = np.array(self.neutras, dtype=object)[azar.integers(0, len(self.neutras), len(sesion))]
+        frases[negativa] = np.array(self.negativas, dtype=object)[azar.integers(0, len(self.negativas), negativa.sum())]
+        frases[positiva] = np.array(self.positivas, dtype=object)[azar.integers(0, len(self.positivas), positiva.sum())]
+        frases = frases.tolist()
+        limites = np.concatenate(([0], np.cumsum(largos))).tolist()
+        
+        objetivos = azar.integers(0, len(OBJETIVOS), cantidad)
+        intervenciones = azar.integers(0, len(INTERVENCIONES), cantidad)
+        proximas = azar.integers(0, len(PROXIMAS_SESIONES), cantidad)
+        observaciones = azar.random(cantidad) < 0.3
+        
+        def filas():
+            for i in range(cantidad):
+                yield (
+                    primer_paciente + int(paciente[i]), fechas[i], int(duraciones[i]),
+                    " ".join(frases[limites[i]:limites[i + 1]]), OBJETIVOS[objetivos[i]],
+                    INTERVENCIONES[intervenciones[i]],
+                    frases[limites[i]] if observaciones[i] else '', PROXIMAS_SESIONES[proximas[i]]
+                )
+        
+        self._insertar(cursor, '''
+            INSERT INTO sesiones (paciente_id, fecha, duracion, notas, objetivos, intervenciones,
+                                  observaciones, proxima_sesion)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', filas())
+    
+    def _insertar(self, cursor, query, filas):
+        """Inserta las filas de un generador en lotes de LOTE"""
+        lote = []
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) == self.LOTE:
+                cursor.executemany(query, lote)
+                lote = []
+        if lote:
+            cursor.executemany(query, lote)
+
+
+def _proporciones(texto):
+    """Convierte 'clave=peso,clave=peso' en un dict de proporciones"""
+    proporciones = {}
+    for par in texto.split(','):
+        clave, _, peso = par.partition('=')
+        proporciones[clave.strip()] = float(peso)
+    return proporciones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera una base de datos con datos clínicos sintéticos")
+    parser.add_argument('ruta', help="Archivo de la base de datos (se crea si no existe)")
+    parser.add_argument('--pacientes', type=int, default=1000)
+    parser.add_argument('--turnos', type=int, default=30000)
+    parser.add_argument('--sesiones', type=int, default=25000)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--duracion', type=float, nargs=2, default=(50, 8), metavar=('MEDIA', 'DESVIO'),
+                        help="Duración de las sesiones en minutos")
+    parser.add_argument('--oraciones', type=int, nargs=2, default=(3, 9), metavar=('MIN', 'MAX'),
+                        help="Oraciones de las notas de cada sesión")
+    parser.add_argument('--estados-turno', type=_proporciones, metavar='ESTADO=PESO,...',
+                        help="Proporción de estados de los turnos pasados")
+    parser.add_argument('--obras-sociales', type=_proporciones, metavar='NOMBRE=PESO,...',
+                        help="Proporción de pacientes por obra social (nombre vacío: sin obra social)")
+    parser.add_argument('--concentracion', type=float, default=0.8,
+                        help="Dispersión de sesiones y turnos por paciente (0: iguales)")
+    args = parser.parse_args()
+    
+    if Path(args.ruta).exists():
+        print(f"{args.ruta} ya existe: los datos se agregan a los que tiene", file=sys.stderr)
+    
+    gestor = DatabaseManager(args.ruta)
+    gestor.connect()
+    try:
+        generador = GeneradorDatos(
+            semilla=args.semilla, duracion=tuple(args.duracion), oraciones=tuple(args.oraciones),
+            estados_turno=args.estados_turno, obras_sociales=args.obras_sociales,
+            concentracion=args.concentracion
+        )
+        resumen = generador.generar(args.pacientes, args.turnos, args.sesiones, gestor)
+        gestor.execute_query('ANALYZE')
+    finally:
+        gestor.disconnect()
+    
+    print(f"{resumen['pacientes']} pacientes, {resumen['turnos']} turnos y {resumen['sesiones']} sesiones "
+          f"generados en {resumen['segundos']:.1f} s")
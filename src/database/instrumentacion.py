@@ -0,0 +1,156 @@
+"""
+Instrumentación de consultas SQL
+Mide cada sentencia ejecutada por DatabaseManager, acumula histogramas de
+tiempos por sentencia (normalizada) y registra las lentas en un log junto
+con su plan de ejecución
+"""
+import bisect
+import json
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+_PATRON_CADENA = re.compile(r"'(?:[^']|'')*'")
+_PATRON_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PATRON_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_PATRON_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_sql(query: str) -> str:
+    """
+    Normaliza una sentencia para agrupar las que solo difieren en valores
+    
+    Colapsa espacios, reemplaza literales por ? y las listas IN (?, ?, ...)
+    de cualquier largo por una sola forma.
+    """
+    sql = _PATRON_CADENA.sub("?", query)
+    sql = _PATRON_NUMERO.sub("?", sql)
+    sql = _PATRON_LISTA.sub("(?, ...)", sql)
+    return _PATRON_ESPACIOS.sub(" ", sql).strip()
+
+
+class EstadisticaSentencia:
+    """Tiempos acumulados de una sentencia normalizada"""
+    
+    # Límites superiores (en ms) de los intervalos del histograma
+    LIMITES_MS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, float('inf')]
+    
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.ejecuciones = 0
+        self.total_ms = 0.0
+        self.maximo_ms = 0.0
+        self.filas = 0
+        self.parametros = 0
+        self.histograma = [0] * len(self.LIMITES_MS)
+    
+    def agregar(self, ms: float, filas: int, parametros: int):
+        self.ejecuciones += 1
+        self.total_ms += ms
+        self.maximo_ms = max(self.maximo_ms, ms)
+        self.filas += max(filas, 0)
+        self.parametros = parametros
+        self.histograma[bisect.bisect_left(self.LIMITES_MS, ms)] += 1
+    
+    @property
+    def promedio_ms(self) -> float:
+        return self.total_ms / self.ejecuciones if self.ejecuciones else 0.0
+    
+    def percentil_ms(self, percentil: float) -> float:
+        """Percentil aproximado: límite superior del intervalo que lo contiene (acotado al máximo)"""
+        objetivo = percentil / 100 * self.ejecuciones
+        acumulado = 0
+        for limite, cantidad in zip(self.LIMITES_MS, self.histograma):
+            acumulado += cantidad
+            if cantidad and acumulado >= objetivo:
+                return min(limite, self.maximo_ms)
+        return self.maximo_ms
+    
+    def a_dict(self) -> Dict:
+        return {
+            'sql': self.sql,
+            'ejecuciones': self.ejecuciones,
+            'total_ms': self.total_ms,
+            'promedio_ms': self.promedio_ms,
+            'p50_ms': self.percentil_ms(50),
+            'p95_ms': self.percentil_ms(95),
+            'maximo_ms': self.maximo_ms,
+            'filas_promedio': self.filas / self.ejecuciones if self.ejecuciones else 0,
+            'parametros': self.parametros,
+            'histograma': list(zip(self.LIMITES_MS, self.histograma))
+        }
+
+
+class InstrumentacionConsultas:
+    """
+    Acumula los tiempos de las consultas y registra las lentas
+    
+    Cada línea del log de consultas lentas es un objeto JSON con la fecha,
+    la sentencia, la cantidad de parámetros, las filas, los milisegundos y
+    el resultado de EXPLAIN QUERY PLAN.
+    """
+    
+    MAX_BYTES_LOG = 5 * 1024 * 1024  # Al superarlo el log se rota a .1
+    
+    def __init__(self, umbral_ms: float = 100, ruta_log="data/logs/consultas_lentas.log"):
+        """
+        Args:
+            umbral_ms: Duración a partir de la cual una consulta se considera lenta
+            ruta_log: Archivo del log de consultas lentas
+        """
+        self.umbral_ms = umbral_ms
+        self.ruta_log = Path(ruta_log)
+        self._sentencias = {}
+    
+    def registrar(self, conexion, query: str, params, filas: int, inicio: float):
+        """
+        Registra una sentencia ya ejecutada
+        
+        Args:
+            conexion: Conexión usada (para obtener el plan si fue lenta)
+            query: Texto de la sentencia
+            params: Parámetros usados
+            filas: Filas devueltas (o afectadas, en escrituras)
+            inicio: time.perf_counter() tomado antes de ejecutarla
+        """
+        ms = (time.perf_counter() - inicio) * 1000
+        sql = normalizar_sql(query)
+        estadistica = self._sentencias.get(sql)
+        if estadistica is None:
+            estadistica = self._sentencias[sql] = EstadisticaSentencia(sql)
+        parametros = len(params) if params else 0
+        estadistica.agregar(ms, filas, parametros)
+        
+        if ms >= self.umbral_ms:
+            self._registrar_lenta(conexion, query, params, sql, parametros, filas, ms)
+    
+    def estadisticas(self) -> List[Dict]:
+        """Estadísticas por sentencia, de mayor a menor tiempo total"""
+        return sorted((e.a_dict() for e in self._sentencias.values()),
+                      key=lambda e: e['total_ms'], reverse=True)
+    
+    def reiniciar(self):
+        """Descarta las estadísticas acumuladas"""
+        self._sentencias = {}
+    
+    def _registrar_lenta(self, conexion, query, params, sql, parametros, filas, ms):
+        try:
+            plan = [fila[-1] for fila in conexion.execute(f"EXPLAIN QUERY PLAN {query}", params or ())]
+        except Exception as e:
+            plan = [f"(sin plan: {e})"]
+        
+        registro = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'ms': round(ms, 3),
+            'sql': sql,
+            'parametros': parametros,
+            'filas': filas,
+            'plan': plan
+        }
+        self.ruta_log.parent.mkdir(parents=True, exist_ok=True)
+        if self.ruta_log.exists() and self.ruta_log.stat().st_size > self.MAX_BYTES_LOG:
+            self.ruta_log.replace(self.ruta_log.with_name(self.ruta_log.name + '.1'))
+        with open(self.ruta_log, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
@@ -0,0 +1,134 @@
+"""
+Bases en memoria para pruebas y benchmarks
+Genera una sola vez una base sembrada (ver generador_datos) y entrega
+copias en memoria hechas con la API de backup de SQLite, así cada prueba
+parte de los mismos datos sin crear archivos ni esperar fsync.
+
+Con pytest, por ejemplo:
+
+    plantilla = PlantillaMemoria(pacientes=50, turnos=1500, sesiones=1000)
+
+    @pytest.fixture
+    def contexto():
+        with plantilla.contexto() as contexto:
+            yield contexto
+
+Uso (mide la generación y cada copia):
+    python -m src.database.plantilla_memoria --sesiones 5000 --copias 50
+"""
+import argparse
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from src.contexto import ContextoAplicacion, usar_contexto
+from src.database.db_manager import DatabaseManager
+from src.database.generador_datos import GeneradorDatos
+
+
+class PlantillaMemoria:
+    """
+    Base sembrada en memoria, generada al primer uso, de la que se sacan copias
+    
+    Las copias son independientes entre sí y de la plantilla: lo que una
+    prueba escribe no lo ve la siguiente.
+    """
+    
+    def __init__(self, pacientes=200, turnos=6000, sesiones=5000, semilla=1):
+        """
+        Args:
+            pacientes, turnos, sesiones: Cantidades a generar
+            semilla: Semilla del generador (los mismos datos en cada ejecución)
+        """
+        self.pacientes = pacientes
+        self.turnos = turnos
+        self.sesiones = sesiones
+        self.semilla = semilla
+        self.resumen = None  # El de GeneradorDatos.generar (incluye primeros_ids)
+        self._gestor = None
+    
+    @property
+    def gestor(self) -> DatabaseManager:
+        """Gestor de la plantilla (se genera la primera vez)"""
+        if self._gestor is None:
+            gestor = DatabaseManager.crear_en_memoria()
+            gestor.connect()
+            self.resumen = GeneradorDatos(semilla=self.semilla).generar(
+                self.pacientes, self.turnos, self.sesiones, gestor
+            )
+            gestor.execute_query('ANALYZE')
+            self._gestor = gestor
+        return self._gestor
+    
+    def clonar(self, nombre: str = None) -> DatabaseManager:
+        """
+        Copia nueva de la plantilla
+        
+        Args:
+            nombre: Si se indica, la copia es una base en memoria compartida con
+                ese nombre (ver DatabaseManager.crear_en_memoria)
+        
+        Returns:
+            DatabaseManager conectado a la copia
+        """
+        return self.gestor.clonar_en_memoria(nombre)
+    
+    @contextmanager
+    def contexto(self):
+        """
+        Contexto de aplicación sobre una copia nueva, activo durante el bloque
+        
+        Los controladores y las vistas usan la copia a través de los nombres
+        globales. La configuración, los backups y la caché del LLM van a un
+        directorio temporal que se borra al salir, junto con la copia.
+        """
+        with tempfile.TemporaryDirectory() as directorio:
+            raiz = Path(directorio)
+            contexto = ContextoAplicacion(directorio_config=raiz / 'config',
+                                          directorio_backups=raiz / 'backups',
+                                          directorio_cache_llm=raiz / 'llm_cache',
+                                          gestor=self.clonar())
+            with usar_contexto(contexto):
+                yield contexto
+    
+    def cerrar(self):
+        """Libera la plantilla (se vuelve a generar si se pide otra copia)"""
+        if self._gestor is not None:
+            self._gestor.disconnect()
+            self._gestor = None
+
+
+if __name__ == "__main__":
+    from src.controllers.paciente_controller import PacienteController
+    from src.controllers.sesion_controller import SesionController
+    
+    parser = argparse.ArgumentParser(description="Mide la creación de bases de prueba en memoria")
+    parser.add_argument('--pacientes', type=int, default=200)
+    parser.add_argument('--turnos', type=int, default=6000)
+    parser.add_argument('--sesiones', type=int, default=5000)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--copias', type=int, default=50)
+    args = parser.parse_args()
+    
+    plantilla = PlantillaMemoria(args.pacientes, args.turnos, args.sesiones, args.semilla)
+    inicio = time.perf_counter()
+    plantilla.gestor
+    print(f"Plantilla generada en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+          f"({plantilla.gestor.tamaño_archivo() / 1024:.0f} KB)")
+    
+    paciente_id = plantilla.resumen['primeros_ids']['pacientes']
+    copias, totales = [], []
+    for _ in range(args.copias):
+        inicio = time.perf_counter()
+        with plantilla.contexto() as contexto:
+            copias.append(time.perf_counter() - inicio)
+            # Una prueba típica: leer, escribir y volver a leer
+            PacienteController.obtener_todos_pacientes()
+            SesionController.obtener_sesiones_paciente(paciente_id)
+            contexto.db.execute_query("UPDATE pacientes SET notas = 'prueba' WHERE id = ?", (paciente_id,))
+            PacienteController.obtener_paciente(paciente_id)
+        totales.append(time.perf_counter() - inicio)
+    plantilla.cerrar()
+    
+    print(f"{args.copias} copias: {sum(copias) / len(copias) * 1000:.2f} ms por copia, "
+          f"{sum(totales) / len(totales) * 1000:.2f} ms por prueba (copia, consultas y cierre)")
@@ -0,0 +1,260 @@
+"""
+Verificación de planes de consulta
+Ejecuta cada método de PacienteController, TurnoController y SesionController
+sobre una base de datos temporal con datos generados, captura las sentencias
+que ejecutan y revisa su EXPLAIN QUERY PLAN: falla si una tabla grande se
+recorre completa (SCAN) o si un ORDER BY necesita un árbol temporal.
+
+Uso:
+    python -m src.database.verificar_planes              # verificar
+    python -m src.database.verificar_planes --actualizar # guardar los planes como referencia
+
+Cuando un plan cambia respecto de la referencia (planes_consultas.json) se
+muestra la diferencia, para ver qué índice dejó de usarse.
+"""
+import argparse
+import difflib
+import inspect
+import json
+import re
+import sys
+import tempfile
+from pathlib import Path
+from src.contexto import ContextoAplicacion, usar_contexto
+from src.database.db_manager import db
+from src.database.generador_datos import GeneradorDatos
+
+RUTA_REFERENCIA = Path(__file__).with_name('planes_consultas.json')
+
+# Tablas con al menos esta cantidad de filas se consideran grandes
+UMBRAL_FILAS = 1000
+
+# Métodos que no pueden evitar un recorrido completo, con el motivo
+PERMITIDOS = {
+    'PacienteController.buscar_pacientes': "LIKE '%...%' sobre varias columnas no puede usar índices",
+}
+
+_PATRON_TABLAS = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|JOIN|ON|ORDER|GROUP|LEFT|INNER|SET|LIMIT|VALUES)(\w+))?",
+    re.IGNORECASE
+)
+_PATRON_VALORES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def poblar(pacientes=2000, sesiones_por_paciente=10, turnos_por_paciente=10, semilla=1):
+    """
+    Carga datos generados en la base conectada (ver generador_datos)
+    
+    Returns:
+        Dict con IDs de ejemplo para los escenarios
+    """
+    resumen = GeneradorDatos(semilla=semilla).generar(
+        pacientes, pacientes * turnos_por_paciente, pacientes * sesiones_por_paciente
+    )
+    # Estadísticas para que el planificador elija como lo haría con datos reales
+    db.execute_query('ANALYZE')
+    
+    sesion_id = resumen['primeros_ids']['sesiones'] + resumen['sesiones'] // 2
+    turno_id = resumen['primeros_ids']['turnos'] + resumen['turnos'] // 2
+    return {
+        'paciente_id': db.fetch_one('SELECT paciente_id FROM sesiones WHERE id = ?', (sesion_id,))['paciente_id'],
+        'turno_id': turno_id,
+        'sesion_id': sesion_id,
+        'fecha': db.fetch_one('SELECT fecha FROM turnos WHERE id = ?', (turno_id,))['fecha']
+    }
+
+
+def escenarios(ids):
+    """
+    Llamadas a cada método público de los controladores verificados
+    
+    Returns:
+        Tupla (escenarios, controladores): lista de (nombre del método,
+        función sin argumentos) y las clases cuyos métodos deben cubrirse
+    """
+    from src.controllers.paciente_controller import PacienteController
+    from src.controllers.turno_controller import TurnoController
+    from src.controllers.sesion_controller import SesionController
+    from src.models.paciente import Paciente
+    from src.models.turno import Turno
+    from src.models.sesion import Sesion
+    
+    paciente_id, turno_id, sesion_id = ids['paciente_id'], ids['turno_id'], ids['sesion_id']
+    paciente = PacienteController.obtener_paciente(paciente_id)
+    turno = TurnoController.obtener_turno(turno_id)
+    sesion = SesionController.obtener_sesion(sesion_id)
+    nueva_sesion = Sesion(paciente_id=paciente_id, fecha=ids['fecha'], notas="Sesión nueva de prueba")
+    
+    return [
+        ('PacienteController.crear_paciente',
+         lambda: PacienteController.crear_paciente(Paciente(nombre="Nuevo", apellido="Paciente", dni="1"))),
+        ('PacienteController.obtener_paciente', lambda: PacienteController.obtener_paciente(paciente_id)),
+        ('PacienteController.obtener_todos_pacientes', lambda: PacienteController.obtener_todos_pacientes()),
+        ('PacienteController.obtener_todos_pacientes',
+         lambda: PacienteController.obtener_todos_pacientes(estado='activo')),
+        ('PacienteController.buscar_pacientes', lambda: PacienteController.buscar_pacientes("Apellido1")),
+        ('PacienteController.actualizar_paciente', lambda: PacienteController.actualizar_paciente(paciente)),
+        ('PacienteController.eliminar_paciente', lambda: PacienteController.eliminar_paciente(paciente_id + 1)),
+        ('PacienteController.contar_pacientes_activos', lambda: PacienteController.contar_pacientes_activos()),
+        
+        ('TurnoController.crear_turno',
+         lambda: TurnoController.crear_turno(Turno(paciente_id=paciente_id, fecha=ids['fecha'], hora_inicio="10:00"))),
+        ('TurnoController.obtener_turno', lambda: TurnoController.obtener_turno(turno_id)),
+        ('TurnoController.obtener_turnos_fecha', lambda: TurnoController.obtener_turnos_fecha(ids['fecha'])),
+        ('TurnoController.obtener_turnos_paciente', lambda: TurnoController.obtener_turnos_paciente(paciente_id)),
+        ('TurnoController.obtener_turnos_hoy', lambda: TurnoController.obtener_turnos_hoy()),
+        ('TurnoController.obtener_proximos_turnos', lambda: TurnoController.obtener_proximos_turnos()),
+        ('TurnoController.actualizar_turno', lambda: TurnoController.actualizar_turno(turno)),
+        ('TurnoController.eliminar_turno', lambda: TurnoController.eliminar_turno(turno_id + 1)),
+        ('TurnoController.contar_turnos_hoy', lambda: TurnoController.contar_turnos_hoy()),
+        
+        ('SesionController.crear_sesion', lambda: SesionController.crear_sesion(nueva_sesion)),
+        ('SesionController.obtener_sesion', lambda: SesionController.obtener_sesion(sesion_id)),
+        ('SesionController.obtener_sesiones_paciente',
+         lambda: SesionController.obtener_sesiones_paciente(paciente_id)),
+        ('SesionController.obtener_sesiones_modificadas',
+         lambda: SesionController.obtener_sesiones_modificadas(paciente_id, '2000-01-01')),
+        ('SesionController.obtener_ultima_sesion', lambda: SesionController.obtener_ultima_sesion(paciente_id)),
+        ('SesionController.obtener_sesiones_pacientes_activos',
+         lambda: SesionController.obtener_sesiones_pacientes_activos(sesion_id, 500)),
+        ('SesionController.contar_sesiones_pacientes_activos',
+         lambda: SesionController.contar_sesiones_pacientes_activos(sesion_id)),
+        ('SesionController.actualizar_sesion', lambda: SesionController.actualizar_sesion(sesion)),
+        ('SesionController.buscar_sesiones_similares',
+         lambda: SesionController.buscar_sesiones_similares(sesion)),
+        ('SesionController.contar_sesiones_paciente', lambda: SesionController.contar_sesiones_paciente(paciente_id)),
+        ('SesionController.buscar_en_sesiones', lambda: SesionController.buscar_en_sesiones(paciente_id, "notas")),
+        ('SesionController.eliminar_sesion', lambda: SesionController.eliminar_sesion(nueva_sesion.id)),
+    ], [PacienteController, TurnoController, SesionController]
+
+
+def capturar(funcion):
+    """Ejecuta una función y devuelve las sentencias SQL (con valores) que ejecutó"""
+    sentencias = []
+    db.connection.set_trace_callback(sentencias.append)
+    try:
+        funcion()
+    finally:
+        db.connection.set_trace_callback(None)
+    return [s for s in sentencias if s.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH'))]
+
+
+def plan(sentencia):
+    """Líneas de EXPLAIN QUERY PLAN de una sentencia (indentadas según el árbol)"""
+    filas = db.connection.execute(f"EXPLAIN QUERY PLAN {sentencia}").fetchall()
+    niveles = {0: -1}
+    lineas = []
+    for fila in filas:
+        nivel = niveles.get(fila[1], -1) + 1
+        niveles[fila[0]] = nivel
+        lineas.append("  " * nivel + fila[3])
+    return lineas
+
+
+def problemas(sentencia, lineas, grandes):
+    """Detecta recorridos completos de tablas grandes y ordenamientos sin índice"""
+    tablas = {}
+    for tabla, alias in _PATRON_TABLAS.findall(sentencia):
+        tablas[tabla] = tabla
+        if alias:
+            tablas[alias] = tabla
+    
+    encontrados = []
+    for linea in lineas:
+        detalle = linea.strip()
+        if detalle.startswith('SCAN ') and ' USING ' not in detalle:
+            tabla = tablas.get(detalle.split()[1], detalle.split()[1])
+            if tabla in grandes:
+                encontrados.append(f"recorre completa la tabla grande '{tabla}'")
+        if detalle.startswith('USE TEMP B-TREE FOR') and 'ORDER BY' in detalle:
+            encontrados.append("ordena con un árbol temporal (ORDER BY sin índice)")
+    return encontrados
+
+
+def verificar(actualizar=False, salida=sys.stdout):
+    """
+    Verifica los planes de todas las sentencias de los controladores
+    
+    Args:
+        actualizar: Guardar los planes actuales como nueva referencia
+        salida: Dónde escribir el informe
+    
+    Returns:
+        Cantidad de sentencias con problemas
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        with usar_contexto(ContextoAplicacion.en_directorio(directorio)) as contexto:
+            contexto.db.connect()
+            return _verificar(actualizar, salida)
+
+
+def _verificar(actualizar, salida):
+    from src.controllers.corpus_controller import CorpusController
+    from src.controllers.similitud_controller import SimilitudController
+    
+    ids = poblar()
+    # Construir antes los índices derivados: su reconstrucción no es parte de los escenarios
+    CorpusController.estadisticas(reconstruir=True)
+    SimilitudController.indice(reconstruir=True)
+    
+    grandes = {
+        tabla for (tabla,) in db.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        if db.connection.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0] >= UMBRAL_FILAS
+    }
+    referencia = json.loads(RUTA_REFERENCIA.read_text(encoding='utf-8')) if RUTA_REFERENCIA.exists() else {}
+    
+    lista, controladores = escenarios(ids)
+    cubiertos = {nombre for nombre, _ in lista}
+    sin_escenario = [
+        f"{c.__name__}.{nombre}" for c in controladores
+        for nombre, _ in inspect.getmembers(c, inspect.isfunction)
+        if not nombre.startswith('_') and f"{c.__name__}.{nombre}" not in cubiertos
+    ]
+    
+    planes = {}
+    fallas = 0
+    for nombre, funcion in lista:
+        for sentencia in capturar(funcion):
+            clave = f"{nombre}: {_PATRON_VALORES.sub('?', ' '.join(sentencia.split()))}"
+            if clave in planes:
+                continue
+            lineas = plan(sentencia)
+            planes[clave] = lineas
+            
+            encontrados = [] if nombre in PERMITIDOS else problemas(sentencia, lineas, grandes)
+            anterior = referencia.get(clave)
+            cambio = anterior is not None and anterior != lineas
+            if not encontrados and not cambio:
+                continue
+            
+            fallas += bool(encontrados)
+            print(f"{'FALLA' if encontrados else 'CAMBIO'} {clave}", file=salida)
+            for problema in encontrados:
+                print(f"  - {problema}", file=salida)
+            # Con referencia se muestra qué cambió; sin ella, el plan completo
+            if cambio:
+                detalle = difflib.unified_diff(anterior, lineas, 'referencia', 'actual', lineterm='')
+            else:
+                detalle = lineas
+            for linea in detalle:
+                print(f"    {linea}", file=salida)
+    
+    for nombre in sin_escenario:
+        fallas += 1
+        print(f"FALLA {nombre}: no tiene escenario en verificar_planes.escenarios", file=salida)
+    
+    print(f"{len(planes)} sentencias verificadas, {fallas} con problemas "
+          f"(tablas grandes: {', '.join(sorted(grandes))})", file=salida)
+    
+    if actualizar:
+        RUTA_REFERENCIA.write_text(json.dumps(planes, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+        print(f"Referencia guardada en {RUTA_REFERENCIA}", file=salida)
+    return fallas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica los planes de las consultas de los controladores")
+    parser.add_argument('--actualizar', action='store_true', help="Guardar los planes actuales como referencia")
+    args = parser.parse_args()
+    
+    sys.exit(1 if verificar(args.actualizar) else 0)
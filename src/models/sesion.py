@@ -21,6 +21,12 @@ class Sesion:
         self.created_at = created_at
         self.updated_at = updated_at
     
+    @property
+    def texto_analisis(self):
+        """Texto de la sesión que se usa para el análisis con IA"""
+        campos = (self.objetivos, self.notas, self.intervenciones, self.observaciones)
+        return " ".join(campo for campo in campos if campo)
+    
     def to_dict(self):
         return {
             'id': self.id,
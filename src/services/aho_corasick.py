@@ -0,0 +1,119 @@
+"""
+Autómata Aho-Corasick
+Búsqueda de muchos términos a la vez en una sola pasada sobre el texto
+"""
+from collections import deque
+from typing import List, Tuple
+
+class AutomataAhoCorasick:
+    """
+    Buscador de múltiples patrones construido una sola vez
+    
+    El costo de una búsqueda es lineal en el largo del texto más la cantidad
+    de coincidencias, sin importar cuántos términos tenga el léxico. Solo se
+    informan coincidencias de palabras completas: el carácter anterior y el
+    posterior a la coincidencia no pueden ser letras ni dígitos.
+    
+    Uso:
+        automata = AutomataAhoCorasick()
+        automata.agregar("ansiedad", "ansiedad")
+        automata.construir()
+        automata.buscar(texto)  # [(inicio, fin, patron, valor), ...]
+    """
+    
+    def __init__(self):
+        self._transiciones = [{}]
+        self._fallo = [0]
+        self._salidas = [[]]
+        self._patrones = []
+        self._construido = False
+    
+    def __len__(self):
+        return len(self._patrones)
+    
+    def agregar(self, patron: str, valor=None):
+        """
+        Agrega un término al autómata
+        
+        Args:
+            patron: Texto a buscar (debe estar normalizado igual que el texto)
+            valor: Dato asociado que se devuelve con cada coincidencia
+        """
+        if not patron:
+            return
+        
+        estado = 0
+        for caracter in patron:
+            siguiente = self._transiciones[estado].get(caracter)
+            if siguiente is None:
+                siguiente = len(self._transiciones)
+                self._transiciones.append({})
+                self._fallo.append(0)
+                self._salidas.append([])
+                self._transiciones[estado][caracter] = siguiente
+            estado = siguiente
+        
+        self._salidas[estado].append(len(self._patrones))
+        self._patrones.append((patron, valor))
+        self._construido = False
+    
+    def construir(self):
+        """Calcula los enlaces de fallo (recorrido en anchura del trie)"""
+        cola = deque()
+        for estado in self._transiciones[0].values():
+            self._fallo[estado] = 0
+            cola.append(estado)
+        
+        while cola:
+            actual = cola.popleft()
+            for caracter, siguiente in self._transiciones[actual].items():
+                cola.append(siguiente)
+                fallo = self._fallo[actual]
+                while fallo and caracter not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._transiciones[fallo].get(caracter, 0)
+                self._fallo[siguiente] = destino if destino != siguiente else 0
+                # Heredar las salidas del sufijo más largo
+                self._salidas[siguiente] = self._salidas[siguiente] + self._salidas[self._fallo[siguiente]]
+        
+        self._construido = True
+    
+    def buscar(self, texto: str) -> List[Tuple[int, int, str, object]]:
+        """
+        Busca todas las apariciones de los términos en el texto
+        
+        Args:
+            texto: Texto normalizado igual que los patrones
+        
+        Returns:
+            Lista de (inicio, fin, patron, valor) ordenada por posición de fin
+        """
+        if not self._construido:
+            self.construir()
+        
+        transiciones = self._transiciones
+        fallo = self._fallo
+        salidas = self._salidas
+        coincidencias = []
+        estado = 0
+        
+        for posicion, caracter in enumerate(texto):
+            while estado and caracter not in transiciones[estado]:
+                estado = fallo[estado]
+            estado = transiciones[estado].get(caracter, 0)
+            
+            if not salidas[estado]:
+                continue
+            
+            fin = posicion + 1
+            if fin < len(texto) and texto[fin].isalnum():
+                continue
+            
+            for indice in salidas[estado]:
+                patron, valor = self._patrones[indice]
+                inicio = fin - len(patron)
+                if inicio > 0 and texto[inicio - 1].isalnum():
+                    continue
+                coincidencias.append((inicio, fin, patron, valor))
+        
+        return coincidencias
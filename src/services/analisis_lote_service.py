@@ -0,0 +1,192 @@
+"""
+Análisis por lotes de toda la clínica
+Recorre las sesiones de todos los pacientes activos y guarda su análisis
+local (palabras clave, sentimiento y temas) en analisis_ia, repartiendo el
+cálculo entre varios procesos. Pensado para correr de noche, sin interfaz:
+
+    python -m src.services.analisis_lote_service --procesos 4
+
+Si se interrumpe, la próxima ejecución continúa desde la última sesión
+guardada (salvo con --desde-cero).
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+from src.database.db_manager import db
+from src.controllers.sesion_controller import SesionController
+from src.controllers.analisis_controller import AnalisisController
+from src.controllers.corpus_controller import CorpusController
+from src.services.ia_analysis_service import ia_service
+from src.services.metricas import metricas
+
+# Clave en la tabla configuracion con el ID de la última sesión procesada
+CLAVE_CHECKPOINT = 'analisis_lote_ultima_sesion'
+
+_DURACION_ANALISIS = metricas.histograma('psicolarg_analisis_segundos', "Duración de los análisis",
+                                         ('tipo',))
+_SESIONES_LOTE = metricas.contador('psicolarg_analisis_lote_sesiones_total',
+                                   "Sesiones analizadas por el análisis por lotes")
+
+
+def _inicializar_proceso(lexico_temas: Dict, corpus):
+    """Deja cada proceso del pool con el mismo léxico de temas y corpus que el principal"""
+    ia_service.cargar_lexico_temas(lexico_temas)
+    ia_service.corpus = corpus
+
+
+def _analizar_textos(items: List[Tuple[int, str]]) -> Tuple[List[Tuple[int, Dict]], float]:
+    """
+    Analiza una tarea en un proceso del pool
+    
+    Returns:
+        ([(sesion_id, analisis)], segundos de CPU usados)
+    """
+    inicio = time.process_time()
+    resultados = [(sesion_id, ia_service._analisis_basico(texto)) for sesion_id, texto in items]
+    return resultados, time.process_time() - inicio
+
+
+class AnalisisLoteService:
+    """
+    Servicio de análisis por lotes
+    
+    Etapas por bloque: lectura (consulta paginada), análisis (en el pool de
+    procesos, mientras se lee el bloque siguiente) y escritura (una
+    transacción por bloque, seguida del avance del checkpoint).
+    """
+    
+    TAMAÑO_BLOQUE = 500  # Sesiones leídas por consulta y escritas por transacción
+    TAMAÑO_TAREA = 50    # Sesiones por tarea enviada al pool
+    
+    @_DURACION_ANALISIS.cronometrar(tipo='lote')
+    def ejecutar(self, procesos: int = None, reanudar: bool = True,
+                 al_progresar: Callable[[Dict], None] = None) -> Dict:
+        """
+        Analiza las sesiones de todos los pacientes activos
+        
+        Las sesiones con un análisis guardado vigente (mismo texto y versión
+        del analizador) se omiten.
+        
+        Args:
+            procesos: Cantidad de procesos (None = uno por CPU)
+            reanudar: Continuar desde el checkpoint de una ejecución interrumpida
+            al_progresar: Callback invocado después de cada bloque con las estadísticas
+        
+        Returns:
+            Dict con total, procesadas, analizadas, omitidas, segundos,
+            sesiones_por_segundo y etapas (segundos por etapa)
+        """
+        version = ia_service.version_de("basico")
+        desde = int(db.obtener_configuracion(CLAVE_CHECKPOINT, 0)) if reanudar else 0
+        
+        estadisticas = {
+            'total': SesionController.contar_sesiones_pacientes_activos(desde),
+            'procesadas': 0,
+            'analizadas': 0,
+            'omitidas': 0,
+            'segundos': 0.0,
+            'sesiones_por_segundo': 0.0,
+            'etapas': {'lectura': 0.0, 'analisis': 0.0, 'analisis_cpu': 0.0, 'escritura': 0.0},
+        }
+        etapas = estadisticas['etapas']
+        inicio = time.perf_counter()
+        
+        def leer(despues_de_id):
+            t = time.perf_counter()
+            bloque = SesionController.obtener_sesiones_pacientes_activos(despues_de_id, self.TAMAÑO_BLOQUE)
+            etapas['lectura'] += time.perf_counter() - t
+            return bloque
+        
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_proceso,
+                                 initargs=(ia_service._lexico_temas, CorpusController.estadisticas(reconstruir=True))) as pool:
+            bloque = leer(desde)
+            while bloque:
+                pendientes = self._filtrar_pendientes(bloque, version)
+                futuros = [
+                    pool.submit(_analizar_textos, [(s.id, texto) for s, texto, _ in pendientes[i:i + self.TAMAÑO_TAREA]])
+                    for i in range(0, len(pendientes), self.TAMAÑO_TAREA)
+                ]
+                
+                # Leer el bloque siguiente mientras el pool trabaja
+                siguiente = leer(bloque[-1].id)
+                
+                t = time.perf_counter()
+                analisis = {}
+                for futuro in futuros:
+                    resultados, cpu = futuro.result()
+                    analisis.update(resultados)
+                    etapas['analisis_cpu'] += cpu
+                etapas['analisis'] += time.perf_counter() - t
+                
+                t = time.perf_counter()
+                items = [(sesion, hash_contenido, analisis[sesion.id]) for sesion, _, hash_contenido in pendientes]
+                if items:
+                    AnalisisController.guardar_analisis_lote(items)
+                # Si se corta entre las dos escrituras, el bloque se repite pero
+                # sus sesiones ya tienen análisis vigente y se omiten
+                db.guardar_configuracion(CLAVE_CHECKPOINT, bloque[-1].id)
+                etapas['escritura'] += time.perf_counter() - t
+                
+                estadisticas['procesadas'] += len(bloque)
+                estadisticas['analizadas'] += len(pendientes)
+                _SESIONES_LOTE.incrementar(len(pendientes))
+                estadisticas['omitidas'] += len(bloque) - len(pendientes)
+                estadisticas['segundos'] = time.perf_counter() - inicio
+                estadisticas['sesiones_por_segundo'] = estadisticas['procesadas'] / estadisticas['segundos']
+                if al_progresar:
+                    al_progresar(estadisticas)
+                
+                bloque = siguiente
+        
+        # Pasada completa: la próxima empieza de nuevo desde el principio
+        db.guardar_configuracion(CLAVE_CHECKPOINT, None)
+        estadisticas['segundos'] = time.perf_counter() - inicio
+        if estadisticas['segundos']:
+            estadisticas['sesiones_por_segundo'] = estadisticas['procesadas'] / estadisticas['segundos']
+        return estadisticas
+    
+    def _filtrar_pendientes(self, sesiones, version: str) -> List[Tuple]:
+        """
+        Devuelve las sesiones sin análisis vigente como (sesion, texto, hash_contenido)
+        
+        También se respetan los análisis hechos con el LLM que sigan vigentes.
+        """
+        guardados = AnalisisController.hashes_guardados([s.id for s in sesiones])
+        pendientes = []
+        for sesion in sesiones:
+            texto = sesion.texto_analisis
+            hash_contenido = AnalisisController.hash_contenido(texto, version)
+            guardado = guardados.get(sesion.id)
+            if guardado and guardado in (hash_contenido, AnalisisController.hash_contenido(texto)):
+                continue
+            pendientes.append((sesion, texto, hash_contenido))
+        return pendientes
+
+
+# Instancia global del servicio de análisis por lotes
+analisis_lote_service = AnalisisLoteService()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Análisis por lotes de las sesiones de todos los pacientes activos")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count())
+    parser.add_argument('--desde-cero', action='store_true', help="Ignorar el checkpoint de una ejecución anterior")
+    args = parser.parse_args()
+    
+    def mostrar_progreso(e):
+        porcentaje = 100 * e['procesadas'] / e['total'] if e['total'] else 100
+        print(f"  {e['procesadas']}/{e['total']} sesiones ({porcentaje:.1f}%) - "
+              f"{e['sesiones_por_segundo']:.0f} sesiones/s")
+    
+    db.connect()
+    try:
+        resultado = analisis_lote_service.ejecutar(args.procesos, not args.desde_cero, mostrar_progreso)
+    finally:
+        db.disconnect()
+    
+    print(f"Analizadas: {resultado['analizadas']}, omitidas (vigentes): {resultado['omitidas']}, "
+          f"en {resultado['segundos']:.2f} s ({resultado['sesiones_por_segundo']:.0f} sesiones/s)")
+    for etapa, segundos in resultado['etapas'].items():
+        print(f"  {etapa}: {segundos:.2f} s")
@@ -2,58 +2,527 @@
 Servicio de Backup
 Maneja copias de seguridad de la base de datos
 """
+import base64
+import functools
 import shutil
 import os
 from pathlib import Path
 from datetime import datetime
+import sqlite3
+import struct
+import tempfile
+import secrets
+import time
 import zipfile
+import zlib
+import bz2
+import lzma
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from src.contexto import Delegado
+from src.services.metricas import metricas
+
+# Codecs disponibles: (método zip, nivel por defecto, niveles válidos).
+# lzma se escribe siempre en formato .pbk: ZIP_LZMA ignora el nivel.
+CODECS = {
+    'deflate': (zipfile.ZIP_DEFLATED, 6, range(0, 10)),
+    'bz2': (zipfile.ZIP_BZIP2, 9, range(1, 10)),
+    'lzma': (zipfile.ZIP_LZMA, 6, range(0, 10)),
+}
+
+# Formato por bloques (.pbk): cabecera MAGIA + versión + codec + nivel + flags
+# + tamaño original:uint64 (desde la versión 3) (+ id de archivo de 16 bytes
+# si está cifrado), luego bloques
+# [longitud:uint32][datos]. Cada bloque se comprime por separado, lo que
+# permite comprimir en paralelo.
+#
+# Sin cifrar, los bloques terminan con longitud 0 y el tamaño original como
+# uint64. Cifrado, cada bloque es un token Fernet (guardado sin base64) cuyo
+# contenido es: cabecera + índice:uint64 + es_final:uint8 + datos. Así cada
+# bloque queda autenticado y atado a su archivo y posición; el último bloque
+# lleva es_final=1 y el tamaño original, de modo que un archivo truncado,
+# reordenado o alterado se detecta al leer el bloque afectado.
+MAGIA_BLOQUES = b'PSBK'
+VERSION_BLOQUES = 3
+IDS_CODEC = {'deflate': 1, 'bz2': 2, 'lzma': 3}
+FLAG_CIFRADO = 0x01
+
+_DURACION_BACKUP = metricas.histograma('psicolarg_backup_segundos', "Duración de las operaciones de backup",
+                                       ('operacion',))
+_OPERACIONES_BACKUP = metricas.contador('psicolarg_backup_operaciones_total',
+                                        "Operaciones de backup por resultado", ('operacion', 'resultado'))
+_TAMAÑO_BACKUP = metricas.medidor('psicolarg_backup_ultimo_bytes', "Tamaño del último backup creado")
+
+
+def _medir_operacion(operacion: str):
+    """Decorador: registra la duración y el resultado de una operación que devuelve (exito, ...)"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with _DURACION_BACKUP.medir(operacion=operacion):
+                resultado = funcion(*args, **kwargs)
+            _OPERACIONES_BACKUP.incrementar(operacion=operacion, resultado='exito' if resultado[0] else 'error')
+            return resultado
+        return envoltura
+    return decorador
+
+
+def _comprimir_bloque(codec: str, nivel: int, datos: bytes) -> bytes:
+    """Comprime un bloque (función de módulo para poder usarse en un pool de procesos)"""
+    if codec == 'deflate':
+        return zlib.compress(datos, nivel)
+    if codec == 'bz2':
+        return bz2.compress(datos, nivel)
+    return lzma.compress(datos, preset=nivel)
+
+
+def _descomprimir_bloque(codec: str, datos: bytes) -> bytes:
+    """Descomprime un bloque comprimido con _comprimir_bloque"""
+    if codec == 'deflate':
+        return zlib.decompress(datos)
+    if codec == 'bz2':
+        return bz2.decompress(datos)
+    return lzma.decompress(datos)
+
+
+def _cifrar_bloque(clave: bytes, prefijo: bytes, datos: bytes) -> bytes:
+    """Cifra y autentica un bloque con Fernet; devuelve el token sin base64"""
+    from cryptography.fernet import Fernet
+    token = Fernet(clave).encrypt(prefijo + datos)
+    return base64.urlsafe_b64decode(token)
+
+
+def _procesar_bloque(codec: str, nivel: int, clave: bytes, prefijo: bytes, datos: bytes) -> bytes:
+    """Comprime (y cifra si hay clave) un bloque; se ejecuta en el pool de procesos"""
+    comprimido = _comprimir_bloque(codec, nivel, datos)
+    if clave is None:
+        return comprimido
+    return _cifrar_bloque(clave, prefijo, comprimido)
+
+
+class _LectorBloques:
+    """Stream de lectura que descifra y descomprime un archivo .pbk bloque a bloque"""
+    
+    def __init__(self, archivo, obtener_clave=None):
+        self._archivo = archivo
+        cabecera = self._leer_exacto(len(MAGIA_BLOQUES) + 3)
+        if not cabecera.startswith(MAGIA_BLOQUES):
+            raise ValueError("El archivo no es un backup por bloques válido")
+        version, id_codec = cabecera[4], cabecera[5]
+        if version not in (1, 2, VERSION_BLOQUES):
+            raise ValueError(f"Versión de backup no soportada: {version}")
+        codecs = {v: k for k, v in IDS_CODEC.items()}
+        if id_codec not in codecs:
+            raise ValueError(f"Codec de backup desconocido: {id_codec}")
+        
+        flags = 0
+        if version >= 2:
+            byte_flags = self._leer_exacto(1)
+            cabecera += byte_flags
+            flags = byte_flags[0]
+        
+        # Tamaño declarado en la cabecera: acota lo que se descomprime antes de
+        # llegar al bloque final (en los cifrados queda autenticado con cada bloque)
+        self._tamaño = None
+        if version >= 3:
+            tamaño = self._leer_exacto(8)
+            cabecera += tamaño
+            (self._tamaño,) = struct.unpack('>Q', tamaño)
+        
+        self._fernet = None
+        if flags & FLAG_CIFRADO:
+            if obtener_clave is None:
+                raise ValueError("El backup está cifrado y no hay clave disponible")
+            from cryptography.fernet import Fernet
+            cabecera += self._leer_exacto(16)
+            self._fernet = Fernet(obtener_clave())
+        
+        self._cabecera = cabecera
+        self._codec = codecs[id_codec]
+        self._indice = 0
+        self._pendiente = b''
+        self._leidos = 0
+        self._fin = False
+    
+    def _siguiente_bloque(self) -> bytes:
+        (tamaño,) = struct.unpack('>I', self._leer_exacto(4))
+        
+        if self._fernet is None:
+            if tamaño == 0:
+                self._finalizar(self._leer_exacto(8))
+                return b''
+            return self._descomprimir(self._leer_exacto(tamaño))
+        
+        from cryptography.fernet import InvalidToken
+        token = base64.urlsafe_b64encode(self._leer_exacto(tamaño))
+        try:
+            contenido = self._fernet.decrypt(token)
+        except InvalidToken:
+            raise ValueError(f"El backup fue alterado (bloque {self._indice})")
+        
+        prefijo = self._cabecera + struct.pack('>Q', self._indice)
+        if not contenido.startswith(prefijo):
+            raise ValueError(f"El backup fue alterado (bloque {self._indice} fuera de lugar)")
+        self._indice += 1
+        
+        es_final = contenido[len(prefijo)]
+        datos = contenido[len(prefijo) + 1:]
+        if es_final:
+            self._finalizar(datos)
+            return b''
+        return self._descomprimir(datos)
+    
+    def _descomprimir(self, datos: bytes) -> bytes:
+        datos = _descomprimir_bloque(self._codec, datos)
+        self._leidos += len(datos)
+        if self._tamaño is not None and self._leidos > self._tamaño:
+            raise ValueError("El backup está dañado (excede el tamaño declarado)")
+        return datos
+    
+    def _finalizar(self, datos_total: bytes):
+        (total,) = struct.unpack('>Q', datos_total)
+        if total != self._leidos or (self._tamaño is not None and total != self._tamaño):
+            raise ValueError("El backup está incompleto")
+        self._fin = True
+    
+    def _leer_exacto(self, n: int) -> bytes:
+        datos = self._archivo.read(n)
+        if len(datos) != n:
+            raise ValueError("El backup está truncado")
+        return datos
+    
+    def read(self, size=-1):
+        partes = [self._pendiente]
+        disponible = len(self._pendiente)
+        while not self._fin and (size < 0 or disponible < size):
+            bloque = self._siguiente_bloque()
+            partes.append(bloque)
+            disponible += len(bloque)
+        datos = b''.join(partes)
+        if size < 0:
+            self._pendiente = b''
+            return datos
+        self._pendiente = datos[size:]
+        return datos[:size]
 
 class BackupService:
     """
     Servicio para gestionar backups de la base de datos
     """
     
-    def __init__(self, db_path="data/psicolarg.db"):
+    # Tamaño de bloque para copiar/descomprimir sin cargar todo en memoria
+    CHUNK_SIZE = 1024 * 1024
+    
+    # Tamaño de bloque de los backups comprimidos en paralelo
+    CHUNK_SIZE_COMPRESION = 4 * 1024 * 1024
+    
+    # Extensiones de backups comprimidos
+    EXTENSIONES_COMPRIMIDAS = ('.zip', '.pbk')
+    
+    # Backups más grandes que esto se exploran desde un temporal mapeado en memoria
+    LIMITE_EXPLORAR_EN_MEMORIA = 256 * 1024 * 1024
+    
+    def __init__(self, db_path="data/psicolarg.db", backup_dir="backups", seguridad=None, gestor=None):
+        """
+        Args:
+            db_path: Archivo de la base de datos
+            backup_dir: Directorio de los backups (se crea con el primero)
+            seguridad: SecurityService con la clave de cifrado (por defecto el global)
+            gestor: DatabaseManager que se reconecta al restaurar (por defecto el global)
+        """
         self.db_path = Path(db_path)
-        self.backup_dir = Path("backups")
-        self.backup_dir.mkdir(exist_ok=True)
+        self.backup_dir = Path(backup_dir)
+        self._seguridad = seguridad
+        self._gestor = gestor
+    
+    @property
+    def gestor(self):
+        """DatabaseManager de la base que respalda este servicio"""
+        if self._gestor is None:
+            from src.database.db_manager import db
+            return db
+        return self._gestor
+    
+    @property
+    def en_memoria(self) -> bool:
+        """Indica si la base respaldada vive en memoria (sin archivo que copiar)"""
+        return self.gestor.en_memoria and str(self.gestor.db_path) == str(self.db_path)
+    
+    @property
+    def directorio_temporal(self) -> Path:
+        """
+        Directorio de los temporales con el contenido de una base
+        
+        Está junto a los datos (no en el temporal del sistema) y solo el
+        usuario puede entrar; lo que deje una sesión que terminó mal se borra
+        con limpiar_temporales.
+        """
+        datos = self.gestor.directorio_datos if self.en_memoria else self.db_path.parent
+        directorio = datos / 'tmp'
+        directorio.mkdir(mode=0o700, parents=True, exist_ok=True)
+        os.chmod(directorio, 0o700)
+        return directorio
+    
+    def _crear_temporal(self, prefijo: str, sufijo: str = ".db") -> tuple:
+        """
+        Crea un temporal vacío en directorio_temporal (con permisos 0600)
+        
+        Returns:
+            Tupla (descriptor abierto, ruta)
+        """
+        fd, nombre = tempfile.mkstemp(prefix=prefijo, suffix=sufijo, dir=self.directorio_temporal)
+        return fd, Path(nombre)
+    
+    def limpiar_temporales(self) -> int:
+        """
+        Borra los temporales que quedaron de una sesión anterior
+        
+        Llamarlo al arrancar, antes de abrir o comparar backups.
+        
+        Returns:
+            Cantidad de archivos eliminados
+        """
+        eliminados = 0
+        for archivo in self.directorio_temporal.glob("psicolarg_*"):
+            try:
+                archivo.unlink()
+                eliminados += 1
+            except OSError:
+                pass
+        return eliminados
+    
+    @contextmanager
+    def archivo_actual(self):
+        """
+        Ruta de un archivo con el contenido actual de la base
+        
+        Es el de la base; una base en memoria se vuelca antes, con la API de
+        backup de SQLite, a un temporal (en directorio_temporal) que se borra
+        al salir. El volcado usa
+        la conexión, así que hay que entrar en el hilo que la creó (después
+        el archivo se puede leer desde cualquier hilo).
+        """
+        if not self.en_memoria:
+            yield self.db_path
+            return
+        
+        fd, temporal = self._crear_temporal("psicolarg_memoria_")
+        os.close(fd)
+        try:
+            destino = sqlite3.connect(temporal)
+            try:
+                self.gestor.connection.backup(destino)
+            finally:
+                destino.close()
+            yield temporal
+        finally:
+            temporal.unlink(missing_ok=True)
     
-    def crear_backup(self) -> tuple:
+    @_medir_operacion('crear')
+    def crear_backup(self, codec: str = 'deflate', nivel: int = None,
+                     paralelo: bool = False, procesos: int = None,
+                     cifrar: bool = False) -> tuple:
         """
         Crea una copia de seguridad de la base de datos
         
+        Args:
+            codec: Compresor a usar ('deflate', 'bz2' o 'lzma'; lzma siempre
+                genera un archivo .pbk, el único formato que aplica su nivel)
+            nivel: Nivel de compresión (None usa el nivel por defecto del codec)
+            paralelo: Si es True, comprime por bloques en un pool de procesos y
+                genera un archivo .pbk en lugar de un .zip
+            procesos: Cantidad de procesos del pool (None usa todos los núcleos)
+            cifrar: Si es True, cifra cada bloque con la clave de SecurityService
+                (siempre genera un archivo .pbk)
+        
         Returns:
             Tupla (exito: bool, mensaje: str, ruta: str)
         """
-        if not self.db_path.exists():
+        if not (self.gestor.conectado if self.en_memoria else self.db_path.exists()):
             return False, "La base de datos no existe", ""
         
+        if codec not in CODECS:
+            return False, f"Codec desconocido: {codec}", ""
+        
+        metodo, nivel_defecto, niveles = CODECS[codec]
+        nivel = nivel_defecto if nivel is None else nivel
+        if nivel not in niveles:
+            return False, f"Nivel inválido para {codec}: {nivel}", ""
+        
+        temporal = None
         try:
             # Nombre del backup con fecha y hora
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f"psicolarg_backup_{timestamp}.db"
-            backup_path = self.backup_dir / backup_name
-            
-            # Copiar base de datos
-            shutil.copy2(self.db_path, backup_path)
-            
-            # Comprimir el backup
-            zip_path = self.backup_dir / f"psicolarg_backup_{timestamp}.zip"
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                zipf.write(backup_path, backup_name)
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
             
-            # Eliminar el archivo .db sin comprimir
-            backup_path.unlink()
+            # Se escribe con extensión .tmp (listar_backups no la muestra) y se
+            # renombra recién al terminar: un error no deja un backup truncado
+            with self.archivo_actual() as origen:
+                if paralelo or cifrar or codec == 'lzma':
+                    ruta = self.backup_dir / f"psicolarg_backup_{timestamp}.pbk"
+                    temporal = ruta.with_name(ruta.name + '.tmp')
+                    clave = self._clave_cifrado() if cifrar else None
+                    self._escribir_bloques(origen, temporal, codec, nivel, procesos if paralelo else 1, clave)
+                else:
+                    # Comprimir directamente desde la base, sin copia intermedia
+                    ruta = self.backup_dir / f"psicolarg_backup_{timestamp}.zip"
+                    temporal = ruta.with_name(ruta.name + '.tmp')
+                    with zipfile.ZipFile(temporal, 'w', metodo, compresslevel=nivel) as zipf:
+                        zipf.write(origen, backup_name)
             
-            return True, f"Backup creado exitosamente", str(zip_path)
+            os.replace(temporal, ruta)
+            temporal = None
+            _TAMAÑO_BACKUP.fijar(ruta.stat().st_size)
+            return True, f"Backup creado exitosamente", str(ruta)
         
         except Exception as e:
             return False, f"Error al crear backup: {str(e)}", ""
+        
+        finally:
+            if temporal is not None and temporal.exists():
+                temporal.unlink()
+    
+    def _escribir_bloques(self, base: Path, ruta: Path, codec: str, nivel: int,
+                          procesos: int = None, clave: bytes = None):
+        """
+        Escribe un backup .pbk de la base procesando los bloques en paralelo
+        
+        Con procesos=1 los bloques se procesan en este mismo proceso.
+        """
+        procesos = procesos or os.cpu_count() or 1
+        flags = FLAG_CIFRADO if clave else 0
+        
+        total = 0
+        indice = 0
+        pool = ProcessPoolExecutor(max_workers=procesos) if procesos > 1 else None
+        
+        try:
+            with open(base, 'rb') as origen, open(ruta, 'wb') as destino:
+                # El tamaño va en la cabecera para poder decidir al abrir el
+                # backup si cabe en memoria sin descifrarlo entero
+                tamaño = os.fstat(origen.fileno()).st_size
+                cabecera = (MAGIA_BLOQUES + bytes([VERSION_BLOQUES, IDS_CODEC[codec], nivel, flags])
+                            + struct.pack('>Q', tamaño))
+                if clave:
+                    cabecera += secrets.token_bytes(16)
+                destino.write(cabecera)
+                
+                # Mantener acotada la cantidad de bloques en vuelo para no cargar
+                # toda la base en memoria; los resultados se escriben en orden
+                en_vuelo = []
+                while True:
+                    datos = origen.read(min(self.CHUNK_SIZE_COMPRESION, tamaño - total))
+                    if datos:
+                        total += len(datos)
+                        prefijo = cabecera + struct.pack('>QB', indice, 0)
+                        indice += 1
+                        argumentos = (codec, nivel, clave, prefijo, datos)
+                        if pool:
+                            en_vuelo.append(pool.submit(_procesar_bloque, *argumentos))
+                        else:
+                            self._escribir_bloque(destino, _procesar_bloque(*argumentos))
+                    if en_vuelo and (len(en_vuelo) >= procesos * 2 or not datos):
+                        self._escribir_bloque(destino, en_vuelo.pop(0).result())
+                    if not datos and not en_vuelo:
+                        break
+                
+                if total != tamaño:
+                    raise ValueError("La base cambió de tamaño mientras se copiaba")
+                
+                if clave:
+                    # Bloque final autenticado con el tamaño original
+                    prefijo = cabecera + struct.pack('>QB', indice, 1)
+                    self._escribir_bloque(
+                        destino, _cifrar_bloque(clave, prefijo, struct.pack('>Q', total))
+                    )
+                else:
+                    destino.write(struct.pack('>I', 0))
+                    destino.write(struct.pack('>Q', total))
+        finally:
+            if pool:
+                pool.shutdown()
+    
+    def _escribir_bloque(self, destino, datos: bytes):
+        """Escribe un bloque con su longitud"""
+        destino.write(struct.pack('>I', len(datos)))
+        destino.write(datos)
+    
+    def _clave_cifrado(self) -> bytes:
+        """Obtiene la clave de cifrado de la aplicación"""
+        if self._seguridad is None:
+            from src.services.security_service import security_service
+            return security_service.obtener_clave()
+        return self._seguridad.obtener_clave()
     
+    def benchmark_codecs(self, niveles: dict = None, limite_mb: int = None, base: Path = None) -> list:
+        """
+        Mide relación de compresión y velocidad de cada codec sobre la base real
+        
+        La base se procesa por bloques (igual que el formato .pbk), así que el
+        uso de memoria no depende de su tamaño.
+        
+        Args:
+            niveles: Dict codec -> lista de niveles a probar
+                     (por defecto el nivel estándar de cada codec)
+            limite_mb: Si se indica, solo se miden los primeros N MB
+            base: Archivo de archivo_actual ya obtenido (necesario para medir
+                desde otro hilo una base en memoria); por defecto se obtiene acá
+        
+        Returns:
+            Lista de dicts con codec, nivel, ratio, compresion_mb_s y
+            descompresion_mb_s
+        """
+        if niveles is None:
+            niveles = {codec: [defecto] for codec, (_, defecto, _) in CODECS.items()}
+        
+        limite = limite_mb * 1024 * 1024 if limite_mb else None
+        resultados = []
+        
+        with ExitStack() as pila:
+            if base is None:
+                base = pila.enter_context(self.archivo_actual())
+            for codec, lista_niveles in niveles.items():
+                for nivel in lista_niveles:
+                    original = comprimido = 0
+                    t_compresion = t_descompresion = 0.0
+                
+                    with open(base, 'rb') as origen:
+                        while limite is None or original < limite:
+                            datos = origen.read(self.CHUNK_SIZE_COMPRESION)
+                            if not datos:
+                                break
+                            inicio = time.perf_counter()
+                            bloque = _comprimir_bloque(codec, nivel, datos)
+                            medio = time.perf_counter()
+                            _descomprimir_bloque(codec, bloque)
+                            t_compresion += medio - inicio
+                            t_descompresion += time.perf_counter() - medio
+                            original += len(datos)
+                            comprimido += len(bloque)
+                
+                    mb = original / (1024 * 1024)
+                    resultados.append({
+                        'codec': codec,
+                        'nivel': nivel,
+                        'ratio': original / comprimido if comprimido else 0.0,
+                        'compresion_mb_s': mb / t_compresion if t_compresion else 0.0,
+                        'descompresion_mb_s': mb / t_descompresion if t_descompresion else 0.0,
+                    })
+        
+        
+        return resultados
+    
+    @_medir_operacion('restaurar')
     def restaurar_backup(self, backup_path: str) -> tuple:
         """
         Restaura una copia de seguridad
         
+        El contenido se descomprime por bloques en un archivo temporal junto a
+        la base de datos, se verifica con PRAGMA quick_check y recién entonces
+        se reemplaza el archivo en forma atómica. La conexión global se cierra
+        antes del reemplazo y se vuelve a abrir después, sin reiniciar la app.
+        
         Args:
             backup_path: Ruta al archivo de backup
         
@@ -65,34 +534,231 @@ class BackupService:
         if not backup_file.exists():
             return False, "El archivo de backup no existe"
         
+        if self.en_memoria:
+            return False, ("No se puede restaurar un backup sobre una base en memoria "
+                           "(para consultarlo use abrir_backup)")
+        
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = None
+        
         try:
-            # Crear backup de la base de datos actual antes de restaurar
-            if self.db_path.exists():
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                temp_backup = self.db_path.parent / f"psicolarg_before_restore_{timestamp}.db"
-                shutil.copy2(self.db_path, temp_backup)
+            # Descomprimir (o copiar) por bloques a un temporal en el mismo
+            # sistema de archivos que la base (el reemplazo es un rename)
+            fd, temp_path = self._crear_temporal("psicolarg_restore_", ".tmp")
+            with os.fdopen(fd, 'wb') as destino:
+                with self._abrir_origen(backup_file) as origen:
+                    shutil.copyfileobj(origen, destino, self.CHUNK_SIZE)
+                destino.flush()
+                os.fsync(destino.fileno())
             
-            # Extraer y restaurar
-            if backup_file.suffix == '.zip':
-                with zipfile.ZipFile(backup_file, 'r') as zipf:
-                    # Extraer el primer archivo .db encontrado
-                    for file in zipf.namelist():
-                        if file.endswith('.db'):
-                            zipf.extract(file, self.db_path.parent)
-                            extracted_path = self.db_path.parent / file
-                            
-                            # Mover al lugar correcto
-                            if extracted_path != self.db_path:
-                                shutil.move(str(extracted_path), str(self.db_path))
-                            break
-            else:
-                # Es un archivo .db directamente
-                shutil.copy2(backup_file, self.db_path)
+            # Verificar integridad antes de tocar la base actual
+            exito, mensaje = self._verificar_integridad(temp_path)
+            if not exito:
+                return False, mensaje
+            
+            self._reemplazar_base(temp_path)
+            temp_path = None
             
             return True, "Base de datos restaurada exitosamente"
         
         except Exception as e:
             return False, f"Error al restaurar backup: {str(e)}"
+        
+        finally:
+            if temp_path is not None and temp_path.exists():
+                temp_path.unlink()
+    
+    def abrir_backup(self, backup_path: str) -> tuple:
+        """
+        Abre un backup en modo de solo lectura sin tocar la base actual
+        
+        Los backups chicos (también los cifrados, cuyo tamaño está en la
+        cabecera) se descomprimen directamente en memoria
+        (Connection.deserialize); los grandes en un archivo temporal de
+        directorio_temporal que se lee con mmap y se elimina al desconectar
+        el gestor devuelto.
+        Para usar los controladores sobre el backup:
+        
+            with db.usar_temporalmente(gestor):
+                PacienteController.obtener_todos_pacientes()
+        
+        Args:
+            backup_path: Ruta al archivo de backup
+        
+        Returns:
+            Tupla (exito: bool, mensaje: str, gestor: DatabaseManager | None)
+        """
+        from src.database.db_manager import DatabaseManager
+        
+        backup_file = Path(backup_path)
+        
+        if not backup_file.exists():
+            return False, "El archivo de backup no existe", None
+        
+        temp_path = None
+        
+        try:
+            if backup_file.suffix not in self.EXTENSIONES_COMPRIMIDAS:
+                gestor = DatabaseManager.abrir_solo_lectura(backup_file)
+            elif (self._cabe_en_memoria(backup_file)
+                  and hasattr(sqlite3.Connection, 'deserialize')):
+                with self._abrir_origen(backup_file) as origen:
+                    datos = origen.read()
+                gestor = DatabaseManager.desde_serializado(datos)
+            else:
+                fd, temp_path = self._crear_temporal("psicolarg_explorar_")
+                with os.fdopen(fd, 'wb') as destino:
+                    with self._abrir_origen(backup_file) as origen:
+                        shutil.copyfileobj(origen, destino, self.CHUNK_SIZE)
+                gestor = DatabaseManager.abrir_solo_lectura(temp_path, temporal=True)
+                temp_path = None
+            
+            gestor.fetch_one("SELECT COUNT(*) FROM sqlite_master")
+            return True, "Backup abierto en modo de solo lectura", gestor
+        
+        except Exception as e:
+            return False, f"Error al abrir backup: {str(e)}", None
+        
+        finally:
+            if temp_path is not None and temp_path.exists():
+                temp_path.unlink()
+    
+    def _cabe_en_memoria(self, backup_file: Path) -> bool:
+        """Indica si un backup puede explorarse descomprimido en memoria"""
+        tamaño = self._tamaño_descomprimido(backup_file)
+        return tamaño is not None and tamaño <= self.LIMITE_EXPLORAR_EN_MEMORIA
+    
+    @contextmanager
+    def archivo_base(self, backup_path: str):
+        """
+        Entrega la ruta a un archivo SQLite con el contenido del backup
+        
+        Los .db se usan directamente; los .zip y .pbk se descomprimen por
+        bloques en un temporal de directorio_temporal que se elimina al salir
+        del bloque with.
+        
+        Args:
+            backup_path: Ruta al archivo de backup
+        """
+        backup_file = Path(backup_path)
+        
+        if backup_file.suffix not in self.EXTENSIONES_COMPRIMIDAS:
+            yield backup_file
+            return
+        
+        fd, temp_path = self._crear_temporal("psicolarg_backup_")
+        try:
+            with os.fdopen(fd, 'wb') as destino:
+                with self._abrir_origen(backup_file) as origen:
+                    shutil.copyfileobj(origen, destino, self.CHUNK_SIZE)
+            yield temp_path
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+    
+    def _tamaño_descomprimido(self, backup_file: Path):
+        """
+        Devuelve el tamaño sin comprimir de la base contenida en un backup
+        
+        Desde la versión 3 del formato .pbk está en la cabecera; en los
+        cifrados anteriores solo está dentro del último bloque, así que se
+        devuelve None (desconocido).
+        """
+        if backup_file.suffix == '.pbk':
+            with open(backup_file, 'rb') as f:
+                cabecera = f.read(len(MAGIA_BLOQUES) + 4)
+                if cabecera[4] >= 3:
+                    return struct.unpack('>Q', f.read(8))[0]
+                if cabecera[4] >= 2 and cabecera[-1] & FLAG_CIFRADO:
+                    return None
+                f.seek(-8, os.SEEK_END)
+                return struct.unpack('>Q', f.read(8))[0]
+        
+        with zipfile.ZipFile(backup_file, 'r') as zipf:
+            for info in zipf.infolist():
+                if info.filename.endswith('.db'):
+                    return info.file_size
+        return 0
+    
+    @contextmanager
+    def _abrir_origen(self, backup_file: Path):
+        """Abre como stream la base de datos contenida en el backup"""
+        if backup_file.suffix == '.zip':
+            with zipfile.ZipFile(backup_file, 'r') as zipf:
+                # Usar el primer archivo .db encontrado
+                nombre = next((f for f in zipf.namelist() if f.endswith('.db')), None)
+                if nombre is None:
+                    raise ValueError("El backup no contiene ninguna base de datos")
+                with zipf.open(nombre, 'r') as origen:
+                    yield origen
+        elif backup_file.suffix == '.pbk':
+            with open(backup_file, 'rb') as archivo:
+                yield _LectorBloques(archivo, self._clave_cifrado)
+        else:
+            # Es un archivo .db directamente
+            with open(backup_file, 'rb') as origen:
+                yield origen
+    
+    def _verificar_integridad(self, ruta: Path) -> tuple:
+        """
+        Verifica un archivo de base de datos con PRAGMA quick_check
+        
+        Returns:
+            Tupla (exito: bool, mensaje: str)
+        """
+        try:
+            conexion = sqlite3.connect(f"{ruta.resolve().as_uri()}?mode=ro", uri=True)
+            try:
+                resultado = conexion.execute("PRAGMA quick_check").fetchone()
+            finally:
+                conexion.close()
+        except sqlite3.DatabaseError as e:
+            return False, f"El backup no es una base de datos válida: {str(e)}"
+        
+        if not resultado or resultado[0] != 'ok':
+            detalle = resultado[0] if resultado else "sin resultado"
+            return False, f"El backup está dañado: {detalle}"
+        
+        return True, "ok"
+    
+    def _reemplazar_base(self, nueva_base: Path):
+        """
+        Reemplaza atómicamente la base de datos y reconecta la conexión global
+        
+        La base anterior se conserva como psicolarg_before_restore_*.db mediante
+        un enlace duro (sin duplicar el archivo); si el sistema de archivos no lo
+        permite, se copia.
+        """
+        db = self.gestor
+        misma_base = Path(db.db_path).resolve() == self.db_path.resolve()
+        conexion_activa = db.conectado and misma_base
+        if conexion_activa:
+            db.disconnect()
+        
+        try:
+            if self.db_path.exists():
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                anterior = self.db_path.parent / f"psicolarg_before_restore_{timestamp}.db"
+                try:
+                    os.link(self.db_path, anterior)
+                except OSError:
+                    shutil.copy2(self.db_path, anterior)
+            
+            # Los archivos auxiliares pertenecen a la base anterior
+            for sufijo in ('-journal', '-wal', '-shm'):
+                auxiliar = Path(f"{self.db_path}{sufijo}")
+                if auxiliar.exists():
+                    auxiliar.unlink()
+            
+            os.replace(nueva_base, self.db_path)
+            
+            # El índice de similitud en disco corresponde a la base anterior
+            if misma_base:
+                from src.controllers.similitud_controller import SimilitudController
+                SimilitudController.invalidar(db)
+        finally:
+            if conexion_activa:
+                db.connect()
     
     def listar_backups(self) -> list:
         """
@@ -103,7 +769,9 @@ class BackupService:
         """
         backups = []
         
-        for file in self.backup_dir.glob("psicolarg_backup_*.zip"):
+        for file in self.backup_dir.glob("psicolarg_backup_*"):
+            if file.suffix not in self.EXTENSIONES_COMPRIMIDAS:
+                continue
             stat = file.stat()
             backups.append({
                 'nombre': file.name,
@@ -178,6 +846,7 @@ class BackupService:
         config_file = self.backup_dir / "auto_backup.conf"
         
         if habilitado:
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
             with open(config_file, 'w') as f:
                 f.write(f"enabled=true\n")
                 f.write(f"dias={dias}\n")
@@ -186,5 +855,5 @@ class BackupService:
                 config_file.unlink()
 
 
-# Instancia global del servicio de backup
-backup_service = BackupService()
+# Instancia global del servicio de backup (la del contexto de aplicación actual)
+backup_service = Delegado('backup')
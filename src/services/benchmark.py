@@ -0,0 +1,245 @@
+"""
+Benchmarks de los caminos críticos
+Mide controladores, búsquedas, backup y análisis sobre bases generadas
+(ver src.database.generador_datos) de distintos tamaños, e informa latencia
+p50/p95, throughput y memoria pico de cada escenario.
+
+Uso:
+    python -m src.services.benchmark --escalas chica,mediana --salida bench.json
+    python -m src.services.benchmark --comparar bench.json --umbral 0.2
+
+Con --comparar se contrasta la corrida con una anterior y se termina con
+código 1 si algún escenario empeoró más que el umbral.
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+from src.contexto import ContextoAplicacion, usar_contexto
+from src.database.db_manager import db
+from src.database.generador_datos import APELLIDOS, GeneradorDatos
+
+# Escalas: (pacientes, turnos, sesiones)
+ESCALAS = {
+    'chica': (200, 6000, 5000),
+    'mediana': (2000, 60000, 50000),
+    'grande': (20000, 600000, 500000),
+}
+
+REPETICIONES = 20
+
+# Los escenarios que copian la base completa se repiten menos
+REPETICIONES_BACKUP = 3
+
+# Métricas comparadas entre corridas, con la diferencia absoluta mínima
+# para contar como regresión (por debajo es ruido de medición)
+METRICAS = {'p50_ms': 1.0, 'p95_ms': 1.0, 'memoria_pico_kb': 64}
+
+
+def medir(funcion, repeticiones=REPETICIONES, calentamiento=1):
+    """
+    Mide una función sin argumentos
+    
+    La memoria se mide en una ejecución aparte con tracemalloc (que
+    enlentece la ejecución) y cuenta solo las asignaciones de Python.
+    
+    Returns:
+        Dict con repeticiones, p50_ms, p95_ms, media_ms, ops_s y memoria_pico_kb
+    """
+    for _ in range(calentamiento):
+        funcion()
+    
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    ms = np.array(tiempos) * 1000
+    return {
+        'repeticiones': repeticiones,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'media_ms': float(ms.mean()),
+        'ops_s': repeticiones / sum(tiempos) if sum(tiempos) else 0.0,
+        'memoria_pico_kb': pico / 1024
+    }
+
+
+def escenarios(backup, semilla=1):
+    """
+    Escenarios a medir sobre la base conectada
+    
+    Los que reciben parámetros los van rotando para no medir siempre la
+    misma consulta (y la misma página del caché).
+    
+    Args:
+        backup: BackupService que apunta a la base conectada
+        semilla: Semilla de la elección de parámetros
+    
+    Returns:
+        Lista de (nombre, función sin argumentos, repeticiones)
+    """
+    from src.controllers.paciente_controller import PacienteController
+    from src.controllers.sesion_controller import SesionController
+    from src.controllers.turno_controller import TurnoController
+    from src.services.ia_analysis_service import ia_service
+    
+    azar = random.Random(semilla)
+    pacientes = azar.sample([row['id'] for row in db.fetch_all('SELECT id FROM pacientes')], 50)
+    fechas = azar.sample([row['fecha'] for row in db.fetch_all('SELECT DISTINCT fecha FROM turnos')], 50)
+    mayor = db.fetch_one('''
+        SELECT paciente_id FROM sesiones GROUP BY paciente_id ORDER BY COUNT(*) DESC LIMIT 1
+    ''')['paciente_id']
+    textos = [row['notas'] for row in db.fetch_all(
+        'SELECT notas FROM sesiones WHERE paciente_id = ? ORDER BY fecha LIMIT 100', (mayor,)
+    )]
+    
+    terminos = itertools.cycle(APELLIDOS)
+    ids = itertools.cycle(pacientes)
+    dias = itertools.cycle(fechas)
+    
+    def crear_backup():
+        exito, mensaje, ruta = backup.crear_backup()
+        if not exito:
+            raise RuntimeError(mensaje)
+        Path(ruta).unlink()
+    
+    exito, mensaje, ruta_backup = backup.crear_backup()
+    if not exito:
+        raise RuntimeError(mensaje)
+    # No pisar el backup de referencia con uno creado en el mismo segundo
+    ruta_referencia = Path(ruta_backup).with_name('referencia.zip')
+    Path(ruta_backup).replace(ruta_referencia)
+    
+    def restaurar_backup():
+        exito, mensaje = backup.restaurar_backup(str(ruta_referencia))
+        if not exito:
+            raise RuntimeError(mensaje)
+        for anterior in backup.db_path.parent.glob('psicolarg_before_restore_*.db'):
+            anterior.unlink()
+    
+    return [
+        ('obtener_todos_pacientes', lambda: PacienteController.obtener_todos_pacientes(), REPETICIONES),
+        ('buscar_pacientes', lambda: PacienteController.buscar_pacientes(next(terminos)), REPETICIONES),
+        ('buscar_en_sesiones', lambda: SesionController.buscar_en_sesiones(next(ids), 'ansiedad'), REPETICIONES),
+        ('obtener_turnos_fecha', lambda: TurnoController.obtener_turnos_fecha(next(dias)), REPETICIONES),
+        ('crear_backup', crear_backup, REPETICIONES_BACKUP),
+        ('restaurar_backup', restaurar_backup, REPETICIONES_BACKUP),
+        ('analisis_patron_basico', lambda: ia_service._analisis_patron_basico(textos), REPETICIONES),
+    ]
+
+
+def ejecutar(escalas=('chica',), semilla=1, filtro=None, salida=sys.stdout):
+    """
+    Corre los escenarios en cada escala, cada una sobre una base temporal
+    
+    Args:
+        escalas: Nombres de ESCALAS a medir
+        semilla: Semilla de los datos generados
+        filtro: Si se indica, solo los escenarios cuyo nombre lo contiene
+        salida: Dónde escribir el avance
+    
+    Returns:
+        Dict con los datos del entorno y la lista de resultados
+    """
+    resultados = []
+    for escala in escalas:
+        pacientes, turnos, sesiones = ESCALAS[escala]
+        # Contexto propio: base, clave y backups en el temporal, sin tocar los reales
+        with tempfile.TemporaryDirectory() as directorio, \
+                usar_contexto(ContextoAplicacion.en_directorio(directorio)) as contexto:
+            contexto.db.connect()
+            GeneradorDatos(semilla=semilla).generar(pacientes, turnos, sesiones)
+            db.execute_query('ANALYZE')
+            
+            for nombre, funcion, repeticiones in escenarios(contexto.backup, semilla):
+                if filtro and filtro not in nombre:
+                    continue
+                resultado = {'escala': escala, 'escenario': nombre, **medir(funcion, repeticiones)}
+                resultados.append(resultado)
+                print(f"{escala:8} {nombre:26} p50 {resultado['p50_ms']:9.2f} ms  "
+                      f"p95 {resultado['p95_ms']:9.2f} ms  {resultado['ops_s']:9.1f} op/s  "
+                      f"{resultado['memoria_pico_kb']:9.0f} KB", file=salida)
+    
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'semilla': semilla,
+        'resultados': resultados
+    }
+
+
+def comparar(actual, anterior, umbral=0.2, metricas=METRICAS):
+    """
+    Busca regresiones respecto de una corrida anterior
+    
+    Args:
+        actual: Resultado de ejecutar
+        anterior: Resultado de una corrida anterior (por ejemplo leído del JSON)
+        umbral: Aumento relativo tolerado (0.2 = 20% peor)
+        metricas: Dict métrica -> diferencia mínima (en todas, mayor es peor)
+    
+    Returns:
+        Lista de (escala, escenario, métrica, valor anterior, valor actual)
+        de las que superan el umbral
+    """
+    previos = {(r['escala'], r['escenario']): r for r in anterior['resultados']}
+    regresiones = []
+    for resultado in actual['resultados']:
+        previo = previos.get((resultado['escala'], resultado['escenario']))
+        if previo is None:
+            continue
+        for metrica, minimo in metricas.items():
+            if (previo.get(metrica) and resultado[metrica] > previo[metrica] * (1 + umbral)
+                    and resultado[metrica] - previo[metrica] >= minimo):
+                regresiones.append((resultado['escala'], resultado['escenario'], metrica,
+                                    previo[metrica], resultado[metrica]))
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de controladores, búsqueda, backup y análisis")
+    parser.add_argument('--escalas', default='chica', help=f"Separadas por coma: {', '.join(ESCALAS)}")
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--escenario', help="Solo los escenarios cuyo nombre contiene este texto")
+    parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior")
+    parser.add_argument('--umbral', type=float, default=0.2, help="Empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+    
+    escalas = [e.strip() for e in args.escalas.split(',')]
+    desconocidas = [e for e in escalas if e not in ESCALAS]
+    if desconocidas:
+        parser.error(f"escalas desconocidas: {', '.join(desconocidas)}")
+    
+    actual = ejecutar(escalas, args.semilla, args.escenario)
+    if args.salida:
+        Path(args.salida).write_text(json.dumps(actual, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+    
+    if args.comparar:
+        anterior = json.loads(Path(args.comparar).read_text(encoding='utf-8'))
+        regresiones = comparar(actual, anterior, args.umbral)
+        for escala, escenario, metrica, previo, valor in regresiones:
+            print(f"REGRESIÓN {escala} {escenario} {metrica}: {previo:.2f} -> {valor:.2f} "
+                  f"({valor / previo - 1:+.0%})")
+        print(f"{len(regresiones)} regresiones (umbral {args.umbral:.0%})")
+        sys.exit(1 if regresiones else 0)
@@ -0,0 +1,146 @@
+"""
+Servicio de Comparación de Bases de Datos
+Compara dos snapshots (backups o la base actual) tabla por tabla
+"""
+import sqlite3
+from contextlib import ExitStack
+from pathlib import Path
+
+from src.services.backup_service import backup_service
+
+class DiffService:
+    """
+    Servicio para detectar filas insertadas, modificadas y eliminadas entre
+    dos bases de datos
+    
+    Ambas bases se adjuntan (ATTACH) a una misma conexión y toda la
+    comparación se resuelve en SQLite, recorriendo las claves primarias;
+    ninguna fila se carga en Python salvo los ids resultantes.
+    """
+    
+    TABLAS = ('pacientes', 'turnos', 'sesiones')
+    
+    def comparar(self, ruta_antes: str, ruta_despues: str = None) -> tuple:
+        """
+        Compara dos snapshots
+        
+        Args:
+            ruta_antes: Backup (.zip o .db) tomado como referencia
+            ruta_despues: Backup a comparar; si es None se usa la base actual
+        
+        Returns:
+            Tupla (exito: bool, mensaje: str, resultado: dict)
+            resultado tiene una entrada por tabla con 'insertados',
+            'actualizados' y 'eliminados' (listas de ids), 'columnas'
+            (cantidad de filas modificadas por columna) y 'resumen' (conteos)
+        """
+        if ruta_despues is None:
+            ruta_despues = backup_service.db_path
+        
+        for ruta in (ruta_antes, ruta_despues):
+            if not Path(ruta).exists():
+                return False, f"No existe el archivo: {ruta}", {}
+        
+        try:
+            with ExitStack() as stack:
+                archivo_antes = stack.enter_context(backup_service.archivo_base(ruta_antes))
+                archivo_despues = stack.enter_context(backup_service.archivo_base(ruta_despues))
+                
+                conexion = sqlite3.connect("file::memory:", uri=True)
+                stack.callback(conexion.close)
+                self._adjuntar(conexion, archivo_antes, 'antes')
+                self._adjuntar(conexion, archivo_despues, 'despues')
+                
+                resultado = {tabla: self._comparar_tabla(conexion, tabla) for tabla in self.TABLAS}
+            
+            return True, "Comparación finalizada", resultado
+        
+        except Exception as e:
+            return False, f"Error al comparar: {str(e)}", {}
+    
+    def resumen_texto(self, resultado: dict) -> str:
+        """Genera un resumen legible de una comparación"""
+        lineas = []
+        for tabla, cambios in resultado.items():
+            r = cambios['resumen']
+            lineas.append(
+                f"{tabla}: {r['insertados']} nuevos, {r['actualizados']} modificados, "
+                f"{r['eliminados']} eliminados"
+            )
+        return "\n".join(lineas)
+    
+    def _adjuntar(self, conexion, archivo: Path, esquema: str):
+        """Adjunta un archivo SQLite en modo de solo lectura"""
+        uri = f"{Path(archivo).resolve().as_uri()}?mode=ro"
+        conexion.execute(f"ATTACH DATABASE ? AS {esquema}", (uri,))
+    
+    def _columnas(self, conexion, esquema: str, tabla: str) -> list:
+        """Devuelve los nombres de columna de una tabla en un esquema"""
+        return [fila[1] for fila in conexion.execute(f"PRAGMA {esquema}.table_info({tabla})")]
+    
+    def _comparar_tabla(self, conexion, tabla: str) -> dict:
+        """Compara una tabla entre los esquemas 'antes' y 'despues'"""
+        columnas_antes = self._columnas(conexion, 'antes', tabla)
+        columnas_despues = self._columnas(conexion, 'despues', tabla)
+        
+        vacio = {'insertados': [], 'actualizados': [], 'eliminados': [], 'columnas': {}}
+        if not columnas_antes and not columnas_despues:
+            vacio['resumen'] = {k: 0 for k in ('insertados', 'actualizados', 'eliminados')}
+            return vacio
+        if not columnas_antes:
+            ids = [f[0] for f in conexion.execute(f"SELECT id FROM despues.{tabla} ORDER BY id")]
+            return self._con_resumen({**vacio, 'insertados': ids})
+        if not columnas_despues:
+            ids = [f[0] for f in conexion.execute(f"SELECT id FROM antes.{tabla} ORDER BY id")]
+            return self._con_resumen({**vacio, 'eliminados': ids})
+        
+        comunes = [c for c in columnas_antes if c in columnas_despues and c != 'id']
+        
+        insertados = [f[0] for f in conexion.execute(f'''
+            SELECT d.id FROM despues.{tabla} d
+            LEFT JOIN antes.{tabla} a ON a.id = d.id
+            WHERE a.id IS NULL ORDER BY d.id
+        ''')]
+        
+        eliminados = [f[0] for f in conexion.execute(f'''
+            SELECT a.id FROM antes.{tabla} a
+            LEFT JOIN despues.{tabla} d ON d.id = a.id
+            WHERE d.id IS NULL ORDER BY a.id
+        ''')]
+        
+        # Una fila cambió si alguna columna común difiere (IS NOT contempla NULL)
+        diferencias = [f'a."{c}" IS NOT d."{c}"' for c in comunes] or ['0']
+        actualizados = [f[0] for f in conexion.execute(f'''
+            SELECT a.id FROM antes.{tabla} a
+            JOIN despues.{tabla} d ON d.id = a.id
+            WHERE {" OR ".join(diferencias)} ORDER BY a.id
+        ''')]
+        
+        columnas = {}
+        if actualizados and comunes:
+            conteos = ", ".join(f'SUM(a."{c}" IS NOT d."{c}")' for c in comunes)
+            fila = conexion.execute(f'''
+                SELECT {conteos} FROM antes.{tabla} a
+                JOIN despues.{tabla} d ON d.id = a.id
+            ''').fetchone()
+            columnas = {c: n for c, n in zip(comunes, fila) if n}
+        
+        return self._con_resumen({
+            'insertados': insertados,
+            'actualizados': actualizados,
+            'eliminados': eliminados,
+            'columnas': columnas
+        })
+    
+    def _con_resumen(self, cambios: dict) -> dict:
+        """Agrega los conteos de resumen a un resultado de tabla"""
+        cambios['resumen'] = {
+            'insertados': len(cambios['insertados']),
+            'actualizados': len(cambios['actualizados']),
+            'eliminados': len(cambios['eliminados'])
+        }
+        return cambios
+
+
+# Instancia global del servicio de comparación
+diff_service = DiffService()
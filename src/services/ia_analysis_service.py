@@ -2,23 +2,176 @@
 Servicio de Análisis con IA
 Utiliza OpenAI GPT para analizar sesiones y detectar patrones
 """
+import hashlib
+import json
 import os
-from typing import List, Dict
-from dotenv import load_dotenv
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from src.contexto import Delegado
+from src.services.aho_corasick import AutomataAhoCorasick
+from src.services.metricas import metricas
+from src.services.series_sentimiento import VALORES_SENTIMIENTO, analizar_series
 
-# Cargar variables de entorno
-load_dotenv()
+# Secuencias de letras (cualquier alfabeto); números, guiones y puntuación separan palabras
+_PATRON_PALABRA = re.compile(r"[^\W\d_]+")
+
+
+def normalizar_palabra(palabra: str) -> str:
+    """Pasa a minúsculas y quita tildes/diacríticos ('Depresión' -> 'depresion')"""
+    descompuesta = unicodedata.normalize('NFKD', palabra.lower())
+    return ''.join(c for c in descompuesta if not unicodedata.combining(c))
+
+
+class TextoTokenizado:
+    """
+    Resultado de tokenizar un texto una sola vez
+    
+    Attributes:
+        texto: Texto original
+        tokens: Palabras normalizadas en orden de aparición
+        conteos: Counter de tokens
+        formas: Primera forma original (en minúsculas) de cada token, para mostrar
+    """
+    
+    def __init__(self, texto: str):
+        self.texto = texto or ""
+        self.tokens = []
+        self.formas = {}
+        for match in _PATRON_PALABRA.finditer(texto or ""):
+            forma = match.group().lower()
+            token = normalizar_palabra(forma)
+            self.tokens.append(token)
+            self.formas.setdefault(token, forma)
+        self.conteos = Counter(self.tokens)
+    
+    def contiene(self, *palabras: str) -> bool:
+        """Indica si alguna de las palabras (ya normalizadas) aparece en el texto"""
+        return any(p in self.conteos for p in palabras)
+
+
+def normalizar_con_posiciones(texto: str) -> tuple:
+    """
+    Normaliza un texto carácter a carácter conservando las posiciones
+    
+    Returns:
+        Tupla (texto_normalizado, posiciones) donde posiciones[i] es el índice
+        en el texto original del carácter normalizado i
+    """
+    caracteres = []
+    posiciones = []
+    for i, caracter in enumerate(texto):
+        for normalizado in normalizar_palabra(caracter):
+            caracteres.append(normalizado)
+            posiciones.append(i)
+    return ''.join(caracteres), posiciones
+
+
+def _normalizar_lexico(palabras) -> set:
+    return {normalizar_palabra(p) for p in palabras}
+
+
+# Palabras comunes que no aportan como palabra clave
+PALABRAS_COMUNES = _normalizar_lexico({
+    'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'ser', 'se',
+    'no', 'haber', 'por', 'con', 'su', 'para', 'como', 'estar',
+    'tener', 'le', 'lo', 'todo', 'pero', 'más', 'hacer', 'o',
+    'poder', 'decir', 'este', 'ir', 'otro', 'ese', 'si', 'me',
+    'ya', 'ver', 'porque', 'dar', 'cuando', 'él', 'muy', 'sin'
+})
+
+PALABRAS_POSITIVAS = _normalizar_lexico({
+    'mejor', 'mejoría', 'progreso', 'bien', 'feliz', 'contento',
+    'alegre', 'optimista', 'logro', 'avance', 'satisfecho'
+})
+
+PALABRAS_NEGATIVAS = _normalizar_lexico({
+    'peor', 'mal', 'triste', 'deprimido', 'ansioso', 'ansiedad',
+    'preocupado', 'problema', 'dificultad', 'crisis', 'dolor'
+})
+
+TEMAS_PSICOLOGICOS = {
+    'ansiedad': ['ansiedad', 'ansioso', 'nervioso', 'preocupación', 'estrés'],
+    'depresión': ['depresión', 'tristeza', 'deprimido', 'desmotivación'],
+    'relaciones': ['pareja', 'familia', 'relación', 'familiar', 'amistad'],
+    'trabajo': ['trabajo', 'laboral', 'empleo', 'jefe', 'compañeros'],
+    'autoestima': ['autoestima', 'confianza', 'valoración', 'autoimagen'],
+    'trauma': ['trauma', 'pasado', 'recuerdo', 'infancia'],
+}
+
+Texto = Union[str, TextoTokenizado]
+
+_DURACION_ANALISIS = metricas.histograma('psicolarg_analisis_segundos', "Duración de los análisis",
+                                         ('tipo',))
 
 class IAAnalysisService:
     """
     Servicio para análisis de sesiones con IA
     """
     
-    def __init__(self):
+    # Incrementar cuando cambie el resultado del análisis básico, para
+    # invalidar los análisis guardados
+    VERSION_ANALISIS = 3
+    
+    def __init__(self, directorio_cache="data/llm_cache"):
+        """
+        Args:
+            directorio_cache: Directorio de la caché de respuestas del LLM
+        """
+        # Cargar variables de entorno (.env); diferido hasta crear el servicio
+        from dotenv import load_dotenv
+        load_dotenv()
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.model = "gpt-4"
+        self.base_url = os.getenv("OPENAI_BASE_URL") or None
         self.available = bool(self.api_key and self.api_key != "tu_api_key_aqui")
+        self._cliente_llm = None
+        self.directorio_cache = directorio_cache
+        # Frecuencias de documento del corpus de sesiones (las carga CorpusController);
+        # sin ellas las palabras clave se ordenan por frecuencia en el texto
+        self.corpus = None
+        self.cargar_lexico_temas(TEMAS_PSICOLOGICOS)
+    
+    @property
+    def cliente_llm(self):
+        """Cliente asíncrono del LLM (se crea al primer uso)"""
+        if self._cliente_llm is None:
+            from src.services.llm_cache import CacheRespuestasLLM
+            from src.services.llm_client import ClienteLLM
+            self._cliente_llm = ClienteLLM(self.api_key, self.model, base_url=self.base_url,
+                                           cache=CacheRespuestasLLM(self.directorio_cache))
+        return self._cliente_llm
+    
+    @property
+    def version_analizador(self) -> str:
+        """Identifica al analizador que produce los resultados (para invalidar caché)"""
+        return self.version_de(self.model if self.available else "basico")
+    
+    def version_de(self, motor: str) -> str:
+        """Versión de los resultados de un motor: el modelo del LLM o "basico" (análisis local)"""
+        return f"{motor}-v{self.VERSION_ANALISIS}-temas{self._version_lexico}"
+    
+    def cargar_lexico_temas(self, temas: Dict[str, List[str]]):
+        """
+        Compila el léxico de temas en un autómata Aho-Corasick
+        
+        Args:
+            temas: Dict tema -> lista de términos (pueden tener varias palabras)
+        """
+        automata = AutomataAhoCorasick()
+        for tema, terminos in temas.items():
+            for termino in terminos:
+                automata.agregar(normalizar_palabra(termino), tema)
+        automata.construir()
+        self._version_lexico = hashlib.sha256(
+            json.dumps(temas, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:8]
+        self._lexico_temas = temas
+        self._temas = list(temas.keys())
+        self._automata_temas = automata
     
+    @_DURACION_ANALISIS.cronometrar(tipo='sesion')
     def analizar_sesion(self, sesion_text: str) -> Dict:
         """
         Analiza una sesión individual
@@ -33,151 +186,373 @@ class IAAnalysisService:
             return self._analisis_basico(sesion_text)
         
         try:
-            # Aquí iría la llamada a OpenAI API
-            # Por ahora devolvemos un análisis básico
+            # Bloquea hasta tener la respuesta: desde la interfaz usar
+            # cliente_llm en un hilo aparte (ver AnalisisIAView)
+            resultados = self.cliente_llm.ejecutar([(0, sesion_text)])
+            if 0 in resultados:
+                return resultados[0]
             return self._analisis_basico(sesion_text)
         except Exception as e:
             print(f"Error en análisis con IA: {e}")
             return self._analisis_basico(sesion_text)
     
+    @_DURACION_ANALISIS.cronometrar(tipo='longitudinal')
     def analizar_multiples_sesiones(self, sesiones_texts: List[str]) -> Dict:
         """
         Analiza múltiples sesiones para detectar patrones longitudinales
         
         Args:
-            sesiones_texts: Lista de textos de sesiones
+            sesiones_texts: Lista de textos de sesiones, en orden cronológico
         
         Returns:
             Dict con patrones, evolución, palabras_recurrentes, insights
+            (y resumen, si se usó el LLM)
         """
         if not self.available:
             return self._analisis_patron_basico(sesiones_texts)
         
+        # Tendencia y frecuencias salen del análisis local; el LLM aporta
+        # un resumen de la historia
+        resultado = self._analisis_patron_basico(sesiones_texts)
+        resumen = self.resumir_historia(sesiones_texts)
+        if resumen is not None:
+            resultado['resumen'] = resumen['resumen']
+            resultado['insights'] = resumen['insights'] or resultado['insights']
+        return resultado
+    
+    def resumir_historia(self, sesiones_texts: List[str], ejecucion=None) -> Optional[Dict]:
+        """
+        Resume con el LLM la historia de un paciente (map-reduce si no entra
+        en un pedido); bloquea hasta terminar, desde la interfaz llamarlo en
+        un hilo aparte (ver AnalisisLocalWorker)
+        
+        Args:
+            sesiones_texts: Lista de textos de sesiones, en orden cronológico
+            ejecucion: EjecucionLLM con la que cancelar el resumen desde otro hilo
+        
+        Returns:
+            Dict con resumen, temas e insights, o None sin el LLM o si falló
+            o se canceló
+        """
+        if not self.available or not sesiones_texts:
+            return None
+        
         try:
-            # Aquí iría la llamada a OpenAI API para análisis longitudinal
-            return self._analisis_patron_basico(sesiones_texts)
+            return self.cliente_llm.resumir_historia(sesiones_texts, ejecucion=ejecucion)
         except Exception as e:
-            print(f"Error en análisis de patrones: {e}")
-            return self._analisis_patron_basico(sesiones_texts)
+            print(f"Error en resumen de la historia: {e}")
+            return None
     
-    def extraer_palabras_clave(self, texto: str, top_n: int = 10) -> List[str]:
+    def tokenizar(self, texto: Texto) -> TextoTokenizado:
+        """
+        Tokeniza un texto (una sola vez) para reutilizarlo en todos los análisis
+        
+        Args:
+            texto: Texto a tokenizar (si ya está tokenizado se devuelve tal cual)
+        
+        Returns:
+            TextoTokenizado con tokens normalizados y sus conteos
+        """
+        if isinstance(texto, TextoTokenizado):
+            return texto
+        return TextoTokenizado(texto)
+    
+    def extraer_palabras_clave(self, texto: Texto, top_n: int = 10) -> List[str]:
         """
         Extrae las palabras clave más importantes de un texto
         
         Args:
-            texto: Texto a analizar
+            texto: Texto a analizar (str o TextoTokenizado)
             top_n: Número de palabras clave a retornar
         
         Returns:
             Lista de palabras clave
         """
-        # Implementación básica sin IA
-        # Filtrar palabras comunes
-        palabras_comunes = {'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'ser', 'se', 
-                           'no', 'haber', 'por', 'con', 'su', 'para', 'como', 'estar',
-                           'tener', 'le', 'lo', 'todo', 'pero', 'más', 'hacer', 'o',
-                           'poder', 'decir', 'este', 'ir', 'otro', 'ese', 'si', 'me',
-                           'ya', 'ver', 'porque', 'dar', 'cuando', 'él', 'muy', 'sin'}
+        return self.extraer_palabras_clave_lote([texto], top_n)[0]
+    
+    def extraer_palabras_clave_lote(self, textos: List[Texto], top_n: int = 10) -> List[List[str]]:
+        """
+        Extrae las palabras clave de varios textos a la vez
         
-        palabras = texto.lower().split()
-        palabras_filtradas = [p for p in palabras if len(p) > 4 and p not in palabras_comunes]
+        Con las estadísticas del corpus cargadas se ordenan por TF-IDF (una
+        palabra pesa más cuanto menos sesiones la contienen) y todos los
+        textos se puntúan juntos; si no, por frecuencia dentro de cada texto.
         
-        # Contar frecuencias
-        from collections import Counter
-        contador = Counter(palabras_filtradas)
+        Args:
+            textos: Textos a analizar (str o TextoTokenizado)
+            top_n: Número de palabras clave por texto
+        
+        Returns:
+            Lista (una por texto) de listas de palabras clave
+        """
+        tokenizados = [self.tokenizar(texto) for texto in textos]
+        conteos = [
+            {palabra: tokens.conteos[palabra] for palabra in self.terminos_indexables(tokens)}
+            for tokens in tokenizados
+        ]
+        
+        if self.corpus is not None and self.corpus.total_documentos:
+            mejores = self.corpus.mejores_lote(conteos, top_n)
+        else:
+            mejores = [
+                [palabra for palabra, _ in Counter({p: n for p, n in c.items() if len(p) > 4}).most_common(top_n)]
+                for c in conteos
+            ]
+        
+        return [[tokens.formas[p] for p in palabras] for tokens, palabras in zip(tokenizados, mejores)]
+    
+    def terminos_indexables(self, texto: Texto) -> List[str]:
+        """
+        Términos de un texto que cuentan para las estadísticas del corpus
         
-        return [palabra for palabra, _ in contador.most_common(top_n)]
+        Returns:
+            Palabras normalizadas distintas (sin las comunes ni las muy cortas),
+            en orden de aparición
+        """
+        return [
+            palabra for palabra in self.tokenizar(texto).conteos
+            if len(palabra) > 2 and palabra not in PALABRAS_COMUNES
+        ]
     
-    def analizar_sentimiento(self, texto: str) -> str:
+    def analizar_sentimiento(self, texto: Texto) -> str:
         """
         Analiza el sentimiento general del texto
         
         Args:
-            texto: Texto a analizar
+            texto: Texto a analizar (str o TextoTokenizado)
         
         Returns:
             Sentimiento: positivo, negativo, neutral
         """
-        # Implementación básica basada en palabras clave
-        palabras_positivas = {'mejor', 'mejoría', 'progreso', 'bien', 'feliz', 'contento',
-                             'alegre', 'optimista', 'logro', 'avance', 'satisfecho'}
-        palabras_negativas = {'peor', 'mal', 'triste', 'deprimido', 'ansioso', 'ansiedad',
-                             'preocupado', 'problema', 'dificultad', 'crisis', 'dolor'}
-        
-        texto_lower = texto.lower()
-        palabras = set(texto_lower.split())
+        puntaje = self.puntaje_sentimiento(texto)
         
-        positivas = len(palabras.intersection(palabras_positivas))
-        negativas = len(palabras.intersection(palabras_negativas))
-        
-        if positivas > negativas:
+        if puntaje > 0:
             return "positivo"
-        elif negativas > positivas:
+        elif puntaje < 0:
             return "negativo"
         else:
             return "neutral"
     
+    def puntaje_sentimiento(self, texto: Texto) -> float:
+        """
+        Puntaje numérico del sentimiento del texto
+        
+        Args:
+            texto: Texto a analizar (str o TextoTokenizado)
+        
+        Returns:
+            Valor entre -1 (solo palabras negativas) y 1 (solo positivas);
+            0 si no hay ninguna o están equilibradas
+        """
+        # Implementación básica basada en palabras clave
+        palabras = self.tokenizar(texto).conteos.keys()
+        
+        positivas = len(PALABRAS_POSITIVAS.intersection(palabras))
+        negativas = len(PALABRAS_NEGATIVAS.intersection(palabras))
+        
+        if positivas + negativas == 0:
+            return 0.0
+        return (positivas - negativas) / (positivas + negativas)
+    
     def _analisis_basico(self, texto: str) -> Dict:
         """Análisis básico sin IA"""
+        tokens = self.tokenizar(texto)
+        coincidencias = self.buscar_terminos_temas(tokens)
         return {
-            'palabras_clave': self.extraer_palabras_clave(texto, 8),
-            'sentimiento': self.analizar_sentimiento(texto),
-            'temas_principales': self._extraer_temas(texto),
-            'recomendaciones': self._generar_recomendaciones_basicas(texto)
+            'palabras_clave': self.extraer_palabras_clave(tokens, 8),
+            'sentimiento': self.analizar_sentimiento(tokens),
+            'puntaje_sentimiento': self.puntaje_sentimiento(tokens),
+            'temas_principales': self._temas_de_coincidencias(coincidencias),
+            'coincidencias_temas': coincidencias,
+            'recomendaciones': self._generar_recomendaciones_basicas(tokens)
         }
     
     def _analisis_patron_basico(self, textos: List[str]) -> Dict:
         """Análisis de patrones básico sin IA"""
-        todas_palabras = []
-        sentimientos = []
+        estado = self.estado_longitudinal_vacio()
+        tokenizados = [self.tokenizar(texto) for texto in textos]
+        palabras_clave = self.extraer_palabras_clave_lote(tokenizados, 5)
+        
+        for indice, tokens in enumerate(tokenizados):
+            self.fusionar_sesion(estado, indice, f"{indice:08d}", {
+                'palabras_clave': palabras_clave[indice],
+                'sentimiento': self.analizar_sentimiento(tokens),
+                'puntaje_sentimiento': self.puntaje_sentimiento(tokens),
+                'temas_principales': self._extraer_temas(tokens)
+            })
+        
+        return self.resultado_longitudinal(estado)
+    
+    def estado_longitudinal_vacio(self) -> Dict:
+        """
+        Crea el estado acumulable del análisis longitudinal de un paciente
         
-        for texto in textos:
-            todas_palabras.extend(self.extraer_palabras_clave(texto, 5))
-            sentimientos.append(self.analizar_sentimiento(texto))
+        El estado guarda el aporte de cada sesión (palabras clave, sentimiento,
+        temas y orden cronológico) y los contadores totales, de modo que
+        agregar, editar o quitar una sesión no requiere recorrer las demás.
+        """
+        return {
+            'version': self.version_analizador,
+            'sesiones': {},
+            'palabras': {},
+            'temas': {},
+            'watermark': None
+        }
+    
+    def fusionar_sesion(self, estado: Dict, sesion_id, orden: str, analisis: Dict):
+        """
+        Incorpora (o reemplaza) el aporte de una sesión al estado longitudinal
         
-        from collections import Counter
-        palabras_recurrentes = Counter(todas_palabras).most_common(10)
+        Args:
+            estado: Estado creado con estado_longitudinal_vacio
+            sesion_id: Identificador de la sesión
+            orden: Clave de orden cronológico (por ejemplo la fecha)
+            analisis: Resultado de analizar_sesion para esa sesión
+        """
+        self.quitar_sesion(estado, sesion_id)
+        
+        sentimiento = analisis.get('sentimiento', 'neutral')
+        aporte = {
+            'orden': orden,
+            'palabras': list(analisis.get('palabras_clave', []))[:5],
+            'sentimiento': sentimiento,
+            # Los análisis del LLM solo traen la etiqueta
+            'puntaje': analisis.get('puntaje_sentimiento', VALORES_SENTIMIENTO.get(sentimiento, 0.0)),
+            'temas': [t for t in analisis.get('temas_principales', []) if t != 'general']
+        }
+        estado['sesiones'][str(sesion_id)] = aporte
+        self._sumar_aporte(estado, aporte, 1)
+    
+    def quitar_sesion(self, estado: Dict, sesion_id):
+        """Quita el aporte de una sesión del estado longitudinal (si estaba)"""
+        aporte = estado['sesiones'].pop(str(sesion_id), None)
+        if aporte:
+            self._sumar_aporte(estado, aporte, -1)
+    
+    def _sumar_aporte(self, estado: Dict, aporte: Dict, signo: int):
+        """Suma o resta el aporte de una sesión a los contadores del estado"""
+        for clave in ('palabras', 'temas'):
+            contador = estado[clave]
+            for valor in aporte[clave]:
+                contador[valor] = contador.get(valor, 0) + signo
+                if contador[valor] <= 0:
+                    del contador[valor]
+    
+    def resultado_longitudinal(self, estado: Dict) -> Dict:
+        """Genera el resultado del análisis longitudinal a partir del estado"""
+        resultado = {}
+        for _, parcial in self.etapas_longitudinales(estado):
+            resultado.update(parcial)
+        return resultado
+    
+    def etapas_longitudinales(self, estado: Dict) -> Iterator[Tuple[str, Dict]]:
+        """
+        Genera el resultado del análisis longitudinal por etapas
         
-        return {
+        Permite mostrar cada parte apenas está lista (palabras clave,
+        sentimiento, temas y por último insights, que usa las anteriores).
+        
+        Yields:
+            Tuplas (etapa, parte del resultado)
+        """
+        palabras_recurrentes = Counter(estado['palabras']).most_common(10)
+        yield 'palabras_clave', {
             'palabras_recurrentes': [p[0] for p in palabras_recurrentes],
-            'frecuencias': dict(palabras_recurrentes),
+            'frecuencias': dict(palabras_recurrentes)
+        }
+        
+        # Serie de sentimiento en orden cronológico
+        sentimientos = [aporte['sentimiento'] for aporte in self._aportes_cronologicos(estado)]
+        serie = self.series_sentimiento([estado])[0]
+        yield 'sentimiento', {
             'evolucion_sentimiento': sentimientos,
-            'tendencia': self._calcular_tendencia(sentimientos),
-            'total_sesiones': len(textos),
-            'insights': self._generar_insights(palabras_recurrentes, sentimientos)
+            'serie_sentimiento': serie,
+            'tendencia': serie['tendencia'],
+            'total_sesiones': len(sentimientos)
         }
-    
-    def _extraer_temas(self, texto: str) -> List[str]:
-        """Extrae temas principales del texto"""
-        temas_psicologicos = {
-            'ansiedad': ['ansiedad', 'ansioso', 'nervioso', 'preocupación', 'estrés'],
-            'depresión': ['depresión', 'tristeza', 'deprimido', 'desmotivación'],
-            'relaciones': ['pareja', 'familia', 'relación', 'familiar', 'amistad'],
-            'trabajo': ['trabajo', 'laboral', 'empleo', 'jefe', 'compañeros'],
-            'autoestima': ['autoestima', 'confianza', 'valoración', 'autoimagen'],
-            'trauma': ['trauma', 'pasado', 'recuerdo', 'infancia'],
+        
+        yield 'temas', {'temas_frecuencia': dict(Counter(estado['temas']).most_common())}
+        
+        yield 'insights', {
+            'insights': self._generar_insights(palabras_recurrentes, sentimientos, serie) if sentimientos else []
         }
+    
+    def series_sentimiento(self, estados: List[Dict]) -> List[Dict]:
+        """
+        Estadísticas de la serie de sentimiento de varios estados longitudinales
         
-        texto_lower = texto.lower()
-        temas_encontrados = []
+        Todas las series se calculan juntas (ver series_sentimiento.analizar_series).
         
-        for tema, palabras in temas_psicologicos.items():
-            if any(palabra in texto_lower for palabra in palabras):
-                temas_encontrados.append(tema)
+        Args:
+            estados: Estados longitudinales (por ejemplo uno por paciente)
+        
+        Returns:
+            Lista (una por estado) con la serie y sus estadísticas
+        """
+        series = []
+        for estado in estados:
+            aportes = self._aportes_cronologicos(estado)
+            series.append((
+                [aporte['orden'] for aporte in aportes],
+                [aporte.get('puntaje', VALORES_SENTIMIENTO.get(aporte['sentimiento'], 0.0)) for aporte in aportes]
+            ))
+        return analizar_series(series)
+    
+    def _aportes_cronologicos(self, estado: Dict) -> List[Dict]:
+        """Aportes de las sesiones del estado en orden cronológico"""
+        aportes = sorted(estado['sesiones'].items(), key=lambda item: (item[1]['orden'], int(item[0])))
+        return [aporte for _, aporte in aportes]
+    
+    def buscar_terminos_temas(self, texto: Texto) -> List[Dict]:
+        """
+        Busca en una sola pasada todos los términos del léxico de temas
+        
+        Args:
+            texto: Texto a analizar (str o TextoTokenizado)
+        
+        Returns:
+            Lista de dicts con tema, termino, inicio y fin (posiciones en el
+            texto original, útiles para resaltar)
+        """
+        original = self.tokenizar(texto).texto
+        normalizado, posiciones = normalizar_con_posiciones(original)
+        
+        coincidencias = []
+        for inicio, fin, _, tema in self._automata_temas.buscar(normalizado):
+            inicio_original = posiciones[inicio]
+            fin_original = posiciones[fin - 1] + 1
+            coincidencias.append({
+                'tema': tema,
+                'termino': original[inicio_original:fin_original],
+                'inicio': inicio_original,
+                'fin': fin_original
+            })
+        
+        return coincidencias
+    
+    def _extraer_temas(self, texto: Texto) -> List[str]:
+        """Extrae temas principales del texto"""
+        return self._temas_de_coincidencias(self.buscar_terminos_temas(texto))
+    
+    def _temas_de_coincidencias(self, coincidencias: List[Dict]) -> List[str]:
+        """Lista los temas presentes, en el orden del léxico"""
+        encontrados = {c['tema'] for c in coincidencias}
+        temas_encontrados = [tema for tema in self._temas if tema in encontrados]
         
         return temas_encontrados if temas_encontrados else ['general']
     
-    def _generar_recomendaciones_basicas(self, texto: str) -> List[str]:
+    def _generar_recomendaciones_basicas(self, texto: Texto) -> List[str]:
         """Genera recomendaciones básicas"""
+        tokens = self.tokenizar(texto)
         recomendaciones = []
         
-        if 'ansiedad' in texto.lower() or 'ansioso' in texto.lower():
+        if tokens.contiene('ansiedad', 'ansioso'):
             recomendaciones.append("Considerar técnicas de relajación y respiración")
         
-        if 'tristeza' in texto.lower() or 'deprimido' in texto.lower():
+        if tokens.contiene('tristeza', 'deprimido'):
             recomendaciones.append("Evaluar síntomas depresivos y considerar intervenciones específicas")
         
-        if 'familia' in texto.lower() or 'pareja' in texto.lower():
+        if tokens.contiene('familia', 'pareja'):
             recomendaciones.append("Explorar dinámicas relacionales y patrones de comunicación")
         
         if not recomendaciones:
@@ -185,27 +560,8 @@ class IAAnalysisService:
         
         return recomendaciones
     
-    def _calcular_tendencia(self, sentimientos: List[str]) -> str:
-        """Calcula la tendencia de evolución"""
-        if len(sentimientos) < 2:
-            return "sin datos suficientes"
-        
-        # Convertir a valores numéricos
-        valores = {'positivo': 1, 'neutral': 0, 'negativo': -1}
-        numeros = [valores.get(s, 0) for s in sentimientos]
-        
-        # Calcular tendencia simple
-        inicio = sum(numeros[:len(numeros)//2])
-        fin = sum(numeros[len(numeros)//2:])
-        
-        if fin > inicio:
-            return "mejorando"
-        elif fin < inicio:
-            return "empeorando"
-        else:
-            return "estable"
-    
-    def _generar_insights(self, palabras_freq: List[tuple], sentimientos: List[str]) -> List[str]:
+    def _generar_insights(self, palabras_freq: List[tuple], sentimientos: List[str],
+                          serie: Dict) -> List[str]:
         """Genera insights del análisis"""
         insights = []
         
@@ -216,18 +572,25 @@ class IAAnalysisService:
             insights.append(f"La palabra '{palabra_mas_comun}' aparece {freq} veces en las sesiones")
         
         # Insight sobre sentimientos
-        from collections import Counter
         sentimientos_count = Counter(sentimientos)
         sentimiento_predominante = sentimientos_count.most_common(1)[0][0]
         insights.append(f"El sentimiento predominante es: {sentimiento_predominante}")
         
         # Insight sobre evolución
         if len(sentimientos) >= 3:
-            tendencia = self._calcular_tendencia(sentimientos)
-            insights.append(f"La tendencia general es: {tendencia}")
+            insights.append(f"La tendencia general es: {serie['tendencia']}")
+        
+        cambio = serie['cambio']
+        if cambio:
+            direccion = "mejoró" if cambio['media_despues'] > cambio['media_antes'] else "empeoró"
+            sesion = f"del {cambio['desde']}" if serie['eje'] == 'dias' else f"{cambio['indice'] + 1}"
+            insights.append(
+                f"El sentimiento {direccion} a partir de la sesión {sesion} "
+                f"(promedio {cambio['media_antes']:+.2f} → {cambio['media_despues']:+.2f})"
+            )
         
         return insights
 
 
-# Instancia global del servicio
-ia_service = IAAnalysisService()
+# Instancia global del servicio (la del contexto de aplicación actual)
+ia_service = Delegado('ia')
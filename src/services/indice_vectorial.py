@@ -0,0 +1,256 @@
+"""
+Índice vectorial de sesiones
+Convierte cada sesión en un vector con un vectorizador de hashing local (sin
+modelos ni red) y guarda los vectores en una matriz en disco que se consulta
+mapeada en memoria, para encontrar sesiones parecidas por similitud coseno
+"""
+import json
+import math
+import os
+import zlib
+import numpy as np
+from collections import Counter
+from pathlib import Path
+from typing import List, Tuple
+
+
+class VectorizadorHashing:
+    """
+    Vectorizador de hashing: cada término (palabra o par de palabras
+    consecutivas) suma en la columna que indica su hash, con un signo también
+    derivado del hash para que las colisiones tiendan a cancelarse
+    
+    No necesita vocabulario ni entrenamiento, y el mismo texto siempre da el
+    mismo vector (se usa CRC32, estable entre ejecuciones, y no hash()).
+    """
+    
+    def __init__(self, dimensiones: int = 1024):
+        self.dimensiones = dimensiones
+    
+    def vectorizar(self, terminos: List[str]) -> np.ndarray:
+        """
+        Convierte una lista de términos (en orden) en un vector de norma 1
+        
+        Args:
+            terminos: Palabras normalizadas del texto, en orden de aparición
+        
+        Returns:
+            Vector float32 de largo `dimensiones` (todo ceros si no hay términos)
+        """
+        caracteristicas = Counter(terminos)
+        caracteristicas.update(f"{a} {b}" for a, b in zip(terminos, terminos[1:]))
+        
+        vector = np.zeros(self.dimensiones, dtype=np.float32)
+        for termino, cantidad in caracteristicas.items():
+            h = zlib.crc32(termino.encode('utf-8'))
+            signo = 1.0 if h & 0x80000000 else -1.0
+            vector[h % self.dimensiones] += signo * (1.0 + math.log(cantidad))
+        
+        norma = np.linalg.norm(vector)
+        if norma > 0:
+            vector /= norma
+        return vector
+
+
+class IndiceVectorial:
+    """
+    Matriz de vectores de sesiones en disco (archivos .npy mapeados en memoria)
+    
+    Cada fila guarda el vector de una sesión (float16, para ocupar la mitad),
+    junto con el ID de la sesión y del paciente en arreglos paralelos. Las
+    filas de sesiones eliminadas se marcan con ID 0 y se reutilizan. Cuando
+    se llena, la capacidad se duplica.
+    """
+    
+    CAPACIDAD_INICIAL = 1024
+    FILAS_POR_BLOQUE = 65536  # Filas convertidas a float32 a la vez al buscar
+    
+    def __init__(self, directorio, dimensiones: int = 1024):
+        """
+        Args:
+            directorio: Carpeta donde se guardan los archivos del índice
+            dimensiones: Largo de los vectores
+        """
+        self.directorio = Path(directorio)
+        self.dimensiones = dimensiones
+        self._vectores = None
+        self._sesiones = None
+        self._pacientes = None
+        self._filas = {}  # sesion_id -> fila
+        self._libres = []
+        self._huella = None
+    
+    @property
+    def cantidad(self) -> int:
+        """Cantidad de sesiones indexadas"""
+        self._abrir()
+        return len(self._filas)
+    
+    @property
+    def huella(self):
+        """Huella de la base con la que se construyó el índice (se guarda en meta.json)"""
+        self._abrir()
+        return self._huella
+    
+    @huella.setter
+    def huella(self, huella):
+        self._abrir()
+        self._huella = huella
+        self._escribir_meta()
+    
+    def reemplazar(self, sesiones: np.ndarray, pacientes: np.ndarray, vectores: np.ndarray, huella=None):
+        """
+        Reemplaza todo el contenido del índice de una vez
+        
+        Args:
+            sesiones, pacientes: IDs de cada fila
+            vectores: Matriz con un vector por fila
+            huella: Huella de la base de la que salen los vectores
+        """
+        self.limpiar()
+        self._huella = huella
+        self._crear(max(self.CAPACIDAD_INICIAL, len(sesiones)), (vectores, sesiones, pacientes))
+        self._indexar_filas()
+    
+    def agregar(self, sesion_id: int, paciente_id: int, vector: np.ndarray):
+        """Agrega o reemplaza el vector de una sesión"""
+        self._abrir()
+        fila = self._filas.get(sesion_id)
+        if fila is None:
+            if not self._libres:
+                self._crecer()
+            fila = self._libres.pop()
+            self._filas[sesion_id] = fila
+        self._vectores[fila] = vector
+        self._sesiones[fila] = sesion_id
+        self._pacientes[fila] = paciente_id or 0
+    
+    def quitar(self, sesion_id: int):
+        """Quita una sesión del índice (si estaba)"""
+        self._abrir()
+        fila = self._filas.pop(sesion_id, None)
+        if fila is not None:
+            self._vectores[fila] = 0
+            self._sesiones[fila] = 0
+            self._pacientes[fila] = 0
+            self._libres.append(fila)
+    
+    def guardar(self):
+        """Asegura que los cambios estén escritos en disco"""
+        for arreglo in (self._vectores, self._sesiones, self._pacientes):
+            if arreglo is not None:
+                arreglo.flush()
+    
+    def limpiar(self):
+        """Vacía el índice (borra los archivos)"""
+        self.cerrar()
+        for nombre in ('vectores.npy', 'sesiones.npy', 'pacientes.npy', 'meta.json'):
+            ruta = self.directorio / nombre
+            if ruta.exists():
+                ruta.unlink()
+    
+    def cerrar(self):
+        """Libera los mapeos de memoria"""
+        self.guardar()
+        self._vectores = self._sesiones = self._pacientes = None
+        self._filas = {}
+        self._libres = []
+        self._huella = None
+    
+    def buscar(self, vector: np.ndarray, k: int = 5, paciente_id: int = None,
+               excluir: int = None) -> List[Tuple[int, float]]:
+        """
+        Busca las sesiones más parecidas a un vector
+        
+        Args:
+            vector: Vector de consulta (norma 1)
+            k: Cantidad de resultados
+            paciente_id: Limitar la búsqueda a las sesiones de un paciente
+            excluir: ID de sesión a excluir (normalmente la de la consulta)
+        
+        Returns:
+            Lista de (sesion_id, similitud) de mayor a menor similitud
+        """
+        self._abrir()
+        if not self._filas:
+            return []
+        
+        consulta = np.asarray(vector, dtype=np.float32)
+        total = len(self._sesiones)
+        similitudes = np.empty(total, dtype=np.float32)
+        # Por bloques: solo un bloque a la vez se convierte a float32 en memoria
+        for inicio in range(0, total, self.FILAS_POR_BLOQUE):
+            bloque = self._vectores[inicio:inicio + self.FILAS_POR_BLOQUE]
+            similitudes[inicio:inicio + len(bloque)] = bloque.astype(np.float32) @ consulta
+        
+        validas = self._sesiones != 0
+        if paciente_id is not None:
+            validas &= self._pacientes == paciente_id
+        if excluir is not None:
+            validas &= self._sesiones != excluir
+        similitudes[~validas] = -np.inf
+        
+        k = min(k, int(validas.sum()))
+        if k <= 0:
+            return []
+        candidatas = np.argpartition(-similitudes, k - 1)[:k]
+        candidatas = candidatas[np.argsort(-similitudes[candidatas])]
+        return [(int(self._sesiones[i]), float(similitudes[i])) for i in candidatas]
+    
+    def _abrir(self):
+        """Mapea los archivos en memoria (creándolos si no existen)"""
+        if self._vectores is not None:
+            return
+        
+        meta = self.directorio / 'meta.json'
+        datos = json.loads(meta.read_text()) if meta.exists() else {}
+        if datos.get('dimensiones') == self.dimensiones:
+            self._vectores = np.load(self.directorio / 'vectores.npy', mmap_mode='r+')
+            self._sesiones = np.load(self.directorio / 'sesiones.npy', mmap_mode='r+')
+            self._pacientes = np.load(self.directorio / 'pacientes.npy', mmap_mode='r+')
+            self._huella = datos.get('huella')
+        else:
+            self._crear(self.CAPACIDAD_INICIAL)
+        self._indexar_filas()
+    
+    def _indexar_filas(self):
+        """Arma el mapa sesion_id -> fila y la lista de filas libres"""
+        ocupadas = np.flatnonzero(self._sesiones)
+        self._filas = dict(zip(self._sesiones[ocupadas].tolist(), ocupadas.tolist()))
+        self._libres = np.flatnonzero(self._sesiones == 0)[::-1].tolist()
+    
+    def _crear(self, capacidad: int, anteriores=None):
+        """Crea archivos nuevos con la capacidad indicada, copiando las filas anteriores"""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        archivos = []
+        for i, (nombre, forma, tipo) in enumerate((('vectores', (capacidad, self.dimensiones), np.float16),
+                                                   ('sesiones', (capacidad,), np.int64),
+                                                   ('pacientes', (capacidad,), np.int64))):
+            temporal = self.directorio / f"{nombre}.tmp.npy"
+            arreglo = np.lib.format.open_memmap(temporal, mode='w+', dtype=tipo, shape=forma)
+            if anteriores is not None:
+                arreglo[:len(anteriores[i])] = anteriores[i]
+            arreglo.flush()
+            del arreglo  # Cerrar el mapeo antes de renombrar (necesario en Windows)
+            archivos.append((temporal, self.directorio / f"{nombre}.npy"))
+        
+        self._vectores = self._sesiones = self._pacientes = None
+        for temporal, destino in archivos:
+            os.replace(temporal, destino)
+        self._escribir_meta()
+        
+        self._vectores = np.load(self.directorio / 'vectores.npy', mmap_mode='r+')
+        self._sesiones = np.load(self.directorio / 'sesiones.npy', mmap_mode='r+')
+        self._pacientes = np.load(self.directorio / 'pacientes.npy', mmap_mode='r+')
+    
+    def _escribir_meta(self):
+        (self.directorio / 'meta.json').write_text(
+            json.dumps({'dimensiones': self.dimensiones, 'huella': self._huella})
+        )
+    
+    def _crecer(self):
+        """Duplica la capacidad del índice"""
+        capacidad = len(self._sesiones)
+        anteriores = (np.array(self._vectores), np.array(self._sesiones), np.array(self._pacientes))
+        self._crear(capacidad * 2, anteriores)
+        self._libres = list(range(capacidad * 2 - 1, capacidad - 1, -1))
@@ -0,0 +1,144 @@
+"""
+Caché en disco de respuestas del LLM
+Las respuestas se guardan direccionadas por contenido (modelo + versión de la
+plantilla del prompt + texto normalizado), con desalojo LRU por cantidad de
+entradas y por tamaño total
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from src.services.metricas import cache_metricas
+
+
+def normalizar_texto(texto: str) -> str:
+    """Normaliza el texto para que variaciones de espacios o de Unicode den la misma clave"""
+    return " ".join(unicodedata.normalize("NFC", texto or "").split())
+
+
+class CacheRespuestasLLM:
+    """
+    Caché LRU de respuestas del LLM en archivos JSON
+    
+    El orden de uso se mantiene en memoria y se persiste en la fecha de
+    modificación de cada archivo, así sobrevive entre ejecuciones.
+    """
+    
+    def __init__(self, directorio="data/llm_cache", max_bytes: int = 50 * 1024 * 1024,
+                 max_entradas: int = 20000):
+        """
+        Args:
+            directorio: Carpeta donde se guardan las respuestas
+            max_bytes: Tamaño total máximo de la caché
+            max_entradas: Cantidad máxima de respuestas guardadas
+        """
+        self.directorio = Path(directorio)
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._indice = None  # clave -> tamaño en bytes, de la menos a la más usada
+        self._total = 0
+    
+    @staticmethod
+    def clave(modelo: str, plantilla: str, texto: str) -> str:
+        """
+        Calcula la clave de una respuesta
+        
+        Args:
+            modelo: Modelo que genera la respuesta
+            plantilla: Identificador y versión de la plantilla del prompt
+            texto: Contenido enviado (se normaliza)
+        """
+        contenido = f"{modelo}\0{plantilla}\0{normalizar_texto(texto)}"
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+    
+    def obtener(self, clave: str) -> Optional[dict]:
+        """Devuelve la respuesta guardada, o None si no está"""
+        with self._lock:
+            indice = self._cargar_indice()
+            if clave not in indice:
+                cache_metricas.incrementar(cache='llm', resultado='fallo')
+                return None
+            ruta = self._ruta(clave)
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    valor = json.load(f)
+                os.utime(ruta)
+            except (OSError, ValueError):
+                # Archivo borrado o dañado: descartar la entrada
+                self._quitar(clave)
+                cache_metricas.incrementar(cache='llm', resultado='fallo')
+                return None
+            indice.move_to_end(clave)
+            cache_metricas.incrementar(cache='llm', resultado='acierto')
+            return valor
+    
+    def guardar(self, clave: str, valor: dict):
+        """Guarda una respuesta y desaloja las menos usadas si se superan los límites"""
+        datos = json.dumps(valor, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            indice = self._cargar_indice()
+            ruta = self._ruta(clave)
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            
+            # Escritura atómica: otro proceso nunca ve un archivo a medias
+            fd, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(datos)
+            os.replace(temporal, ruta)
+            
+            self._total -= indice.pop(clave, 0)
+            indice[clave] = len(datos)
+            self._total += len(datos)
+            self._desalojar()
+    
+    def limpiar(self):
+        """Elimina todas las respuestas guardadas"""
+        with self._lock:
+            for clave in list(self._cargar_indice()):
+                self._quitar(clave)
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._cargar_indice())
+    
+    @property
+    def tamaño_total(self) -> int:
+        """Tamaño total de las respuestas guardadas, en bytes"""
+        with self._lock:
+            self._cargar_indice()
+            return self._total
+    
+    def _ruta(self, clave: str) -> Path:
+        return self.directorio / clave[:2] / f"{clave}.json"
+    
+    def _cargar_indice(self) -> OrderedDict:
+        """Recorre la carpeta una sola vez y ordena las entradas por último uso"""
+        if self._indice is None:
+            entradas = []
+            if self.directorio.exists():
+                for ruta in self.directorio.glob('*/*.json'):
+                    estado = ruta.stat()
+                    entradas.append((estado.st_mtime, ruta.stem, estado.st_size))
+            entradas.sort()
+            self._indice = OrderedDict((clave, tamaño) for _, clave, tamaño in entradas)
+            self._total = sum(tamaño for _, _, tamaño in entradas)
+        return self._indice
+    
+    def _quitar(self, clave: str):
+        self._total -= self._indice.pop(clave, 0)
+        try:
+            self._ruta(clave).unlink()
+        except FileNotFoundError:
+            pass
+    
+    def _desalojar(self):
+        """Quita las entradas menos usadas hasta respetar los límites"""
+        while self._indice and (self._total > self.max_bytes or len(self._indice) > self.max_entradas):
+            clave = next(iter(self._indice))
+            self._quitar(clave)
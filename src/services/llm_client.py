@@ -0,0 +1,433 @@
+"""
+Cliente asíncrono para análisis con LLM
+Envía las sesiones a un endpoint de chat completions (OpenAI o el servidor
+stub local) con concurrencia acotada, lotes, timeouts, reintentos y cancelación
+"""
+import asyncio
+import json
+import math
+import random
+import threading
+from typing import Callable, Dict, List, Tuple
+
+# Incrementar al cambiar los prompts: invalida las respuestas en caché
+VERSION_PROMPT = 1
+
+PROMPT_SISTEMA = (
+    "Sos un asistente para psicólogos. Vas a recibir un JSON con una lista de "
+    "sesiones clínicas ({\"sesiones\": [{\"id\", \"texto\"}]}). Para cada una "
+    "devolvé únicamente un JSON con la forma {\"sesiones\": [{\"id\", "
+    "\"palabras_clave\": [..], \"sentimiento\": \"positivo|negativo|neutral\", "
+    "\"temas_principales\": [..], \"recomendaciones\": [..]}]}."
+)
+
+PROMPT_RESUMEN = (
+    "Sos un asistente para psicólogos. Vas a recibir un JSON {\"textos\": [..]} "
+    "con sesiones consecutivas de un paciente, en orden cronológico. Devolvé "
+    "únicamente un JSON con la forma {\"resumen\": \"..\", \"temas\": [..], "
+    "\"insights\": [..]} describiendo la evolución a lo largo de esas sesiones."
+)
+
+PROMPT_COMBINAR = (
+    "Sos un asistente para psicólogos. Vas a recibir un JSON {\"textos\": [..]} "
+    "con resúmenes parciales (en JSON) de la historia de un paciente, en orden "
+    "cronológico. Combinalos en un único JSON con la forma {\"resumen\": \"..\", "
+    "\"temas\": [..], \"insights\": [..]} que describa la evolución completa."
+)
+
+# Errores HTTP que vale la pena reintentar
+ESTADOS_REINTENTABLES = {408, 409, 429, 500, 502, 503, 504}
+
+# Estimación de tokens: ~4 caracteres por token con los tokenizadores de OpenAI
+CARACTERES_POR_TOKEN = 4
+
+# Tokens de entrada por pedido (deja lugar al prompt y a la respuesta en un contexto de 8k)
+PRESUPUESTO_TOKENS = 5000
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimación rápida (sin tokenizador) de la cantidad de tokens de un texto"""
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def _partir_texto(texto: str, presupuesto: int) -> List[str]:
+    """Parte un texto que no entra en el presupuesto, respetando palabras"""
+    if estimar_tokens(texto) <= presupuesto:
+        return [texto]
+    
+    max_caracteres = presupuesto * CARACTERES_POR_TOKEN
+    partes, actual, largo = [], [], 0
+    for palabra in texto.split():
+        if actual and largo + len(palabra) + 1 > max_caracteres:
+            partes.append(" ".join(actual))
+            actual, largo = [], 0
+        actual.append(palabra)
+        largo += len(palabra) + 1
+    if actual:
+        partes.append(" ".join(actual))
+    return partes
+
+
+def dividir_en_bloques(textos: List[str], presupuesto: int = PRESUPUESTO_TOKENS) -> List[List[str]]:
+    """
+    Agrupa textos consecutivos en bloques que no superan el presupuesto de tokens
+    
+    Los textos que por sí solos superan el presupuesto se parten.
+    
+    Args:
+        textos: Textos en orden
+        presupuesto: Tokens máximos por bloque
+    
+    Returns:
+        Lista de bloques (listas de textos), en el mismo orden
+    """
+    bloques, actual, usados = [], [], 0
+    for texto in textos:
+        for parte in _partir_texto(texto, presupuesto):
+            tokens = estimar_tokens(parte)
+            if actual and usados + tokens > presupuesto:
+                bloques.append(actual)
+                actual, usados = [], 0
+            actual.append(parte)
+            usados += tokens
+    if actual:
+        bloques.append(actual)
+    return bloques
+
+
+class ErrorLLM(Exception):
+    """Error al obtener una respuesta válida del LLM"""
+
+
+class EjecucionLLM:
+    """
+    Estado de una ejecución de ClienteLLM: su bandera de cancelación, su
+    event loop y sus tareas en vuelo
+    
+    Cada ejecución tiene el suyo, así varias pueden compartir el cliente
+    (cada una en su hilo) y cancelar una no afecta a las demás.
+    """
+    
+    def __init__(self):
+        self._cancelado = threading.Event()
+        self._loop = None
+        self._tareas = set()
+    
+    def cancelar(self):
+        """Cancela esta ejecución (se puede llamar desde cualquier hilo, antes o durante)"""
+        self._cancelado.set()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._cancelar_tareas)
+    
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelado.is_set()
+    
+    def _cancelar_tareas(self):
+        for tarea in list(self._tareas):
+            tarea.cancel()
+
+
+class ClienteLLM:
+    """
+    Cliente asíncrono de chat completions
+    
+    Uso desde un hilo que no sea el de la interfaz:
+        
+        cliente = ClienteLLM(api_key, "gpt-4")
+        ejecucion = EjecucionLLM()
+        resultados = cliente.ejecutar([(sesion_id, texto), ...], al_recibir=callback,
+                                      ejecucion=ejecucion)
+    
+    y desde la interfaz, ejecucion.cancelar() para detener ese trabajo. El
+    cliente no guarda estado de las ejecuciones: puede usarse desde varios
+    hilos a la vez.
+    """
+    
+    def __init__(self, api_key: str, model: str, base_url: str = None,
+                 max_concurrencia: int = 4, tamaño_lote: int = 1,
+                 timeout: float = 60.0, reintentos: int = 3, backoff: float = 1.0,
+                 cache=None, presupuesto_tokens: int = PRESUPUESTO_TOKENS):
+        """
+        Args:
+            api_key: Clave de la API
+            model: Modelo a usar
+            base_url: URL base del endpoint (None usa la de OpenAI)
+            max_concurrencia: Máximo de pedidos HTTP simultáneos
+            tamaño_lote: Cantidad máxima de sesiones enviadas en cada pedido
+            timeout: Tiempo máximo por pedido, en segundos
+            reintentos: Reintentos ante timeouts o errores transitorios
+            backoff: Espera inicial entre reintentos (se duplica en cada intento)
+            cache: CacheRespuestasLLM opcional, para no repetir pedidos
+            presupuesto_tokens: Tokens de entrada máximos por pedido
+        """
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.max_concurrencia = max(1, max_concurrencia)
+        self.tamaño_lote = max(1, tamaño_lote)
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.cache = cache
+        self.presupuesto_tokens = presupuesto_tokens
+    
+    def ejecutar(self, sesiones: List[Tuple[int, str]],
+                 al_recibir: Callable[[int, Dict], None] = None,
+                 ejecucion: EjecucionLLM = None) -> Dict[int, Dict]:
+        """
+        Analiza las sesiones bloqueando el hilo actual hasta terminar o cancelar
+        
+        Args:
+            sesiones: Lista de (sesion_id, texto)
+            al_recibir: Callback (sesion_id, analisis) invocado a medida que
+                llegan los resultados (desde este mismo hilo)
+            ejecucion: EjecucionLLM con la que cancelar desde otro hilo
+        
+        Returns:
+            Dict sesion_id -> análisis de las sesiones completadas
+        """
+        return asyncio.run(self.analizar(sesiones, al_recibir, ejecucion or EjecucionLLM()))
+    
+    def resumir_historia(self, textos: List[str], ejecucion: EjecucionLLM = None) -> Dict:
+        """
+        Resume la historia de un paciente bloqueando el hilo actual
+        
+        Args:
+            textos: Textos de las sesiones en orden cronológico
+            ejecucion: EjecucionLLM con la que cancelar desde otro hilo
+        
+        Returns:
+            Dict con resumen, temas e insights
+        """
+        return asyncio.run(self.resumir(textos, ejecucion or EjecucionLLM()))
+    
+    def _crear_cliente(self):
+        from openai import AsyncOpenAI
+        
+        # Los reintentos y timeouts se manejan acá, no en la librería
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                           max_retries=0, timeout=self.timeout)
+    
+    def _clave_cache(self, plantilla: str, texto: str) -> str:
+        return self.cache.clave(self.model, f"{plantilla}-v{VERSION_PROMPT}", texto)
+    
+    def _armar_lotes(self, sesiones: List[Tuple[int, str]]) -> List[List[Tuple[int, str]]]:
+        """Agrupa sesiones respetando el tamaño de lote y el presupuesto de tokens"""
+        lotes, actual, usados = [], [], 0
+        for sesion_id, texto in sesiones:
+            tokens = estimar_tokens(texto)
+            if actual and (len(actual) >= self.tamaño_lote or usados + tokens > self.presupuesto_tokens):
+                lotes.append(actual)
+                actual, usados = [], 0
+            actual.append((sesion_id, texto))
+            usados += tokens
+        if actual:
+            lotes.append(actual)
+        return lotes
+    
+    async def analizar(self, sesiones: List[Tuple[int, str]],
+                       al_recibir: Callable[[int, Dict], None] = None,
+                       ejecucion: EjecucionLLM = None) -> Dict[int, Dict]:
+        """
+        Analiza las sesiones en lotes concurrentes
+        
+        Los resultados se entregan por al_recibir en el orden en que llegan
+        (primero los que ya estaban en caché). Un lote que falla después de
+        agotar los reintentos se omite (sus sesiones no aparecen en el resultado).
+        """
+        ejecucion = ejecucion or EjecucionLLM()
+        ejecucion._loop = asyncio.get_running_loop()
+        resultados = {}
+        textos = dict(sesiones)
+        
+        def entregar(sesion_id, analisis):
+            resultados[sesion_id] = analisis
+            if al_recibir:
+                al_recibir(sesion_id, analisis)
+        
+        # Las sesiones con respuesta en caché no se vuelven a pedir
+        pendientes = []
+        for sesion_id, texto in sesiones:
+            guardado = self.cache.obtener(self._clave_cache('sesion', texto)) if self.cache is not None else None
+            if guardado is None:
+                pendientes.append((sesion_id, texto))
+            else:
+                entregar(sesion_id, guardado)
+        
+        if ejecucion.cancelado or not pendientes:
+            ejecucion._loop = None
+            return resultados
+        
+        semaforo = asyncio.Semaphore(self.max_concurrencia)
+        cliente = self._crear_cliente()
+        
+        async def procesar(lote):
+            async with semaforo:
+                if ejecucion.cancelado:
+                    return
+                try:
+                    respuesta = await self._con_reintentos(lambda: self._pedir(cliente, lote))
+                except ErrorLLM as e:
+                    print(f"Error en análisis con IA: {e}")
+                    return
+            for sesion_id, analisis in respuesta.items():
+                if self.cache is not None:
+                    self.cache.guardar(self._clave_cache('sesion', textos[sesion_id]), analisis)
+                entregar(sesion_id, analisis)
+        
+        try:
+            ejecucion._tareas = {asyncio.ensure_future(procesar(lote)) for lote in self._armar_lotes(pendientes)}
+            if ejecucion.cancelado:
+                # Cancelada mientras se preparaban los lotes
+                ejecucion._cancelar_tareas()
+            await asyncio.gather(*ejecucion._tareas, return_exceptions=True)
+        finally:
+            ejecucion._tareas = set()
+            ejecucion._loop = None
+            await cliente.close()
+        
+        return resultados
+    
+    async def resumir(self, textos: List[str], ejecucion: EjecucionLLM = None) -> Dict:
+        """
+        Resume una historia larga con map-reduce, sin superar el presupuesto de tokens
+        
+        Las sesiones se agrupan en bloques y cada bloque se resume por separado
+        (map); luego los resúmenes parciales se combinan, también por bloques,
+        hasta que queda uno solo (reduce).
+        
+        Raises:
+            ErrorLLM: Si algún pedido falla o se cancela
+        """
+        ejecucion = ejecucion or EjecucionLLM()
+        ejecucion._loop = asyncio.get_running_loop()
+        semaforo = asyncio.Semaphore(self.max_concurrencia)
+        cliente = self._crear_cliente()
+        
+        async def resumir_bloque(plantilla, prompt, bloque):
+            async with semaforo:
+                if ejecucion.cancelado:
+                    raise ErrorLLM("Análisis cancelado")
+                return await self._resumir_bloque(cliente, plantilla, prompt, bloque)
+        
+        async def etapa(plantilla, prompt, bloques):
+            tareas = [asyncio.ensure_future(resumir_bloque(plantilla, prompt, b)) for b in bloques]
+            ejecucion._tareas = set(tareas)
+            if ejecucion.cancelado:
+                ejecucion._cancelar_tareas()
+            try:
+                # gather conserva el orden de los bloques (importa la cronología)
+                return await asyncio.gather(*tareas)
+            except asyncio.CancelledError:
+                raise ErrorLLM("Análisis cancelado")
+            finally:
+                for tarea in tareas:
+                    tarea.cancel()
+        
+        try:
+            parciales = await etapa('resumen', PROMPT_RESUMEN,
+                                    dividir_en_bloques(textos, self.presupuesto_tokens))
+            while len(parciales) > 1:
+                entradas = [json.dumps(p, ensure_ascii=False) for p in parciales]
+                bloques = dividir_en_bloques(entradas, self.presupuesto_tokens)
+                if len(bloques) == len(entradas):
+                    # Cada resumen llena un bloque: combinar de a pares para avanzar
+                    bloques = [entradas[i:i + 2] for i in range(0, len(entradas), 2)]
+                parciales = await etapa('combinar', PROMPT_COMBINAR, bloques)
+        finally:
+            ejecucion._tareas = set()
+            ejecucion._loop = None
+            await cliente.close()
+        
+        return parciales[0] if parciales else {'resumen': '', 'temas': [], 'insights': []}
+    
+    async def _resumir_bloque(self, cliente, plantilla: str, prompt: str, bloque: List[str]) -> Dict:
+        """Resume un bloque de textos, usando la caché si está disponible"""
+        contenido = json.dumps({'textos': bloque}, ensure_ascii=False)
+        clave = self._clave_cache(plantilla, contenido) if self.cache is not None else None
+        if clave:
+            guardado = self.cache.obtener(clave)
+            if guardado is not None:
+                return guardado
+        
+        respuesta = await self._con_reintentos(lambda: self._completar(cliente, prompt, contenido))
+        resumen = {
+            'resumen': str(respuesta.get('resumen') or ''),
+            'temas': list(respuesta.get('temas') or []),
+            'insights': list(respuesta.get('insights') or []),
+        }
+        if clave:
+            self.cache.guardar(clave, resumen)
+        return resumen
+    
+    async def _con_reintentos(self, pedido: Callable):
+        """
+        Ejecuta un pedido reintentando con backoff exponencial y jitter
+        
+        Args:
+            pedido: Función sin argumentos que devuelve la corrutina del pedido
+        """
+        from openai import APIConnectionError, APIStatusError, APITimeoutError
+        
+        intento = 0
+        while True:
+            try:
+                return await asyncio.wait_for(pedido(), self.timeout)
+            except (asyncio.TimeoutError, APITimeoutError, APIConnectionError) as e:
+                error = e
+            except APIStatusError as e:
+                if e.status_code not in ESTADOS_REINTENTABLES:
+                    raise ErrorLLM(f"HTTP {e.status_code}: {e.message}")
+                error = e
+            
+            if intento >= self.reintentos:
+                raise ErrorLLM(f"Sin respuesta después de {intento + 1} intentos: {type(error).__name__} {error}")
+            espera = self.backoff * (2 ** intento) * (0.5 + random.random())
+            intento += 1
+            await asyncio.sleep(espera)
+    
+    async def _completar(self, cliente, prompt: str, contenido: str) -> Dict:
+        """Envía un pedido de chat completions y devuelve el JSON de la respuesta"""
+        respuesta = await cliente.chat.completions.create(
+            model=self.model,
+            messages=[
+                {'role': 'system', 'content': prompt},
+                {'role': 'user', 'content': contenido},
+            ],
+            response_format={'type': 'json_object'},
+            temperature=0,
+        )
+        try:
+            datos = json.loads(respuesta.choices[0].message.content or "")
+        except json.JSONDecodeError:
+            raise ErrorLLM("La respuesta del modelo no es JSON válido")
+        if not isinstance(datos, dict):
+            raise ErrorLLM("La respuesta del modelo no es un objeto JSON")
+        return datos
+    
+    async def _pedir(self, cliente, lote) -> Dict[int, Dict]:
+        """Envía un lote de sesiones y devuelve sus análisis por id"""
+        contenido = json.dumps(
+            {'sesiones': [{'id': sesion_id, 'texto': texto} for sesion_id, texto in lote]},
+            ensure_ascii=False
+        )
+        datos = await self._completar(cliente, PROMPT_SISTEMA, contenido)
+        return self._interpretar(datos, lote)
+    
+    def _interpretar(self, datos: Dict, lote) -> Dict[int, Dict]:
+        """Valida los análisis devueltos por el modelo"""
+        ids = {sesion_id for sesion_id, _ in lote}
+        resultados = {}
+        for item in datos.get('sesiones', []):
+            if item.get('id') not in ids:
+                continue
+            sentimiento = item.get('sentimiento')
+            resultados[item['id']] = {
+                'palabras_clave': list(item.get('palabras_clave') or []),
+                'sentimiento': sentimiento if sentimiento in ('positivo', 'negativo', 'neutral') else 'neutral',
+                'temas_principales': list(item.get('temas_principales') or []) or ['general'],
+                'recomendaciones': list(item.get('recomendaciones') or []),
+            }
+        return resultados
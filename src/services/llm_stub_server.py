@@ -0,0 +1,202 @@
+"""
+Servidor stub de chat completions
+Imita el endpoint /v1/chat/completions de OpenAI con latencia configurable,
+respondiendo con el análisis básico local. Sirve para probar y medir el
+cliente asíncrono sin conexión a internet.
+
+Uso:
+    python -m src.services.llm_stub_server --puerto 8765 --latencia 0.5
+    python -m src.services.llm_stub_server --benchmark 200 --concurrencia 8
+
+Con el servidor corriendo, configurar en .env:
+    OPENAI_API_KEY=stub
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _ManejadorChat(BaseHTTPRequestHandler):
+    """Atiende POST /v1/chat/completions"""
+    
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._responder(404, {'error': {'message': 'Not found'}})
+            return
+        
+        servidor = self.server
+        longitud = int(self.headers.get('Content-Length', 0))
+        pedido = json.loads(self.rfile.read(longitud) or b'{}')
+        
+        with servidor.lock:
+            servidor.pedidos += 1
+        
+        # Latencia simulada (con algo de variación) y errores transitorios opcionales
+        time.sleep(max(0.0, random.gauss(servidor.latencia, servidor.latencia * 0.1)))
+        if servidor.tasa_error and random.random() < servidor.tasa_error:
+            self._responder(503, {'error': {'message': 'Servicio no disponible (stub)'}})
+            return
+        
+        self._responder(200, self._completar(pedido))
+    
+    def _completar(self, pedido: dict) -> dict:
+        from src.services.ia_analysis_service import ia_service
+        
+        mensajes = [m for m in pedido.get('messages', []) if m.get('role') == 'user']
+        try:
+            datos = json.loads(mensajes[-1]['content'])
+        except (IndexError, ValueError):
+            datos = {}
+        
+        if 'textos' in datos:
+            # Resumen (map) o combinación de resúmenes (reduce) de una historia
+            textos = []
+            for texto in datos['textos']:
+                try:
+                    textos.append(json.loads(texto)['resumen'])  # Resumen parcial
+                except (ValueError, TypeError, KeyError):
+                    textos.append(str(texto))
+            patron = ia_service._analisis_patron_basico(textos)
+            respuesta = {
+                'resumen': " ".join(textos)[:300],
+                'temas': ia_service._extraer_temas(" ".join(textos)),
+                'insights': patron['insights'],
+            }
+        else:
+            resultados = []
+            for sesion in datos.get('sesiones', []):
+                analisis = ia_service._analisis_basico(sesion.get('texto', ''))
+                analisis.pop('coincidencias_temas', None)
+                resultados.append({'id': sesion.get('id'), **analisis})
+            respuesta = {'sesiones': resultados}
+        
+        contenido = json.dumps(respuesta, ensure_ascii=False)
+        return {
+            'id': f"chatcmpl-stub-{self.server.pedidos}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': pedido.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': contenido},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }
+    
+    def _responder(self, estado: int, cuerpo: dict):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        try:
+            self.wfile.write(datos)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente canceló el pedido
+    
+    def log_message(self, formato, *args):
+        pass  # Silencioso
+
+
+class ServidorStubLLM:
+    """
+    Servidor stub que corre en un hilo de fondo
+        
+        with ServidorStubLLM(latencia=0.2) as servidor:
+            cliente = ClienteLLM("stub", "gpt-4", base_url=servidor.base_url)
+    """
+    
+    def __init__(self, puerto: int = 0, latencia: float = 0.5, tasa_error: float = 0.0):
+        """
+        Args:
+            puerto: Puerto local (0 elige uno libre)
+            latencia: Latencia media simulada por pedido, en segundos
+            tasa_error: Proporción de pedidos que responden 503
+        """
+        self._http = ThreadingHTTPServer(('127.0.0.1', puerto), _ManejadorChat)
+        self._http.daemon_threads = True
+        self._http.latencia = latencia
+        self._http.tasa_error = tasa_error
+        self._http.pedidos = 0
+        self._http.lock = threading.Lock()
+        self._hilo = None
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._http.server_address[1]}/v1"
+    
+    @property
+    def pedidos(self) -> int:
+        """Cantidad de pedidos recibidos"""
+        return self._http.pedidos
+    
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+    
+    def detener(self):
+        self._http.shutdown()
+        self._http.server_close()
+    
+    def __enter__(self):
+        return self.iniciar()
+    
+    def __exit__(self, *args):
+        self.detener()
+
+
+def medir_throughput(cantidad: int = 100, concurrencia: int = 8, tamaño_lote: int = 1,
+                     latencia: float = 0.2) -> dict:
+    """
+    Mide el throughput del cliente asíncrono contra el servidor stub
+    
+    Returns:
+        Dict con sesiones, pedidos, segundos y sesiones_por_segundo
+    """
+    from src.services.llm_client import ClienteLLM
+    
+    sesiones = [(i, "El paciente refiere ansiedad por el trabajo y mejoría en la familia")
+                for i in range(cantidad)]
+    
+    with ServidorStubLLM(latencia=latencia) as servidor:
+        cliente = ClienteLLM("stub", "stub", base_url=servidor.base_url,
+                             max_concurrencia=concurrencia, tamaño_lote=tamaño_lote)
+        inicio = time.perf_counter()
+        resultados = cliente.ejecutar(sesiones)
+        segundos = time.perf_counter() - inicio
+        pedidos = servidor.pedidos
+    
+    return {
+        'sesiones': len(resultados),
+        'pedidos': pedidos,
+        'segundos': segundos,
+        'sesiones_por_segundo': len(resultados) / segundos if segundos else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor stub de chat completions")
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.5)
+    parser.add_argument('--tasa-error', type=float, default=0.0)
+    parser.add_argument('--benchmark', type=int, default=0,
+                        help="Cantidad de sesiones a analizar midiendo throughput")
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--lote', type=int, default=1)
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        print(medir_throughput(args.benchmark, args.concurrencia, args.lote, args.latencia))
+    else:
+        servidor = ServidorStubLLM(args.puerto, args.latencia, args.tasa_error)
+        print(f"Servidor stub escuchando en {servidor.base_url}")
+        try:
+            servidor._http.serve_forever()
+        except KeyboardInterrupt:
+            servidor.detener()
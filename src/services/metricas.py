@@ -0,0 +1,305 @@
+"""
+Métricas de operación
+Registro en proceso de contadores, medidores e histogramas (consultas,
+cachés, backups, análisis, tamaño de la base), exportable en el formato de
+texto de Prometheus por un puerto HTTP local o a un archivo.
+
+Variables de entorno (las lee activar_desde_entorno):
+    PSICOLARG_METRICAS_PUERTO   sirve /metrics en 127.0.0.1 en ese puerto
+    PSICOLARG_METRICAS_ARCHIVO  escribe las métricas en ese archivo al cerrar
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Límites (en segundos) por defecto de los histogramas de duración
+LIMITES_SEGUNDOS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatear(valor: float) -> str:
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    """Base de las métricas: valores por combinación de etiquetas"""
+    
+    tipo = 'untyped'
+    
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+    
+    def _clave(self, etiquetas: Dict) -> tuple:
+        desconocidas = set(etiquetas) - set(self.etiquetas)
+        if desconocidas:
+            raise ValueError(f"{self.nombre}: etiquetas desconocidas {sorted(desconocidas)}")
+        return tuple(str(etiquetas.get(e, '')) for e in self.etiquetas)
+    
+    def _etiquetas_texto(self, clave: tuple, extra: str = '') -> str:
+        pares = [f'{e}="{_escapar(v)}"' for e, v in zip(self.etiquetas, clave)]
+        if extra:
+            pares.append(extra)
+        return '{' + ','.join(pares) + '}' if pares else ''
+    
+    def lineas(self) -> List[str]:
+        """Líneas de la métrica en el formato de texto de Prometheus"""
+        with self._lock:
+            valores = dict(self._valores)
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for clave, valor in sorted(valores.items()):
+            lineas.append(f"{self.nombre}{self._etiquetas_texto(clave)} {_formatear(valor)}")
+        return lineas
+
+
+class Contador(_Metrica):
+    """Valor que solo aumenta (operaciones, aciertos de caché...)"""
+    
+    tipo = 'counter'
+    
+    def incrementar(self, valor: float = 1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+    
+    def valor(self, **etiquetas) -> float:
+        return self._valores.get(self._clave(etiquetas), 0)
+
+
+class Medidor(_Metrica):
+    """Valor que sube y baja; con `funcion`, se calcula al exportar"""
+    
+    tipo = 'gauge'
+    
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 funcion: Optional[Callable[[], float]] = None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+    
+    def fijar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = valor
+    
+    def valor(self, **etiquetas) -> float:
+        if self.funcion is not None:
+            return self.funcion()
+        return self._valores.get(self._clave(etiquetas), 0)
+    
+    def lineas(self) -> List[str]:
+        if self.funcion is not None:
+            try:
+                self.fijar(self.funcion())
+            except Exception:
+                pass  # Se exporta el último valor conocido
+        return super().lineas()
+
+
+class Histograma(_Metrica):
+    """Distribución de valores (duraciones) en intervalos acumulados"""
+    
+    tipo = 'histogram'
+    
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 limites: Sequence[float] = LIMITES_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+    
+    def observar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            datos = self._valores.get(clave)
+            if datos is None:
+                datos = self._valores[clave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            datos[0][indice] += 1
+            datos[1] += valor
+            datos[2] += 1
+    
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Observa la duración (en segundos) del bloque"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+    
+    def cronometrar(self, **etiquetas):
+        """Decorador que observa la duración de cada llamada a la función"""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with self.medir(**etiquetas):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+    
+    def cantidad(self, **etiquetas) -> int:
+        datos = self._valores.get(self._clave(etiquetas))
+        return datos[2] if datos else 0
+    
+    def lineas(self) -> List[str]:
+        with self._lock:
+            valores = {clave: (list(cubetas), suma, cantidad)
+                       for clave, (cubetas, suma, cantidad) in self._valores.items()}
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for clave, (cubetas, suma, cantidad) in sorted(valores.items()):
+            acumulado = 0
+            for limite, en_cubeta in zip(self.limites + (float('inf'),), cubetas):
+                acumulado += en_cubeta
+                le = f'le="{_formatear(limite)}"'
+                lineas.append(f"{self.nombre}_bucket{self._etiquetas_texto(clave, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{self._etiquetas_texto(clave)} {_formatear(suma)}")
+            lineas.append(f"{self.nombre}_count{self._etiquetas_texto(clave)} {cantidad}")
+        return lineas
+
+
+def _clase_manejador():
+    """Manejador HTTP de GET /metrics (http.server se importa solo si se sirve)"""
+    from http.server import BaseHTTPRequestHandler
+    
+    class _ManejadorMetricas(BaseHTTPRequestHandler):
+        
+        def do_GET(self):
+            if self.path.split('?')[0].rstrip('/') not in ('', '/metrics'):
+                self.send_error(404)
+                return
+            cuerpo = self.server.registro.exportar().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+        
+        def log_message(self, formato, *args):
+            pass
+    
+    return _ManejadorMetricas
+
+
+class RegistroMetricas:
+    """
+    Registro de métricas por nombre
+    
+    contador/medidor/histograma devuelven la métrica existente si ya se
+    registró con ese nombre, así varios módulos pueden compartirla.
+    """
+    
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+        self._http = None
+        self.archivo_al_cerrar = None
+    
+    def _registrar(self, clase, nombre, ayuda, etiquetas, **opciones):
+        with self._lock:
+            metrica = self._metricas.get(nombre)
+            if metrica is None:
+                metrica = self._metricas[nombre] = clase(nombre, ayuda, etiquetas, **opciones)
+            elif type(metrica) is not clase or metrica.etiquetas != tuple(etiquetas):
+                raise ValueError(f"La métrica {nombre} ya existe con otro tipo o etiquetas")
+            return metrica
+    
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador, nombre, ayuda, etiquetas)
+    
+    def medidor(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                funcion: Optional[Callable[[], float]] = None) -> Medidor:
+        return self._registrar(Medidor, nombre, ayuda, etiquetas, funcion=funcion)
+    
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                   limites: Sequence[float] = LIMITES_SEGUNDOS) -> Histograma:
+        return self._registrar(Histograma, nombre, ayuda, etiquetas, limites=limites)
+    
+    def instrumentar_controlador(self, clase):
+        """
+        Decorador de clase: mide la duración de cada método público estático
+        
+        Se observa en psicolarg_controlador_segundos con la etiqueta
+        metodo="Clase.metodo".
+        """
+        histograma = self.histograma('psicolarg_controlador_segundos',
+                                     "Duración de los métodos de los controladores", ('metodo',))
+        for nombre, atributo in list(vars(clase).items()):
+            if isinstance(atributo, staticmethod) and not nombre.startswith('_'):
+                medido = histograma.cronometrar(metodo=f"{clase.__name__}.{nombre}")(atributo.__func__)
+                setattr(clase, nombre, staticmethod(medido))
+        return clase
+    
+    def exportar(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus"""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in sorted(metricas, key=lambda m: m.nombre):
+            lineas.extend(metrica.lineas())
+        return "\n".join(lineas) + "\n"
+    
+    def guardar(self, ruta):
+        """Escribe las métricas en un archivo (reemplazándolo en forma atómica)"""
+        ruta = Path(ruta)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_name(ruta.name + '.tmp')
+        temporal.write_text(self.exportar(), encoding='utf-8')
+        os.replace(temporal, ruta)
+    
+    def servir(self, puerto: int = 9464) -> str:
+        """
+        Sirve /metrics en 127.0.0.1 desde un hilo de fondo
+        
+        Args:
+            puerto: Puerto local (0 elige uno libre)
+        
+        Returns:
+            URL de las métricas
+        """
+        if self._http is None:
+            from http.server import ThreadingHTTPServer
+            self._http = ThreadingHTTPServer(('127.0.0.1', puerto), _clase_manejador())
+            self._http.daemon_threads = True
+            self._http.registro = self
+            threading.Thread(target=self._http.serve_forever, name="metricas-http", daemon=True).start()
+        return f"http://127.0.0.1:{self._http.server_address[1]}/metrics"
+    
+    def activar_desde_entorno(self):
+        """Inicia el servidor y/o prepara el volcado al cerrar según las variables de entorno"""
+        puerto = os.environ.get('PSICOLARG_METRICAS_PUERTO')
+        if puerto:
+            try:
+                print(f"Métricas en {self.servir(int(puerto))}")
+            except (OSError, ValueError) as e:
+                print(f"No se pudo servir las métricas en el puerto {puerto}: {e}")
+        self.archivo_al_cerrar = os.environ.get('PSICOLARG_METRICAS_ARCHIVO') or None
+    
+    def detener(self):
+        """Detiene el servidor y, si se configuró, vuelca las métricas al archivo"""
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+        if self.archivo_al_cerrar:
+            try:
+                self.guardar(self.archivo_al_cerrar)
+            except OSError as e:
+                print(f"No se pudieron guardar las métricas: {e}")
+
+# Instancia global del registro de métricas
+metricas = RegistroMetricas()
+
+# Aciertos y fallos de las cachés (análisis guardados, respuestas del LLM)
+cache_metricas = metricas.contador('psicolarg_cache_total', "Consultas a cachés por resultado",
+                                   ('cache', 'resultado'))
@@ -2,33 +2,44 @@
 Servicio de Seguridad y Cifrado
 Maneja autenticación, cifrado de datos y generación de claves
 """
+import base64
 import hashlib
 import secrets
 import os
-from cryptography.fernet import Fernet
 from pathlib import Path
+from src.contexto import Delegado
 
 class SecurityService:
     """
     Servicio de seguridad para la aplicación
     """
     
-    def __init__(self):
-        self.config_dir = Path("config")
-        self.config_dir.mkdir(exist_ok=True)
+    def __init__(self, config_dir="config"):
+        """
+        Args:
+            config_dir: Directorio de la clave y la contraseña (se crea al
+                guardar la primera)
+        """
+        self.config_dir = Path(config_dir)
         self.key_file = self.config_dir / "secret.key"
         self.auth_file = self.config_dir / "auth.hash"
         self._cipher = None
     
     def inicializar_seguridad(self):
-        """Inicializa el sistema de seguridad"""
+        """
+        Inicializa el sistema de seguridad
+        
+        Solo genera la clave si falta; el cifrador (y cryptography) se carga
+        al primer cifrado, así el login se muestra sin importarlo.
+        """
         if not self.key_file.exists():
             self._generar_clave()
-        self._cargar_clave()
     
     def _generar_clave(self):
         """Genera una clave de cifrado y la guarda"""
-        key = Fernet.generate_key()
+        # Mismo formato que Fernet.generate_key()
+        key = base64.urlsafe_b64encode(os.urandom(32))
+        self.config_dir.mkdir(parents=True, exist_ok=True)
         with open(self.key_file, 'wb') as f:
             f.write(key)
         
@@ -41,10 +52,23 @@ class SecurityService:
     def _cargar_clave(self):
         """Carga la clave de cifrado"""
         if self.key_file.exists():
+            from cryptography.fernet import Fernet
             with open(self.key_file, 'rb') as f:
                 key = f.read()
             self._cipher = Fernet(key)
     
+    def obtener_clave(self) -> bytes:
+        """
+        Devuelve la clave de cifrado de la aplicación
+        
+        Returns:
+            Clave Fernet (se genera si todavía no existe)
+        """
+        if not self.key_file.exists():
+            self._generar_clave()
+        with open(self.key_file, 'rb') as f:
+            return f.read().strip()
+    
     def cifrar_texto(self, texto: str) -> str:
         """
         Cifra un texto
@@ -137,6 +161,7 @@ class SecurityService:
         """
         password_hash, salt = self.hash_password(password)
         
+        self.config_dir.mkdir(parents=True, exist_ok=True)
         with open(self.auth_file, 'w') as f:
             f.write(f"{password_hash}\n{salt}")
         
@@ -238,5 +263,5 @@ class SecurityService:
         return True, "Contraseña cambiada exitosamente"
 
 
-# Instancia global del servicio de seguridad
-security_service = SecurityService()
+# Instancia global del servicio de seguridad (la del contexto de aplicación actual)
+security_service = Delegado('seguridad')
@@ -0,0 +1,159 @@
+"""
+Series temporales de sentimiento
+Estadísticas de la evolución del sentimiento por fecha de sesión: media
+móvil, pendiente por mínimos cuadrados con intervalo de confianza y
+detección de un punto de cambio. Todo vectorizado con NumPy, de modo que
+las series de todos los pacientes se procesan en una sola llamada.
+"""
+import re
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+
+VALORES_SENTIMIENTO = {'positivo': 1.0, 'neutral': 0.0, 'negativo': -1.0}
+
+# Valores críticos de la t de Student (95%, dos colas) por grados de
+# libertad; con más de 30 se usa la aproximación normal
+_T_95 = np.array([
+    np.nan, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+    2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093,
+    2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042
+])
+_Z_95 = 1.96
+
+_PATRON_FECHA = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def ejes_temporales(ordenes: Sequence[str]) -> Tuple[np.ndarray, str]:
+    """
+    Convierte las claves de orden de una serie en posiciones numéricas
+    
+    Args:
+        ordenes: Claves de orden cronológico (fechas 'AAAA-MM-DD' u otras)
+    
+    Returns:
+        Tupla (posiciones, eje): días desde la primera fecha si todas las
+        claves son fechas (eje 'dias'), si no el número de sesión (eje 'sesiones')
+    """
+    if ordenes and all(_PATRON_FECHA.match(str(o)) for o in ordenes):
+        fechas = np.array([str(o)[:10] for o in ordenes], dtype='datetime64[D]')
+        return (fechas - fechas.min()).astype(np.float64), 'dias'
+    return np.arange(len(ordenes), dtype=np.float64), 'sesiones'
+
+
+def analizar_series(series: List[Tuple[Sequence[str], Sequence[float]]], ventana: int = 3,
+                    umbral_cambio: float = 0.3) -> List[Dict]:
+    """
+    Calcula las estadísticas de muchas series de sentimiento a la vez
+    
+    Las series se concatenan en arreglos planos con un número de grupo; las
+    sumas por serie se resuelven con bincount y los acumulados con cumsum,
+    sin recorrer las series una por una en Python.
+    
+    Args:
+        series: Lista de (ordenes, puntajes) en orden cronológico, una por
+            paciente; los puntajes van de -1 (negativo) a 1 (positivo)
+        ventana: Cantidad de sesiones de la media móvil
+        umbral_cambio: Fracción mínima de la variación total que debe explicar
+            un cambio de nivel para informarlo
+    
+    Returns:
+        Lista (una por serie) de dicts con puntajes, media_movil, pendiente
+        (por unidad del eje), intervalo (IC 95% de la pendiente), tendencia,
+        eje y cambio (None o dict con indice, desde, media_antes, media_despues)
+    """
+    cantidad = len(series)
+    if cantidad == 0:
+        return []
+    
+    ejes = [ejes_temporales(list(ordenes)) for ordenes, _ in series]
+    largos = np.array([len(puntajes) for _, puntajes in series], dtype=np.int64)
+    total = int(largos.sum())
+    inicios = np.concatenate(([0], np.cumsum(largos)[:-1]))
+    grupo = np.repeat(np.arange(cantidad), largos)
+    posicion = np.arange(total) - inicios[grupo]
+    
+    x = np.concatenate([eje for eje, _ in ejes]) if total else np.zeros(0)
+    y = np.fromiter((p for _, puntajes in series for p in puntajes), dtype=np.float64, count=total)
+    n = largos.astype(np.float64)
+    
+    def sumar(valores):
+        return np.bincount(grupo, weights=valores, minlength=cantidad)
+    
+    def dividir(a, b):
+        return np.divide(a, b, out=np.zeros_like(a), where=b > 0)
+    
+    # Regresión lineal por mínimos cuadrados (sobre valores centrados)
+    xc = x - dividir(sumar(x), n)[grupo]
+    yc = y - dividir(sumar(y), n)[grupo]
+    sxx = sumar(xc * xc)
+    syy = sumar(yc * yc)
+    pendiente = dividir(sumar(xc * yc), sxx)
+    
+    grados = largos - 2
+    residuos = sumar((yc - pendiente[grupo] * xc) ** 2)
+    error = np.sqrt(dividir(dividir(residuos, grados.astype(np.float64)), sxx))
+    critico = np.where(grados > 30, _Z_95, _T_95[np.clip(grados, 0, 30)])
+    margen = np.where(grados > 0, critico * error, np.nan)
+    
+    # Media móvil de las últimas `ventana` sesiones
+    acumulado = np.concatenate(([0.0], np.cumsum(y)))
+    indice = np.arange(total)
+    ancho = np.minimum(posicion + 1, ventana)
+    media_movil = (acumulado[indice + 1] - acumulado[indice + 1 - ancho]) / ancho
+    
+    # Punto de cambio: el corte (con al menos 2 sesiones a cada lado) que
+    # más reduce la suma de cuadrados al separar la serie en dos niveles
+    izquierda = (posicion + 1).astype(np.float64)
+    derecha = n[grupo] - izquierda
+    suma_izquierda = acumulado[indice + 1] - acumulado[inicios[grupo]]
+    suma_total = sumar(y)[grupo]
+    ganancia = (dividir(suma_izquierda ** 2, izquierda) + dividir((suma_total - suma_izquierda) ** 2, derecha)
+                - dividir(suma_total ** 2, n[grupo]))
+    ganancia[(izquierda < 2) | (derecha < 2)] = -np.inf
+    orden = np.lexsort((-ganancia, grupo))
+    
+    resultados = []
+    for g in range(cantidad):
+        inicio, largo = int(inicios[g]), int(largos[g])
+        ordenes, eje = list(series[g][0]), ejes[g][1]
+        
+        if largo < 2 or sxx[g] == 0:
+            tendencia = "sin datos suficientes"
+        elif grados[g] == 0:
+            # Con dos sesiones no hay intervalo: solo cuenta el signo
+            tendencia = "mejorando" if pendiente[g] > 0 else "empeorando" if pendiente[g] < 0 else "estable"
+        elif pendiente[g] - margen[g] > 0:
+            tendencia = "mejorando"
+        elif pendiente[g] + margen[g] < 0:
+            tendencia = "empeorando"
+        else:
+            tendencia = "estable"
+        
+        cambio = None
+        if largo >= 4 and syy[g] > 0:
+            corte = int(orden[inicio])
+            if ganancia[corte] >= umbral_cambio * syy[g]:
+                k = int(izquierda[corte])
+                cambio = {
+                    'indice': k,
+                    'desde': ordenes[k],
+                    'media_antes': float(suma_izquierda[corte] / k),
+                    'media_despues': float((suma_total[corte] - suma_izquierda[corte]) / (largo - k)),
+                    'proporcion': float(ganancia[corte] / syy[g])
+                }
+        
+        intervalo = None
+        if grados[g] > 0 and sxx[g] > 0:
+            intervalo = [float(pendiente[g] - margen[g]), float(pendiente[g] + margen[g])]
+        
+        resultados.append({
+            'ordenes': ordenes,
+            'puntajes': y[inicio:inicio + largo].tolist(),
+            'media_movil': media_movil[inicio:inicio + largo].tolist(),
+            'pendiente': float(pendiente[g]),
+            'intervalo': intervalo,
+            'tendencia': tendencia,
+            'eje': eje,
+            'cambio': cambio
+        })
+    return resultados
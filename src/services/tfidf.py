@@ -0,0 +1,119 @@
+"""
+Estadísticas de corpus para TF-IDF
+Frecuencias de documento de cada término sobre todas las sesiones, mantenidas
+en forma incremental, y puntuación TF-IDF vectorizada con NumPy
+"""
+import numpy as np
+from typing import Dict, Iterable, List
+
+
+class EstadisticasCorpus:
+    """
+    Frecuencias de documento (en cuántas sesiones aparece cada término)
+    
+    Los términos se numeran en el orden en que aparecen; las frecuencias se
+    guardan en un arreglo de NumPy indexado por ese número, de modo que
+    puntuar muchos términos a la vez es una sola operación vectorizada.
+    """
+    
+    def __init__(self):
+        self.indices = {}  # termino -> columna
+        self._df = np.zeros(1024, dtype=np.int64)
+        self.total_documentos = 0
+    
+    @classmethod
+    def desde_frecuencias(cls, frecuencias: Dict[str, int], total_documentos: int):
+        """
+        Crea las estadísticas a partir de frecuencias ya calculadas
+        
+        Args:
+            frecuencias: Dict termino -> cantidad de documentos que lo contienen
+            total_documentos: Cantidad de documentos del corpus
+        """
+        estadisticas = cls()
+        estadisticas.indices = {termino: i for i, termino in enumerate(frecuencias)}
+        estadisticas._df = np.zeros(max(1024, len(frecuencias) * 2), dtype=np.int64)
+        estadisticas._df[:len(frecuencias)] = np.fromiter(frecuencias.values(), dtype=np.int64,
+                                                          count=len(frecuencias))
+        estadisticas.total_documentos = total_documentos
+        return estadisticas
+    
+    def frecuencia(self, termino: str) -> int:
+        """Cantidad de documentos que contienen el término"""
+        indice = self.indices.get(termino)
+        return int(self._df[indice]) if indice is not None else 0
+    
+    def actualizar(self, agregados: Iterable[str] = (), quitados: Iterable[str] = (),
+                   documentos: int = 0):
+        """
+        Aplica el cambio de un documento
+        
+        Args:
+            agregados: Términos que ahora aparecen en el documento y antes no
+            quitados: Términos que aparecían en el documento y ya no
+            documentos: Variación de la cantidad de documentos (+1 alta, -1 baja, 0 edición)
+        """
+        agregados = [self._indice(t) for t in agregados]
+        if agregados:
+            self._df[agregados] += 1
+        quitados = [self.indices[t] for t in quitados if t in self.indices]
+        if quitados:
+            self._df[quitados] -= 1
+        self.total_documentos += documentos
+    
+    def idf(self, df: np.ndarray) -> np.ndarray:
+        """IDF suavizado: log((1 + N) / (1 + df)) + 1"""
+        return np.log((1.0 + self.total_documentos) / (1.0 + df)) + 1.0
+    
+    def mejores_lote(self, documentos: List[Dict[str, int]], top_n: int) -> List[List[str]]:
+        """
+        Devuelve los términos con mayor TF-IDF de cada documento
+        
+        Todos los documentos se puntúan juntos: los términos se aplanan en
+        arreglos y el orden por documento se resuelve con un único lexsort.
+        
+        Args:
+            documentos: Lista de dicts termino -> cantidad de apariciones
+                (en orden de aparición: se usa para desempatar)
+            top_n: Términos a devolver por documento
+        
+        Returns:
+            Lista (una por documento) de términos ordenados por relevancia
+        """
+        terminos = [t for conteos in documentos for t in conteos]
+        if not terminos:
+            return [[] for _ in documentos]
+        
+        largos = np.fromiter((len(c) for c in documentos), dtype=np.int64, count=len(documentos))
+        doc = np.repeat(np.arange(len(documentos)), largos)
+        tf = np.fromiter((n for conteos in documentos for n in conteos.values()),
+                         dtype=np.float64, count=len(terminos))
+        indices = np.fromiter((self.indices.get(t, -1) for t in terminos),
+                              dtype=np.int64, count=len(terminos))
+        df = np.where(indices >= 0, self._df[np.maximum(indices, 0)], 0)
+        
+        # TF sublineal: una palabra repetida muchas veces no domina el ranking
+        puntajes = (1.0 + np.log(tf)) * self.idf(df)
+        
+        posicion = np.arange(len(terminos))
+        orden = np.lexsort((posicion, -puntajes, doc))
+        inicios = np.concatenate(([0], np.cumsum(largos)[:-1]))
+        
+        resultado = []
+        for i, inicio in enumerate(inicios):
+            seleccion = orden[inicio:inicio + min(top_n, largos[i])]
+            resultado.append([terminos[j] for j in seleccion])
+        return resultado
+    
+    def mejores(self, conteos: Dict[str, int], top_n: int) -> List[str]:
+        """Términos con mayor TF-IDF de un documento"""
+        return self.mejores_lote([conteos], top_n)[0]
+    
+    def _indice(self, termino: str) -> int:
+        indice = self.indices.get(termino)
+        if indice is None:
+            indice = len(self.indices)
+            if indice >= len(self._df):
+                self._df = np.concatenate((self._df, np.zeros(len(self._df), dtype=np.int64)))
+            self.indices[termino] = indice
+        return indice
@@ -1,19 +1,160 @@
 """
 Vista de Análisis con IA
 """
+import threading
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
                              QTextEdit, QComboBox, QGroupBox, QListWidget, QProgressBar,
                              QMessageBox, QScrollArea, QFrame)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThread, QThreadPool, pyqtSignal
 from PyQt6.QtGui import QFont
 from src.controllers.paciente_controller import PacienteController
 from src.controllers.sesion_controller import SesionController
+from src.controllers.analisis_controller import AnalisisController
 from src.services.ia_analysis_service import ia_service
+from src.services.llm_client import EjecucionLLM
+
+class AnalisisLLMWorker(QThread):
+    """Hilo que analiza sesiones con el LLM sin bloquear la interfaz"""
+    
+    resultado_sesion = pyqtSignal(int, dict)
+    
+    def __init__(self, cliente, sesiones):
+        """
+        Args:
+            cliente: ClienteLLM a usar
+            sesiones: Lista de (sesion_id, texto)
+        """
+        super().__init__()
+        self.cliente = cliente
+        self.sesiones = sesiones
+        self.ejecucion = EjecucionLLM()
+    
+    def run(self):
+        try:
+            self.cliente.ejecutar(self.sesiones, al_recibir=self.resultado_sesion.emit,
+                                  ejecucion=self.ejecucion)
+        except Exception as e:
+            print(f"Error en análisis con IA: {e}")
+    
+    def cancelar(self):
+        self.ejecucion.cancelar()
+
+class SeñalesAnalisis(QObject):
+    """Señales de AnalisisLocalWorker (un QRunnable no puede emitir señales)"""
+    
+    sesion_analizada = pyqtSignal(object, str, dict)
+    historia_resumida = pyqtSignal(int, str, dict)
+    etapa = pyqtSignal(str, dict)
+    terminado = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+class AnalisisLocalWorker(QRunnable):
+    """
+    Tarea del QThreadPool que calcula el análisis general y el de la última
+    sesión sin bloquear la interfaz
+    
+    Solo calcula: las consultas se hacen antes en el hilo principal
+    (AnalisisController.preparar_longitudinal) y los resultados se guardan
+    desde ahí al recibir las señales, porque la conexión SQLite pertenece a
+    ese hilo.
+    """
+    
+    def __init__(self, paciente_id, estado, sesiones, cambiado, ultima, historia=None):
+        """
+        Args:
+            paciente_id: Paciente analizado
+            estado: Estado longitudinal a actualizar
+            sesiones: Lista de (sesion, hash_contenido, analisis guardado o None)
+            cambiado: Si el estado debe guardarse aunque no haya sesiones nuevas
+            ultima: (sesion, hash_contenido, analisis guardado o None) de la última sesión
+            historia: (huella_historia, resumen guardado o None, función que
+                lee los textos de AnalisisController.lector_textos_historia)
+                para resumir la historia con el LLM (None para no resumirla)
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+        self.señales = SeñalesAnalisis()
+        self.paciente_id = paciente_id
+        self.estado = estado
+        self.sesiones = sesiones
+        self.cambiado = cambiado
+        self.ultima = ultima
+        self.historia = historia
+        self._cancelado = threading.Event()
+        self.ejecucion = EjecucionLLM()
+    
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelado.is_set()
+    
+    def cancelar(self):
+        self._cancelado.set()
+        self.ejecucion.cancelar()
+    
+    def run(self):
+        try:
+            calculados = {}
+            for sesion, hash_contenido, analisis in self.sesiones:
+                if self.cancelado:
+                    self.señales.terminado.emit(None)
+                    return
+                if analisis is None:
+                    analisis = self._analizar(sesion, hash_contenido)
+                    calculados[sesion.id] = analisis
+                AnalisisController.fusionar_longitudinal(self.estado, sesion, analisis)
+            
+            for etapa, datos in ia_service.etapas_longitudinales(self.estado):
+                if self.cancelado:
+                    self.señales.terminado.emit(None)
+                    return
+                self.señales.etapa.emit(etapa, datos)
+            
+            sesion, hash_contenido, analisis = self.ultima
+            if analisis is None:
+                analisis = calculados.get(sesion.id) or self._analizar(sesion, hash_contenido)
+            self.señales.etapa.emit('ultima_sesion', {'analisis': analisis, 'fecha': str(sesion.fecha)})
+            
+            # Lo más lento al final: el resumen de la historia con el LLM, si
+            # no hay uno guardado para estas mismas sesiones
+            if self.historia is not None and not self.cancelado:
+                huella, resumen, leer_textos = self.historia
+                if resumen is None:
+                    resumen = ia_service.resumir_historia(leer_textos(), self.ejecucion)
+                    if self.cancelado:
+                        self.señales.terminado.emit(None)
+                        return
+                    if resumen:
+                        self.señales.historia_resumida.emit(self.paciente_id, huella, resumen)
+                self.señales.etapa.emit('historia', resumen or {})
+            
+            self.señales.terminado.emit(self.estado)
+        except Exception as e:
+            self.señales.error.emit(str(e))
+    
+    def _analizar(self, sesion, hash_contenido):
+        analisis = ia_service.analizar_sesion(sesion.texto_analisis)
+        self.señales.sesion_analizada.emit(sesion, hash_contenido, analisis)
+        return analisis
 
 class AnalisisIAView(QWidget):
+    
+    # Tarjetas del análisis general, en el orden en que se muestran, y la
+    # etapa de AnalisisLocalWorker que completa cada una
+    TARJETAS_GENERALES = [
+        ('resumen', 'sentimiento', "📊 Análisis General de Sesiones"),
+        ('palabras', 'palabras_clave', "🔑 Palabras Clave Recurrentes"),
+        ('temas', 'temas', "🧩 Temas Frecuentes"),
+        ('insights', 'insights', "💡 Insights Detectados"),
+        ('evolucion', 'sentimiento', "📈 Evolución del Sentimiento"),
+    ]
+    
     def __init__(self):
         super().__init__()
         self.paciente_actual = None
+        self.worker = None
+        self.trabajo = None
+        self.tarjetas = {}
+        self.pendientes = {}
         self.init_ui()
     
     def init_ui(self):
@@ -45,8 +186,20 @@ class AnalisisIAView(QWidget):
         self.btn_analizar.setStyleSheet("background-color: #9b59b6; font-size: 14px; padding: 10px;")
         header_layout.addWidget(self.btn_analizar)
         
+        # Botón cancelar (solo visible durante el análisis con el LLM)
+        self.btn_cancelar = QPushButton("⏹ Cancelar")
+        self.btn_cancelar.clicked.connect(self.cancelar_analisis)
+        self.btn_cancelar.setVisible(False)
+        self.btn_cancelar.setStyleSheet("background-color: #e74c3c; font-size: 14px; padding: 10px;")
+        header_layout.addWidget(self.btn_cancelar)
+        
         layout.addLayout(header_layout)
         
+        # Progreso del análisis con el LLM
+        self.progreso = QProgressBar()
+        self.progreso.setVisible(False)
+        layout.addWidget(self.progreso)
+        
         # Estado del servicio
         if not ia_service.available:
             warning = QLabel("⚠️ API de OpenAI no configurada. Usando análisis básico local.")
@@ -77,7 +230,14 @@ class AnalisisIAView(QWidget):
         self.mostrar_mensaje_inicial()
     
     def cargar_pacientes(self):
-        """Carga la lista de pacientes activos"""
+        """
+        Carga la lista de pacientes activos, conservando el seleccionado
+        
+        Recargar no cuenta como cambio de paciente: el análisis en curso
+        sigue, salvo que el paciente ya no esté en la lista.
+        """
+        seleccionado = self.combo_pacientes.currentData()
+        self.combo_pacientes.blockSignals(True)
         self.combo_pacientes.clear()
         self.combo_pacientes.addItem("-- Seleccione un paciente --", None)
         
@@ -87,13 +247,25 @@ class AnalisisIAView(QWidget):
                 f"{paciente.apellido}, {paciente.nombre}",
                 paciente.id
             )
+        
+        indice = max(self.combo_pacientes.findData(seleccionado), 0) if seleccionado else 0
+        self.combo_pacientes.setCurrentIndex(indice)
+        self.combo_pacientes.blockSignals(False)
+        if seleccionado and indice == 0:
+            self.cambiar_paciente(0)
     
     def cambiar_paciente(self, index):
         """Maneja el cambio de paciente seleccionado"""
         paciente_id = self.combo_pacientes.itemData(index)
+        if self.paciente_actual is not None and self.paciente_actual.id == paciente_id:
+            return
+        if self.worker is not None or self.trabajo is not None:
+            self.cancelar_analisis()
+        self.descartar_trabajo()
         if paciente_id:
             self.paciente_actual = PacienteController.obtener_paciente(paciente_id)
-            self.btn_analizar.setEnabled(True)
+            self.btn_analizar.setEnabled(self.worker is None)
+            self.btn_analizar.setText("🤖 Analizar Sesiones")
             self.limpiar_resultados()
         else:
             self.paciente_actual = None
@@ -121,10 +293,14 @@ class AnalisisIAView(QWidget):
         if not self.paciente_actual:
             return
         
-        # Obtener sesiones del paciente
-        sesiones = SesionController.obtener_sesiones_paciente(self.paciente_actual.id)
+        # Los clics repetidos se suman al análisis en curso en lugar de encolar otro
+        if self.worker is not None or self.trabajo is not None:
+            return
         
-        if not sesiones:
+        # Última sesión (solo para saber si hay sesiones y para su análisis)
+        ultima_sesion = SesionController.obtener_ultima_sesion(self.paciente_actual.id)
+        
+        if not ultima_sesion:
             QMessageBox.warning(self, "Sin datos", 
                               "Este paciente no tiene sesiones registradas para analizar")
             return
@@ -136,44 +312,222 @@ class AnalisisIAView(QWidget):
         # Limpiar resultados anteriores
         self.limpiar_resultados()
         
-        # Preparar textos de sesiones
-        textos_sesiones = []
-        for sesion in sesiones:
-            texto_completo = f"{sesion.objetivos} {sesion.notas} {sesion.intervenciones} {sesion.observaciones}"
-            textos_sesiones.append(texto_completo)
+        # Con el LLM, analizar primero en segundo plano las sesiones sin
+        # análisis guardado; al terminar todo sale de la caché
+        if ia_service.available:
+            pendientes = AnalisisController.sesiones_sin_analisis(self.paciente_actual.id)
+            if pendientes:
+                self.iniciar_analisis_llm(pendientes)
+                return
+        
+        self.mostrar_resultados(ultima_sesion)
+    
+    def iniciar_analisis_llm(self, pendientes):
+        """Lanza el análisis con el LLM de las sesiones pendientes en un hilo aparte"""
+        self.pendientes = {sesion.id: (sesion, hash_contenido) for sesion, _, hash_contenido in pendientes}
+        
+        self.progreso.setRange(0, len(pendientes))
+        self.progreso.setValue(0)
+        self.progreso.setFormat(f"%v de {len(pendientes)} sesiones analizadas")
+        self.progreso.setVisible(True)
+        self.btn_cancelar.setVisible(True)
+        self.btn_cancelar.setEnabled(True)
+        
+        self.worker = AnalisisLLMWorker(
+            ia_service.cliente_llm,
+            [(sesion.id, texto) for sesion, texto, _ in pendientes]
+        )
+        self.worker.resultado_sesion.connect(self.recibir_analisis_sesion)
+        self.worker.finished.connect(self.finalizar_analisis_llm)
+        self.worker.start()
+    
+    def recibir_analisis_sesion(self, sesion_id: int, analisis: dict):
+        """Guarda y muestra el análisis de una sesión apenas llega"""
+        if sesion_id not in self.pendientes:
+            return
+        sesion, hash_contenido = self.pendientes.pop(sesion_id)
+        AnalisisController.guardar_analisis(sesion, hash_contenido, analisis)
+        self.progreso.setValue(self.progreso.value() + 1)
+        if self.paciente_actual and self.paciente_actual.id == sesion.paciente_id:
+            self.mostrar_analisis_sesion(analisis, sesion.fecha, "📝 Análisis de Sesión")
+    
+    def cancelar_analisis(self):
+        """Cancela el análisis en curso (con el LLM o local)"""
+        if self.worker is not None:
+            self.btn_cancelar.setEnabled(False)
+            self.worker.cancelar()
+        if self.trabajo is not None:
+            self.btn_cancelar.setEnabled(False)
+            self.trabajo.cancelar()
+    
+    def finalizar_analisis_llm(self):
+        """Se ejecuta cuando termina (o se cancela) el análisis en segundo plano"""
+        self.worker.deleteLater()
+        self.worker = None
+        self.progreso.setVisible(False)
+        self.btn_cancelar.setVisible(False)
+        
+        if self.paciente_actual is None:
+            # Se cambió de paciente durante el análisis
+            self.pendientes = {}
+            self.btn_analizar.setText("🤖 Analizar Sesiones")
+            return
         
-        # Realizar análisis
+        if self.pendientes:
+            # Cancelado o con errores: se conservan los resultados ya recibidos
+            faltan = len(self.pendientes)
+            self.pendientes = {}
+            QMessageBox.warning(self, "Análisis incompleto",
+                              f"{faltan} sesión(es) quedaron sin analizar.\n"
+                              "Los resultados recibidos ya fueron guardados.")
+            self.btn_analizar.setEnabled(True)
+            self.btn_analizar.setText("🤖 Analizar Sesiones")
+            return
+        
+        self.limpiar_resultados()
+        ultima_sesion = SesionController.obtener_ultima_sesion(self.paciente_actual.id)
+        self.mostrar_resultados(ultima_sesion)
+    
+    def mostrar_resultados(self, ultima_sesion):
+        """
+        Lanza el análisis general y el de la última sesión en el pool de hilos
+        
+        Las consultas se hacen acá (son rápidas); los cálculos corren en
+        AnalisisLocalWorker y cada parte se muestra apenas está lista.
+        """
         try:
-            # Análisis de patrones generales
-            analisis_general = ia_service.analizar_multiples_sesiones(textos_sesiones)
-            self.mostrar_analisis_general(analisis_general, len(sesiones))
-            
-            # Análisis de última sesión
-            if sesiones:
-                ultima_sesion = sesiones[0]  # Ya vienen ordenadas por fecha DESC
-                texto_ultima = f"{ultima_sesion.objetivos} {ultima_sesion.notas} {ultima_sesion.intervenciones}"
-                analisis_ultima = ia_service.analizar_sesion(texto_ultima)
-                self.mostrar_analisis_sesion(analisis_ultima, ultima_sesion.fecha)
-            
+            estado, sesiones, cambiado = AnalisisController.preparar_longitudinal(self.paciente_actual.id)
+            hash_ultima = AnalisisController.hash_contenido(ultima_sesion.texto_analisis)
+            analisis_ultima = AnalisisController.obtener_analisis_guardado(ultima_sesion.id, hash_ultima)
+            historia = None
+            if ia_service.available:
+                # Sin resumen guardado vigente los textos se leen en el trabajo
+                huella = AnalisisController.huella_historia(self.paciente_actual.id)
+                resumen = AnalisisController.obtener_resumen_historia(self.paciente_actual.id, huella)
+                leer_textos = (None if resumen is not None
+                               else AnalisisController.lector_textos_historia(self.paciente_actual.id))
+                historia = (huella, resumen, leer_textos)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error durante el análisis:\n{str(e)}")
+            self.btn_analizar.setEnabled(True)
+            self.btn_analizar.setText("🤖 Analizar Sesiones")
+            return
         
-        # Rehabilitar botón
-        self.btn_analizar.setEnabled(True)
-        self.btn_analizar.setText("🤖 Analizar Sesiones")
+        self.limpiar_resultados()
+        self.tarjetas = {}
+        for clave, _, titulo in self.TARJETAS_GENERALES:
+            card = self.crear_tarjeta(titulo)
+            self.reemplazar_contenido(card, [self.crear_etiqueta_estado("⏳ Calculando...")])
+            self.tarjetas[clave] = card
+            self.resultados_layout.addWidget(card)
+        if historia is not None:
+            card = self.crear_tarjeta("📖 Resumen de la Historia")
+            self.reemplazar_contenido(card, [self.crear_etiqueta_estado("⏳ Resumiendo con IA...")])
+            self.tarjetas['historia'] = card
+            self.resultados_layout.addWidget(card)
+        
+        self.trabajo = AnalisisLocalWorker(
+            self.paciente_actual.id, estado, sesiones, cambiado,
+            (ultima_sesion, hash_ultima, analisis_ultima), historia
+        )
+        self.trabajo.señales.sesion_analizada.connect(self.guardar_analisis_calculado)
+        self.trabajo.señales.historia_resumida.connect(self.guardar_resumen_historia)
+        self.trabajo.señales.etapa.connect(self.recibir_etapa)
+        self.trabajo.señales.terminado.connect(self.finalizar_trabajo)
+        self.trabajo.señales.error.connect(self.error_trabajo)
+        
+        self.btn_cancelar.setVisible(True)
+        self.btn_cancelar.setEnabled(True)
+        QThreadPool.globalInstance().start(self.trabajo)
     
-    def mostrar_analisis_general(self, analisis: dict, total_sesiones: int):
-        """Muestra el análisis general de todas las sesiones"""
-        # Tarjeta de resumen
-        card = self.crear_tarjeta("📊 Análisis General de Sesiones")
-        card_layout = card.layout()
+    def es_trabajo_actual(self) -> bool:
+        """Indica si la señal recibida viene del análisis en curso (y no de uno descartado)"""
+        return self.trabajo is not None and self.sender() is self.trabajo.señales
+    
+    def guardar_analisis_calculado(self, sesion, hash_contenido: str, analisis: dict):
+        """Guarda el análisis de una sesión calculado en segundo plano"""
+        # Se guarda aunque el trabajo se haya descartado: el resultado es válido
+        AnalisisController.guardar_analisis(sesion, hash_contenido, analisis)
+    
+    def guardar_resumen_historia(self, paciente_id: int, huella: str, resumen: dict):
+        """Guarda el resumen de la historia calculado en segundo plano"""
+        AnalisisController.guardar_resumen_historia(paciente_id, huella, resumen)
+    
+    def recibir_etapa(self, etapa: str, datos: dict):
+        """Muestra una parte del análisis apenas la calcula el trabajo en curso"""
+        if not self.es_trabajo_actual():
+            return
         
-        # Total de sesiones
-        label_total = QLabel(f"Total de sesiones analizadas: {total_sesiones}")
+        if etapa == 'ultima_sesion':
+            self.mostrar_analisis_sesion(datos['analisis'], datos['fecha'])
+            return
+        
+        if etapa == 'historia':
+            widgets = self.contenido_historia(datos)
+            if widgets:
+                self.reemplazar_contenido(self.tarjetas['historia'], widgets)
+            else:
+                self.tarjetas.pop('historia').deleteLater()
+            return
+        
+        for clave, etapa_tarjeta, _ in self.TARJETAS_GENERALES:
+            if etapa_tarjeta == etapa:
+                widgets = getattr(self, f"contenido_{clave}")(datos)
+                if widgets:
+                    self.reemplazar_contenido(self.tarjetas[clave], widgets)
+                else:
+                    self.tarjetas.pop(clave).deleteLater()
+    
+    def finalizar_trabajo(self, estado):
+        """Se ejecuta cuando termina (estado) o se cancela (None) el análisis local"""
+        if not self.es_trabajo_actual():
+            return
+        trabajo = self.trabajo
+        self.descartar_trabajo()
+        
+        if estado is None:
+            for card in self.tarjetas.values():
+                self.reemplazar_contenido(card, [self.crear_etiqueta_estado("⏹ Cancelado")])
+        elif trabajo.sesiones or trabajo.cambiado:
+            AnalisisController.guardar_estado_longitudinal(trabajo.paciente_id, estado)
+        self.tarjetas = {}
+    
+    def error_trabajo(self, mensaje: str):
+        """Se ejecuta si el análisis local falla"""
+        if not self.es_trabajo_actual():
+            return
+        self.descartar_trabajo()
+        self.tarjetas = {}
+        QMessageBox.critical(self, "Error", f"Error durante el análisis:\n{mensaje}")
+    
+    def descartar_trabajo(self):
+        """Deja de esperar al análisis local en curso (sus señales pasan a ignorarse)"""
+        self.trabajo = None
+        self.btn_cancelar.setVisible(self.worker is not None)
+        if self.paciente_actual is not None and self.worker is None:
+            self.btn_analizar.setEnabled(True)
+            self.btn_analizar.setText("🤖 Analizar Sesiones")
+    
+    def reemplazar_contenido(self, card: QGroupBox, widgets: list):
+        """Reemplaza los widgets de una tarjeta"""
+        layout = card.layout()
+        while layout.count():
+            child = layout.takeAt(0)
+            if child.widget():
+                child.widget().deleteLater()
+        for widget in widgets:
+            layout.addWidget(widget)
+    
+    def crear_etiqueta_estado(self, texto: str) -> QLabel:
+        label = QLabel(texto)
+        label.setStyleSheet("color: #7f8c8d; font-size: 12px; padding: 5px;")
+        return label
+    
+    def contenido_resumen(self, analisis: dict) -> list:
+        """Total de sesiones y tendencia"""
+        label_total = QLabel(f"Total de sesiones analizadas: {analisis['total_sesiones']}")
         label_total.setFont(QFont("Arial", 12, QFont.Weight.Bold))
-        card_layout.addWidget(label_total)
         
-        # Tendencia
         tendencia = analisis.get('tendencia', 'desconocida')
         emoji_tendencia = "📈" if tendencia == "mejorando" else "📉" if tendencia == "empeorando" else "➡️"
         label_tendencia = QLabel(f"{emoji_tendencia} Tendencia: {tendencia.upper()}")
@@ -186,53 +540,110 @@ class AnalisisIAView(QWidget):
         else:
             label_tendencia.setStyleSheet("color: #f39c12;")
         
-        card_layout.addWidget(label_tendencia)
-        
-        self.resultados_layout.addWidget(card)
-        
-        # Palabras recurrentes
-        if 'palabras_recurrentes' in analisis:
-            card_palabras = self.crear_tarjeta("🔑 Palabras Clave Recurrentes")
-            card_palabras_layout = card_palabras.layout()
-            
-            palabras_text = ", ".join(analisis['palabras_recurrentes'][:15])
-            label_palabras = QLabel(palabras_text)
-            label_palabras.setWordWrap(True)
-            label_palabras.setStyleSheet("font-size: 13px; padding: 10px; background-color: #ecf0f1; border-radius: 5px;")
-            card_palabras_layout.addWidget(label_palabras)
-            
-            self.resultados_layout.addWidget(card_palabras)
-        
-        # Insights
-        if 'insights' in analisis and analisis['insights']:
-            card_insights = self.crear_tarjeta("💡 Insights Detectados")
-            card_insights_layout = card_insights.layout()
-            
-            for insight in analisis['insights']:
-                label_insight = QLabel(f"• {insight}")
-                label_insight.setWordWrap(True)
-                label_insight.setStyleSheet("font-size: 13px; padding: 5px;")
-                card_insights_layout.addWidget(label_insight)
-            
-            self.resultados_layout.addWidget(card_insights)
-        
-        # Evolución de sentimiento
-        if 'evolucion_sentimiento' in analisis:
-            card_evolucion = self.crear_tarjeta("📈 Evolución del Sentimiento")
-            card_evolucion_layout = card_evolucion.layout()
+        return [label_total, label_tendencia]
+    
+    def contenido_palabras(self, analisis: dict) -> list:
+        """Palabras clave recurrentes"""
+        if not analisis.get('palabras_recurrentes'):
+            return []
+        label_palabras = QLabel(", ".join(analisis['palabras_recurrentes'][:15]))
+        label_palabras.setWordWrap(True)
+        label_palabras.setStyleSheet("font-size: 13px; padding: 10px; background-color: #ecf0f1; border-radius: 5px;")
+        return [label_palabras]
+    
+    def contenido_temas(self, analisis: dict) -> list:
+        """Temas con la cantidad de sesiones en que aparecen"""
+        temas = analisis.get('temas_frecuencia')
+        if not temas:
+            return []
+        label_temas = QLabel(", ".join(f"{tema} ({cantidad})" for tema, cantidad in temas.items()))
+        label_temas.setWordWrap(True)
+        label_temas.setStyleSheet("font-size: 13px; padding: 10px;")
+        return [label_temas]
+    
+    def contenido_insights(self, analisis: dict) -> list:
+        """Insights detectados"""
+        widgets = []
+        for insight in analisis.get('insights', []):
+            label_insight = QLabel(f"• {insight}")
+            label_insight.setWordWrap(True)
+            label_insight.setStyleSheet("font-size: 13px; padding: 5px;")
+            widgets.append(label_insight)
+        return widgets
+    
+    def contenido_historia(self, resumen: dict) -> list:
+        """Resumen de la historia hecho por el LLM, con sus temas e insights"""
+        if not resumen.get('resumen'):
+            return []
+        label_resumen = QLabel(resumen['resumen'])
+        label_resumen.setWordWrap(True)
+        label_resumen.setStyleSheet("font-size: 13px; padding: 5px;")
+        widgets = [label_resumen]
+        if resumen.get('temas'):
+            label_temas = QLabel(f"Temas: {', '.join(resumen['temas'])}")
+            label_temas.setWordWrap(True)
+            label_temas.setStyleSheet("font-size: 13px; padding: 5px;")
+            widgets.append(label_temas)
+        widgets.extend(self.contenido_insights(resumen))
+        return widgets
+    
+    def contenido_evolucion(self, analisis: dict) -> list:
+        """Evolución del sentimiento: gráfico de la media móvil y estadísticas de la serie"""
+        widgets = []
+        serie = analisis.get('serie_sentimiento')
+        if serie:
+            # Media móvil de todas las sesiones como gráfico de barras en texto
+            label_grafico = QLabel(self.grafico_serie(serie['media_movil']))
+            label_grafico.setFont(QFont("Monospace", 14))
+            label_grafico.setToolTip("Media móvil del sentimiento (de -1 a 1), de la primera a la última sesión")
+            widgets.append(label_grafico)
             
+            label_evolucion = QLabel(self.describir_serie(serie))
+        else:
             sentimientos = analisis['evolucion_sentimiento']
-            texto_evolucion = " → ".join([s.upper() for s in sentimientos[-10:]])  # Últimas 10 sesiones
-            label_evolucion = QLabel(texto_evolucion)
-            label_evolucion.setWordWrap(True)
-            label_evolucion.setStyleSheet("font-size: 12px; padding: 10px;")
-            card_evolucion_layout.addWidget(label_evolucion)
-            
-            self.resultados_layout.addWidget(card_evolucion)
+            label_evolucion = QLabel(" → ".join([s.upper() for s in sentimientos[-10:]]))
+        label_evolucion.setWordWrap(True)
+        label_evolucion.setStyleSheet("font-size: 12px; padding: 10px;")
+        widgets.append(label_evolucion)
+        return widgets
+    
+    def grafico_serie(self, valores: list, ancho: int = 60) -> str:
+        """Representa una serie de valores entre -1 y 1 con caracteres de bloque"""
+        if not valores:
+            return ""
+        bloques = "▁▂▃▄▅▆▇█"
+        if len(valores) > ancho:
+            # Promediar tramos para que entre en el ancho disponible
+            paso = len(valores) / ancho
+            tramos = [valores[int(i * paso):int((i + 1) * paso)] for i in range(ancho)]
+            valores = [sum(tramo) / len(tramo) for tramo in tramos]
+        return "".join(bloques[min(int((v + 1) / 2 * len(bloques)), len(bloques) - 1)] for v in valores)
+    
+    def describir_serie(self, serie: dict) -> str:
+        """Texto con la pendiente (e intervalo de confianza) y el punto de cambio de una serie"""
+        lineas = []
+        escala, unidad = (30, "por mes") if serie['eje'] == 'dias' else (1, "por sesión")
+        pendiente = serie['pendiente'] * escala
+        if serie['intervalo']:
+            desde, hasta = (valor * escala for valor in serie['intervalo'])
+            lineas.append(f"Pendiente: {pendiente:+.3f} {unidad} (IC 95%: {desde:+.3f} a {hasta:+.3f})")
+        elif len(serie['puntajes']) >= 2:
+            lineas.append(f"Pendiente: {pendiente:+.3f} {unidad}")
+        
+        cambio = serie['cambio']
+        if cambio:
+            lineas.append(f"Cambio de nivel desde {cambio['desde']}: "
+                          f"{cambio['media_antes']:+.2f} → {cambio['media_despues']:+.2f}")
+        
+        if serie['puntajes']:
+            lineas.append(f"Última media móvil: {serie['media_movil'][-1]:+.2f} "
+                          f"({len(serie['puntajes'])} sesiones)")
+        return "\n".join(lineas)
     
-    def mostrar_analisis_sesion(self, analisis: dict, fecha: str):
+    def mostrar_analisis_sesion(self, analisis: dict, fecha: str,
+                                titulo: str = "📝 Análisis de Última Sesión"):
         """Muestra el análisis de una sesión específica"""
-        card = self.crear_tarjeta(f"📝 Análisis de Última Sesión ({fecha})")
+        card = self.crear_tarjeta(f"{titulo} ({fecha})")
         card_layout = card.layout()
         
         # Sentimiento
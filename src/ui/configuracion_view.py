@@ -1,18 +1,54 @@
 """
 Vista de Configuración y Seguridad
 """
+from contextlib import ExitStack
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
                              QGroupBox, QLineEdit, QMessageBox, QFileDialog, QListWidget,
                              QListWidgetItem, QDialog, QFormLayout, QDialogButtonBox,
-                             QCheckBox, QSpinBox)
-from PyQt6.QtCore import Qt
+                             QCheckBox, QSpinBox, QComboBox, QTextEdit, QSplitter)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont
+from src.database.db_manager import db
+from src.controllers.paciente_controller import PacienteController
+from src.controllers.sesion_controller import SesionController
 from src.services.security_service import security_service
-from src.services.backup_service import backup_service
+from src.services.backup_service import backup_service, CODECS
+from src.services.diff_service import diff_service
+from src.services.metricas import metricas
+from src.ui.perfilador import perfilador, CLAVE_PERFIL
+from src.ui.reconstruccion_indices import reconstruccion_indices
+
+class ComparacionCompresoresWorker(QThread):
+    """
+    Hilo que mide los compresores sin bloquear la interfaz
+    
+    Solo lee un archivo con la base (no usa la conexión SQLite), así que
+    puede correr fuera del hilo principal: el archivo se obtiene antes en el
+    hilo principal con backup_service.archivo_actual.
+    """
+    
+    terminado = pyqtSignal(list)
+    error = pyqtSignal(str)
+    
+    def __init__(self, base):
+        """
+        Args:
+            base: Archivo con el contenido de la base
+        """
+        super().__init__()
+        self.base = base
+    
+    def run(self):
+        try:
+            self.terminado.emit(backup_service.benchmark_codecs(base=self.base))
+        except Exception as e:
+            self.error.emit(str(e))
 
 class ConfiguracionView(QWidget):
     def __init__(self):
         super().__init__()
+        self.worker_compresores = None
+        self.archivo_comparacion = ExitStack()
         self.init_ui()
     
     def init_ui(self):
@@ -34,6 +70,10 @@ class ConfiguracionView(QWidget):
         grupo_backup = self.crear_grupo_backup()
         layout.addWidget(grupo_backup)
         
+        # Sección: Rendimiento
+        grupo_rendimiento = self.crear_grupo_rendimiento()
+        layout.addWidget(grupo_rendimiento)
+        
         # Sección: Información
         grupo_info = self.crear_grupo_info()
         layout.addWidget(grupo_info)
@@ -129,6 +169,38 @@ class ConfiguracionView(QWidget):
         
         layout.addLayout(buttons_layout)
         
+        # Opciones de compresión
+        compresion_layout = QHBoxLayout()
+        
+        self.combo_codec = QComboBox()
+        self.combo_codec.addItems(list(CODECS.keys()))
+        compresion_layout.addWidget(QLabel("Compresión:"))
+        compresion_layout.addWidget(self.combo_codec)
+        
+        self.spin_nivel = QSpinBox()
+        self.spin_nivel.setToolTip("Más nivel: backup más chico pero más lento de crear")
+        compresion_layout.addWidget(QLabel("Nivel:"))
+        compresion_layout.addWidget(self.spin_nivel)
+        self.combo_codec.currentTextChanged.connect(self.cambiar_codec)
+        self.cambiar_codec(self.combo_codec.currentText())
+        
+        self.check_paralelo = QCheckBox("Comprimir en paralelo")
+        compresion_layout.addWidget(self.check_paralelo)
+        
+        self.check_cifrar = QCheckBox("Cifrar backup")
+        self.check_cifrar.setChecked(True)
+        self.check_cifrar.setToolTip(
+            "Los backups cifrados solo pueden restaurarse con la clave de config/secret.key"
+        )
+        compresion_layout.addWidget(self.check_cifrar)
+        
+        self.btn_benchmark = QPushButton("📊 Comparar Compresores")
+        self.btn_benchmark.clicked.connect(self.comparar_compresores)
+        compresion_layout.addWidget(self.btn_benchmark)
+        
+        compresion_layout.addStretch()
+        layout.addLayout(compresion_layout)
+        
         # Info
         backups_disponibles = len(backup_service.listar_backups())
         label_info = QLabel(f"Backups disponibles: {backups_disponibles}")
@@ -147,6 +219,85 @@ class ConfiguracionView(QWidget):
         grupo.setLayout(layout)
         return grupo
     
+    def crear_grupo_rendimiento(self) -> QGroupBox:
+        """Crea el grupo de medición de consultas y de la interfaz"""
+        grupo = QGroupBox("⏱ Rendimiento")
+        grupo.setStyleSheet("""
+            QGroupBox {
+                font-size: 16px;
+                font-weight: bold;
+                border: 2px solid #9b59b6;
+                border-radius: 8px;
+                margin-top: 10px;
+                padding: 15px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 10px;
+                padding: 0 5px;
+            }
+        """)
+        
+        layout = QVBoxLayout()
+        
+        fila_consultas = QHBoxLayout()
+        
+        self.check_instrumentacion = QCheckBox("Medir consultas")
+        self.check_instrumentacion.setChecked(db.instrumentacion is not None)
+        self.check_instrumentacion.setToolTip(
+            "Registra el tiempo de cada consulta; las lentas se guardan con su plan "
+            "de ejecución en data/logs/consultas_lentas.log"
+        )
+        self.check_instrumentacion.toggled.connect(self.cambiar_instrumentacion)
+        fila_consultas.addWidget(self.check_instrumentacion)
+        
+        self.spin_umbral = QSpinBox()
+        self.spin_umbral.setRange(1, 10000)
+        self.spin_umbral.setSuffix(" ms")
+        self.spin_umbral.setValue(int(db.instrumentacion.umbral_ms) if db.instrumentacion else 100)
+        self.spin_umbral.valueChanged.connect(self.cambiar_instrumentacion)
+        fila_consultas.addWidget(QLabel("Consulta lenta desde:"))
+        fila_consultas.addWidget(self.spin_umbral)
+        
+        btn_estadisticas = QPushButton("📊 Ver Estadísticas")
+        btn_estadisticas.clicked.connect(self.ver_estadisticas_consultas)
+        fila_consultas.addWidget(btn_estadisticas)
+        
+        fila_consultas.addStretch()
+        layout.addLayout(fila_consultas)
+        
+        fila_perfil = QHBoxLayout()
+        
+        self.check_perfil = QCheckBox("Perfilar la interfaz")
+        self.check_perfil.setChecked(perfilador.activo)
+        self.check_perfil.setToolTip(
+            "Mide cada acción de las vistas y detecta bloqueos de la interfaz de más de "
+            "50 ms; se registran en data/logs/perfil_ui.log con la pila y la última consulta"
+        )
+        self.check_perfil.toggled.connect(self.cambiar_perfil)
+        fila_perfil.addWidget(self.check_perfil)
+        
+        self.check_cprofile = QCheckBox("Capturar perfil (cProfile)")
+        self.check_cprofile.setChecked(perfilador.capturar_perfil)
+        self.check_cprofile.setToolTip("Registra las funciones más costosas de cada acción lenta (enlentece la aplicación)")
+        self.check_cprofile.toggled.connect(self.cambiar_perfil)
+        fila_perfil.addWidget(self.check_cprofile)
+        
+        btn_acciones = QPushButton("📈 Ver Acciones")
+        btn_acciones.clicked.connect(self.ver_perfil_ui)
+        fila_perfil.addWidget(btn_acciones)
+        
+        btn_metricas = QPushButton("📤 Exportar Métricas")
+        btn_metricas.setToolTip("Guarda contadores y tiempos de consultas, backups y análisis (formato Prometheus)")
+        btn_metricas.clicked.connect(self.exportar_metricas)
+        fila_perfil.addWidget(btn_metricas)
+        
+        fila_perfil.addStretch()
+        layout.addLayout(fila_perfil)
+        
+        grupo.setLayout(layout)
+        return grupo
+    
     def crear_grupo_info(self) -> QGroupBox:
         """Crea el grupo de información de la aplicación"""
         grupo = QGroupBox("ℹ️ Información")
@@ -199,6 +350,12 @@ protección de datos personales y secreto profesional.
         dialogo = CambiarPasswordDialog(self)
         dialogo.exec()
     
+    def cambiar_codec(self, codec: str):
+        """Ajusta los niveles de compresión al codec elegido (y elige su nivel por defecto)"""
+        _, nivel_defecto, niveles = CODECS[codec]
+        self.spin_nivel.setRange(niveles.start, niveles.stop - 1)
+        self.spin_nivel.setValue(nivel_defecto)
+    
     def crear_backup(self):
         """Crea un backup de la base de datos"""
         respuesta = QMessageBox.question(
@@ -208,7 +365,12 @@ protección de datos personales y secreto profesional.
         )
         
         if respuesta == QMessageBox.StandardButton.Yes:
-            exito, mensaje, ruta = backup_service.crear_backup()
+            exito, mensaje, ruta = backup_service.crear_backup(
+                codec=self.combo_codec.currentText(),
+                nivel=self.spin_nivel.value(),
+                paralelo=self.check_paralelo.isChecked(),
+                cifrar=self.check_cifrar.isChecked()
+            )
             
             if exito:
                 QMessageBox.information(
@@ -219,6 +381,92 @@ protección de datos personales y secreto profesional.
             else:
                 QMessageBox.critical(self, "Error", mensaje)
     
+    def cambiar_instrumentacion(self, *args):
+        """Activa o desactiva la medición de consultas (y recuerda la elección)"""
+        if self.check_instrumentacion.isChecked():
+            db.activar_instrumentacion(self.spin_umbral.value())
+            db.guardar_configuracion(db.CLAVE_UMBRAL_LENTO, self.spin_umbral.value())
+        else:
+            db.desactivar_instrumentacion()
+            db.guardar_configuracion(db.CLAVE_UMBRAL_LENTO, None)
+    
+    def ver_estadisticas_consultas(self):
+        """Muestra los tiempos acumulados por consulta"""
+        if db.instrumentacion is None:
+            QMessageBox.information(self, "Estadísticas de Consultas",
+                                    "Active 'Medir consultas' y use la aplicación para acumular tiempos.")
+            return
+        dialogo = EstadisticasConsultasDialog(self)
+        dialogo.exec()
+    
+    def cambiar_perfil(self, *args):
+        """Activa o desactiva el perfilador de la interfaz (y recuerda la elección)"""
+        if self.check_perfil.isChecked():
+            perfilador.activar(capturar_perfil=self.check_cprofile.isChecked())
+            db.guardar_configuracion(CLAVE_PERFIL, 'cprofile' if perfilador.capturar_perfil else 'tiempos')
+        else:
+            perfilador.desactivar()
+            db.guardar_configuracion(CLAVE_PERFIL, None)
+    
+    def ver_perfil_ui(self):
+        """Muestra los tiempos de las acciones y los bloqueos recientes de la interfaz"""
+        dialogo = PerfilUIDialog(self)
+        dialogo.exec()
+    
+    def exportar_metricas(self):
+        """Guarda las métricas actuales en un archivo de texto de Prometheus"""
+        ruta, _ = QFileDialog.getSaveFileName(
+            self, "Exportar Métricas", "psicolarg_metricas.prom", "Métricas Prometheus (*.prom *.txt)"
+        )
+        if not ruta:
+            return
+        try:
+            metricas.guardar(ruta)
+            QMessageBox.information(self, "Métricas", f"Métricas guardadas en:\n{ruta}")
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"No se pudieron guardar las métricas:\n{e}")
+    
+    def comparar_compresores(self):
+        """Mide cada compresor sobre la base de datos actual (en segundo plano)"""
+        if self.worker_compresores is not None and self.worker_compresores.isRunning():
+            return
+        # Una base en memoria se vuelca acá, en el hilo de su conexión
+        self.archivo_comparacion = ExitStack()
+        try:
+            base = self.archivo_comparacion.enter_context(backup_service.archivo_actual())
+        except Exception as e:
+            self.archivo_comparacion.close()
+            self.error_comparacion(str(e))
+            return
+        
+        self.btn_benchmark.setEnabled(False)
+        self.btn_benchmark.setText("⏳ Comparando...")
+        self.worker_compresores = ComparacionCompresoresWorker(base)
+        self.worker_compresores.terminado.connect(self.mostrar_comparacion)
+        self.worker_compresores.error.connect(self.error_comparacion)
+        self.worker_compresores.finished.connect(self.fin_comparacion)
+        self.worker_compresores.start()
+    
+    def fin_comparacion(self):
+        """Rehabilita el botón al terminar la medición (y borra el volcado de la base, si hubo)"""
+        self.archivo_comparacion.close()
+        self.btn_benchmark.setEnabled(True)
+        self.btn_benchmark.setText("📊 Comparar Compresores")
+    
+    def error_comparacion(self, mensaje):
+        """Informa un error de la medición de compresores"""
+        QMessageBox.critical(self, "Error", f"No se pudieron comparar los compresores:\n{mensaje}")
+    
+    def mostrar_comparacion(self, resultados):
+        """Muestra el resultado de la medición de compresores"""
+        lineas = [
+            f"{r['codec']} (nivel {r['nivel']}): ratio {r['ratio']:.2f}x, "
+            f"{r['compresion_mb_s']:.1f} MB/s comprimiendo, "
+            f"{r['descompresion_mb_s']:.1f} MB/s descomprimiendo"
+            for r in resultados
+        ]
+        QMessageBox.information(self, "Comparación de Compresores", "\n".join(lineas))
+    
     def restaurar_backup(self):
         """Restaura un backup de la base de datos"""
         # Advertencia
@@ -238,18 +486,19 @@ protección de datos personales y secreto profesional.
             self,
             "Seleccionar Backup",
             str(backup_service.backup_dir),
-            "Archivos de backup (*.zip *.db)"
+            "Archivos de backup (*.zip *.pbk *.db)"
         )
         
         if archivo:
             exito, mensaje = backup_service.restaurar_backup(archivo)
             
             if exito:
+                # El backup puede no tener los índices derivados al día
+                reconstruccion_indices.iniciar()
                 QMessageBox.information(
                     self, "Éxito",
-                    f"{mensaje}\n\nLa aplicación se reiniciará."
+                    f"{mensaje}\n\nLos datos restaurados ya están disponibles."
                 )
-                # Aquí se debería reiniciar la aplicación
             else:
                 QMessageBox.critical(self, "Error", mensaje)
     
@@ -364,6 +613,14 @@ class GestionarBackupsDialog(QDialog):
         btn_abrir.clicked.connect(self.abrir_carpeta)
         buttons_layout.addWidget(btn_abrir)
         
+        btn_explorar = QPushButton("🔍 Explorar")
+        btn_explorar.clicked.connect(self.explorar_backup)
+        buttons_layout.addWidget(btn_explorar)
+        
+        btn_comparar = QPushButton("⚖️ Comparar")
+        btn_comparar.clicked.connect(self.comparar_backup)
+        buttons_layout.addWidget(btn_comparar)
+        
         btn_eliminar = QPushButton("🗑 Eliminar")
         btn_eliminar.clicked.connect(self.eliminar_backup)
         btn_eliminar.setStyleSheet("background-color: #e74c3c;")
@@ -406,6 +663,41 @@ class GestionarBackupsDialog(QDialog):
         elif os.name == 'posix':  # Linux/Mac
             subprocess.call(['xdg-open', ruta])
     
+    def explorar_backup(self):
+        """Abre el backup seleccionado en modo de solo lectura"""
+        item = self.lista_backups.currentItem()
+        if not item or not item.data(Qt.ItemDataRole.UserRole):
+            QMessageBox.warning(self, "Advertencia", "Seleccione un backup")
+            return
+        
+        exito, mensaje, gestor = backup_service.abrir_backup(item.data(Qt.ItemDataRole.UserRole))
+        if not exito:
+            QMessageBox.critical(self, "Error", mensaje)
+            return
+        
+        try:
+            dialogo = ExplorarBackupDialog(self, gestor, item.data(Qt.ItemDataRole.UserRole))
+            dialogo.exec()
+        finally:
+            gestor.disconnect()
+    
+    def comparar_backup(self):
+        """Compara el backup seleccionado con la base de datos actual"""
+        item = self.lista_backups.currentItem()
+        if not item or not item.data(Qt.ItemDataRole.UserRole):
+            QMessageBox.warning(self, "Advertencia", "Seleccione un backup")
+            return
+        
+        exito, mensaje, resultado = diff_service.comparar(item.data(Qt.ItemDataRole.UserRole))
+        if exito:
+            QMessageBox.information(
+                self, "Cambios desde el backup",
+                f"Cambios de la base actual respecto del backup:\n\n"
+                f"{diff_service.resumen_texto(resultado)}"
+            )
+        else:
+            QMessageBox.critical(self, "Error", mensaje)
+    
     def eliminar_backup(self):
         """Elimina el backup seleccionado"""
         item = self.lista_backups.currentItem()
@@ -428,3 +720,267 @@ class GestionarBackupsDialog(QDialog):
                 self.cargar_backups()
             else:
                 QMessageBox.critical(self, "Error", mensaje)
+
+
+class EstadisticasConsultasDialog(QDialog):
+    """Diálogo con los tiempos de cada consulta (agrupadas por sentencia normalizada)"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Estadísticas de Consultas")
+        self.setMinimumSize(900, 600)
+        self.init_ui()
+    
+    def init_ui(self):
+        """Inicializa la interfaz"""
+        layout = QVBoxLayout(self)
+        
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        
+        self.lista_consultas = QListWidget()
+        self.lista_consultas.currentItemChanged.connect(self.mostrar_consulta)
+        splitter.addWidget(self.lista_consultas)
+        
+        self.txt_detalle = QTextEdit()
+        self.txt_detalle.setReadOnly(True)
+        self.txt_detalle.setFont(QFont("Monospace", 10))
+        splitter.addWidget(self.txt_detalle)
+        
+        splitter.setSizes([450, 450])
+        layout.addWidget(splitter)
+        
+        buttons_layout = QHBoxLayout()
+        
+        btn_actualizar = QPushButton("🔄 Actualizar")
+        btn_actualizar.clicked.connect(self.cargar_consultas)
+        buttons_layout.addWidget(btn_actualizar)
+        
+        btn_reiniciar = QPushButton("🧹 Reiniciar")
+        btn_reiniciar.clicked.connect(self.reiniciar)
+        buttons_layout.addWidget(btn_reiniciar)
+        
+        buttons_layout.addStretch()
+        
+        btn_cerrar = QPushButton("Cerrar")
+        btn_cerrar.clicked.connect(self.accept)
+        buttons_layout.addWidget(btn_cerrar)
+        
+        layout.addLayout(buttons_layout)
+        
+        self.cargar_consultas()
+    
+    def cargar_consultas(self):
+        """Carga las consultas medidas, de mayor a menor tiempo total"""
+        self.lista_consultas.clear()
+        if db.instrumentacion is None:
+            return
+        for estadistica in db.instrumentacion.estadisticas():
+            item = QListWidgetItem(
+                f"{estadistica['total_ms']:.1f} ms en {estadistica['ejecuciones']} ejecuciones\n"
+                f"{estadistica['sql'][:80]}"
+            )
+            item.setData(Qt.ItemDataRole.UserRole, estadistica)
+            self.lista_consultas.addItem(item)
+        if self.lista_consultas.count():
+            self.lista_consultas.setCurrentRow(0)
+        else:
+            self.txt_detalle.setText("Todavía no se midió ninguna consulta.")
+    
+    def mostrar_consulta(self, item, _anterior=None):
+        """Muestra los tiempos y el histograma de la consulta seleccionada"""
+        if item is None:
+            self.txt_detalle.clear()
+            return
+        e = item.data(Qt.ItemDataRole.UserRole)
+        
+        lineas = [
+            e['sql'], "",
+            f"Ejecuciones: {e['ejecuciones']}   Parámetros: {e['parametros']}   "
+            f"Filas promedio: {e['filas_promedio']:.1f}",
+            f"Total: {e['total_ms']:.2f} ms   Promedio: {e['promedio_ms']:.3f} ms",
+            f"p50: ≤{e['p50_ms']:.3f} ms   p95: ≤{e['p95_ms']:.3f} ms   Máximo: {e['maximo_ms']:.3f} ms",
+            "", "Histograma:"
+        ]
+        mayor = max(cantidad for _, cantidad in e['histograma']) or 1
+        for limite, cantidad in e['histograma']:
+            etiqueta = f"≤ {limite:g} ms" if limite != float('inf') else "> 1000 ms"
+            lineas.append(f"{etiqueta:>11} {'█' * round(30 * cantidad / mayor):<30} {cantidad}")
+        self.txt_detalle.setPlainText("\n".join(lineas))
+    
+    def reiniciar(self):
+        """Descarta los tiempos acumulados"""
+        if db.instrumentacion is not None:
+            db.instrumentacion.reiniciar()
+        self.cargar_consultas()
+
+
+class PerfilUIDialog(QDialog):
+    """Diálogo con los tiempos de las acciones de las vistas y los bloqueos recientes"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Perfil de la Interfaz")
+        self.setMinimumSize(900, 600)
+        self.init_ui()
+    
+    def init_ui(self):
+        """Inicializa la interfaz"""
+        layout = QVBoxLayout(self)
+        
+        self.txt_perfil = QTextEdit()
+        self.txt_perfil.setReadOnly(True)
+        self.txt_perfil.setFont(QFont("Monospace", 10))
+        layout.addWidget(self.txt_perfil)
+        
+        buttons_layout = QHBoxLayout()
+        
+        btn_actualizar = QPushButton("🔄 Actualizar")
+        btn_actualizar.clicked.connect(self.cargar_perfil)
+        buttons_layout.addWidget(btn_actualizar)
+        
+        btn_reiniciar = QPushButton("🧹 Reiniciar")
+        btn_reiniciar.clicked.connect(self.reiniciar)
+        buttons_layout.addWidget(btn_reiniciar)
+        
+        buttons_layout.addStretch()
+        
+        btn_cerrar = QPushButton("Cerrar")
+        btn_cerrar.clicked.connect(self.accept)
+        buttons_layout.addWidget(btn_cerrar)
+        
+        layout.addLayout(buttons_layout)
+        
+        self.cargar_perfil()
+    
+    def cargar_perfil(self):
+        """Muestra las acciones de mayor a menor tiempo total y los últimos bloqueos"""
+        acciones = perfilador.estadisticas()
+        if not acciones and not perfilador.bloqueos:
+            estado = "" if perfilador.activo else "Active 'Perfilar la interfaz' y "
+            self.txt_perfil.setPlainText(f"{estado}use la aplicación para acumular tiempos.")
+            return
+        
+        lineas = [f"{'Total ms':>10} {'Veces':>6} {'Prom. ms':>9} {'Máx. ms':>9}  Acción"]
+        for a in acciones:
+            lineas.append(f"{a['total_ms']:10.1f} {a['ejecuciones']:6} {a['promedio_ms']:9.1f} "
+                          f"{a['maximo_ms']:9.1f}  {a['accion']}")
+        
+        lineas += ["", f"Bloqueos recientes (más de {perfilador.umbral_ms:g} ms): {len(perfilador.bloqueos)}"]
+        for bloqueo in reversed(perfilador.bloqueos):
+            lineas += ["", f"{bloqueo['fecha']}  {bloqueo['ms']:.0f} ms  en {bloqueo['accion'] or '(fuera de una acción)'}"]
+            if bloqueo['sql']:
+                lineas.append(f"  Última consulta: {bloqueo['sql'][:150]}")
+            for marco in bloqueo['pila'] or []:
+                lineas += ["  " + linea for linea in marco.rstrip().splitlines()]
+        
+        lineas += ["", f"Informe: {perfilador.ruta_informe or '(sin activar)'}"]
+        self.txt_perfil.setPlainText("\n".join(lineas))
+    
+    def reiniciar(self):
+        """Descarta los tiempos y bloqueos acumulados"""
+        perfilador.reiniciar()
+        self.cargar_perfil()
+
+
+class ExplorarBackupDialog(QDialog):
+    """Diálogo de solo lectura para consultar el contenido de un backup"""
+    
+    def __init__(self, parent=None, gestor=None, ruta=""):
+        super().__init__(parent)
+        self.gestor = gestor
+        self.setWindowTitle(f"Explorar Backup - {ruta}")
+        self.setMinimumSize(900, 600)
+        self.init_ui()
+    
+    def init_ui(self):
+        """Inicializa la interfaz"""
+        layout = QVBoxLayout(self)
+        
+        aviso = QLabel("🔒 Modo de solo lectura: la base de datos actual no se modifica")
+        aviso.setStyleSheet("color: #7f8c8d; padding: 5px;")
+        layout.addWidget(aviso)
+        
+        # Selector de paciente y búsqueda
+        filtros_layout = QHBoxLayout()
+        
+        self.combo_pacientes = QComboBox()
+        self.combo_pacientes.setMinimumWidth(300)
+        self.combo_pacientes.currentIndexChanged.connect(self.cargar_sesiones)
+        filtros_layout.addWidget(QLabel("Paciente:"))
+        filtros_layout.addWidget(self.combo_pacientes)
+        
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("🔍 Buscar en sesiones...")
+        self.search_input.textChanged.connect(self.cargar_sesiones)
+        filtros_layout.addWidget(self.search_input)
+        
+        layout.addLayout(filtros_layout)
+        
+        # Lista de sesiones | detalle
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        
+        self.lista_sesiones = QListWidget()
+        self.lista_sesiones.currentItemChanged.connect(self.mostrar_sesion)
+        splitter.addWidget(self.lista_sesiones)
+        
+        self.txt_detalle = QTextEdit()
+        self.txt_detalle.setReadOnly(True)
+        splitter.addWidget(self.txt_detalle)
+        
+        splitter.setSizes([300, 600])
+        layout.addWidget(splitter)
+        
+        btn_cerrar = QPushButton("Cerrar")
+        btn_cerrar.clicked.connect(self.accept)
+        layout.addWidget(btn_cerrar, alignment=Qt.AlignmentFlag.AlignRight)
+        
+        self.cargar_pacientes()
+    
+    def cargar_pacientes(self):
+        """Carga los pacientes guardados en el backup"""
+        self.combo_pacientes.clear()
+        self.combo_pacientes.addItem("-- Seleccione un paciente --", None)
+        
+        with db.usar_temporalmente(self.gestor):
+            pacientes = PacienteController.obtener_todos_pacientes()
+        
+        for paciente in pacientes:
+            self.combo_pacientes.addItem(
+                f"{paciente.apellido}, {paciente.nombre} ({paciente.estado})",
+                paciente.id
+            )
+    
+    def cargar_sesiones(self, *args):
+        """Carga (o busca) las sesiones del paciente seleccionado en el backup"""
+        self.lista_sesiones.clear()
+        self.txt_detalle.clear()
+        
+        paciente_id = self.combo_pacientes.currentData()
+        if not paciente_id:
+            return
+        
+        termino = self.search_input.text().strip()
+        with db.usar_temporalmente(self.gestor):
+            if termino:
+                sesiones = SesionController.buscar_en_sesiones(paciente_id, termino)
+            else:
+                sesiones = SesionController.obtener_sesiones_paciente(paciente_id)
+        
+        for sesion in sesiones:
+            item = QListWidgetItem(f"📅 {sesion.fecha}\n{(sesion.notas or '')[:50]}...")
+            item.setData(Qt.ItemDataRole.UserRole, sesion)
+            self.lista_sesiones.addItem(item)
+    
+    def mostrar_sesion(self, item, _anterior=None):
+        """Muestra el detalle de la sesión seleccionada"""
+        if not item:
+            return
+        
+        sesion = item.data(Qt.ItemDataRole.UserRole)
+        self.txt_detalle.setPlainText(
+            f"Fecha: {sesion.fecha}\n\n"
+            f"Objetivos:\n{sesion.objetivos or ''}\n\n"
+            f"Notas:\n{sesion.notas or ''}\n\n"
+            f"Intervenciones:\n{sesion.intervenciones or ''}\n\n"
+            f"Observaciones:\n{sesion.observaciones or ''}"
+        )
@@ -1,17 +1,28 @@
 """
 Ventana principal de la aplicación
 """
+import importlib
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QStackedWidget, QMessageBox)
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont, QIcon
 from src.database.db_manager import db
-from src.ui.pacientes_view import PacientesView
-from src.ui.calendario_view import CalendarioView
-from src.ui.dashboard_view import DashboardView
-from src.ui.sesiones_view import SesionesView
-from src.ui.analisis_ia_view import AnalisisIAView
-from src.ui.configuracion_view import ConfiguracionView
+from src.ui.perfilador import perfilador
+from src.services.metricas import metricas
+from src.services.backup_service import backup_service
+from src.ui.reconstruccion_indices import reconstruccion_indices
+
+# Vistas en el orden de la navegación: (atributo, módulo, clase). Salvo el
+# dashboard, se importan y construyen la primera vez que se navega a ellas
+# (varias consultan la base al crearse y algunas importan numpy).
+VISTAS = (
+    ('dashboard_view', 'src.ui.dashboard_view', 'DashboardView'),
+    ('pacientes_view', 'src.ui.pacientes_view', 'PacientesView'),
+    ('calendario_view', 'src.ui.calendario_view', 'CalendarioView'),
+    ('sesiones_view', 'src.ui.sesiones_view', 'SesionesView'),
+    ('analisis_ia_view', 'src.ui.analisis_ia_view', 'AnalisisIAView'),
+    ('configuracion_view', 'src.ui.configuracion_view', 'ConfiguracionView'),
+)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -27,6 +38,12 @@ class MainWindow(QMainWindow):
                                f"No se pudo conectar a la base de datos:\n{str(e)}")
             return
         
+        perfilador.activar_desde_configuracion()
+        metricas.activar_desde_entorno()
+        
+        # Temporales con datos de pacientes que dejó una sesión que terminó mal
+        backup_service.limpiar_temporales()
+        
         # Widget central
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -44,27 +61,18 @@ class MainWindow(QMainWindow):
         self.content_area = QStackedWidget()
         main_layout.addWidget(self.content_area)
         
-        # Crear vistas
-        self.dashboard_view = DashboardView()
-        self.pacientes_view = PacientesView()
-        self.calendario_view = CalendarioView()
-        self.sesiones_view = SesionesView()
-        self.analisis_ia_view = AnalisisIAView()
-        self.configuracion_view = ConfiguracionView()
-        
-        # Agregar vistas al stack
-        self.content_area.addWidget(self.dashboard_view)
-        self.content_area.addWidget(self.pacientes_view)
-        self.content_area.addWidget(self.calendario_view)
-        self.content_area.addWidget(self.sesiones_view)
-        self.content_area.addWidget(self.analisis_ia_view)
-        self.content_area.addWidget(self.configuracion_view)
+        # Crear solo el dashboard; las demás vistas se crean al navegar a ellas
+        self.vistas = {}
         
         # Mostrar dashboard por defecto
-        self.content_area.setCurrentWidget(self.dashboard_view)
+        self.content_area.setCurrentWidget(self.obtener_vista(0))
         
         # Aplicar estilos
         self.apply_styles()
+        
+        # Índices derivados que falten: en segundo plano, ya con la ventana visible
+        reconstruccion_indices.mensaje.connect(self.statusBar().showMessage)
+        QTimer.singleShot(0, reconstruccion_indices.iniciar)
     
     def create_sidebar(self):
         """Crea el panel lateral de navegación"""
@@ -128,9 +136,30 @@ class MainWindow(QMainWindow):
         btn.clicked.connect(lambda: self.change_view(index))
         return btn
     
+    def obtener_vista(self, index):
+        """
+        Devuelve la vista de la navegación, creándola si es la primera vez
+        
+        Args:
+            index: Posición de la vista en VISTAS
+        
+        Returns:
+            El widget de la vista (ya agregado al stack)
+        """
+        vista = self.vistas.get(index)
+        if vista is None:
+            atributo, modulo, nombre_clase = VISTAS[index]
+            clase = getattr(importlib.import_module(modulo), nombre_clase)
+            # Instrumentar antes de crearla, para que las señales usen la envoltura
+            perfilador.instrumentar_clase(clase)
+            vista = self.vistas[index] = clase()
+            setattr(self, atributo, vista)
+            self.content_area.addWidget(vista)
+        return vista
+    
     def change_view(self, index):
         """Cambia la vista actual"""
-        self.content_area.setCurrentIndex(index)
+        self.content_area.setCurrentWidget(self.obtener_vista(index))
         
         # Actualizar estilos de botones activos
         buttons = [self.btn_dashboard, self.btn_pacientes, self.btn_calendario, self.btn_sesiones, 
@@ -227,5 +256,11 @@ class MainWindow(QMainWindow):
     
     def closeEvent(self, event):
         """Maneja el cierre de la aplicación"""
+        perfilador.desactivar()
+        metricas.detener()
         db.disconnect()
         event.accept()
+
+# Medir los manejadores de la ventana cuando el perfilador está activo
+# (las vistas se instrumentan al crearlas, en obtener_vista)
+perfilador.instrumentar_clase(MainWindow)
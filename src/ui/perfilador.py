@@ -0,0 +1,256 @@
+"""
+Perfilador de la interfaz
+Mide la duración de los manejadores de las vistas (opcionalmente con
+cProfile) y vigila el bucle de eventos de Qt: si queda bloqueado más del
+umbral, registra la pila del hilo principal, la acción en curso y la última
+consulta SQL. Los eventos se escriben en data/logs/perfil_ui.log (una línea
+JSON por evento, rotado al superar 5 MB).
+
+Se activa con la variable de entorno PSICOLARG_PERFIL (1, o 'cprofile' para
+capturar también el perfil de cada acción lenta) o desde Configuración.
+"""
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+from PyQt6.QtCore import QTimer
+from src.database.db_manager import db
+from src.database.instrumentacion import normalizar_sql
+
+VARIABLE_ENTORNO = 'PSICOLARG_PERFIL'
+
+# Configuración guardada: '' (desactivado), 'tiempos' o 'cprofile'
+CLAVE_PERFIL = 'perfil_ui'
+
+# Métodos de las vistas que no se miden (construcción de la interfaz)
+NO_MEDIDOS = {'__init__', 'init_ui'}
+
+
+class PerfiladorUI:
+    """
+    Mide las acciones de la interfaz y detecta bloqueos del bucle de eventos
+    
+    Los métodos de las vistas se envuelven una sola vez (instrumentar_clase,
+    antes de crearlas, para que las señales se conecten a la envoltura); la
+    envoltura solo mide mientras el perfilador está activo.
+    
+    Los bloqueos se detectan con un latido: un QTimer del hilo principal
+    anota la hora cada INTERVALO_LATIDO_MS y un hilo vigía revisa que no se
+    atrase. Si se atrasa más que el umbral, el vigía toma la pila del hilo
+    principal mientras sigue bloqueado; cuando el latido vuelve, se registra
+    el bloqueo con su duración total.
+    """
+    
+    INTERVALO_LATIDO_MS = 10
+    MAX_BYTES_INFORME = 5 * 1024 * 1024  # Al superarlo el informe se rota a .1
+    MAX_BLOQUEOS = 50  # Bloqueos recientes que se conservan en memoria
+    
+    def __init__(self):
+        self.activo = False
+        self.capturar_perfil = False
+        self.umbral_ms = 50.0
+        self.ruta_informe = None
+        self.bloqueos = deque(maxlen=self.MAX_BLOQUEOS)
+        self._acciones = {}
+        self._en_curso = []
+        self._timer = None
+        self._vigia = None
+        self._detener = threading.Event()
+        self._latido = 0.0
+        self._captura = None
+        self._hilo_principal = threading.main_thread().ident
+    
+    def instrumentar_clase(self, clase):
+        """Envuelve los métodos públicos (y los eventos de Qt redefinidos) de una clase de vista"""
+        for nombre, funcion in list(vars(clase).items()):
+            if (inspect.isfunction(funcion) and nombre not in NO_MEDIDOS
+                    and not nombre.startswith('_') and not getattr(funcion, 'perfilada', False)):
+                setattr(clase, nombre, self._envolver(f"{clase.__name__}.{nombre}", funcion))
+        return clase
+    
+    def _envolver(self, nombre, funcion):
+        """
+        Envoltura que mide una función mientras el perfilador está activo
+        
+        Las señales de Qt pasan todos sus argumentos si el slot los acepta;
+        como la envoltura acepta cualquier cantidad, se recortan a los que
+        admite la función original (por ejemplo, clicked pasa 'checked').
+        """
+        parametros = inspect.signature(funcion).parameters.values()
+        if any(p.kind == p.VAR_POSITIONAL for p in parametros):
+            maximo = None
+        else:
+            maximo = sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in parametros)
+        perfilador = self
+        
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if maximo is not None:
+                args = args[:maximo]
+            if not perfilador.activo:
+                return funcion(*args, **kwargs)
+            return perfilador._medir(nombre, funcion, args, kwargs)
+        
+        envoltura.perfilada = True
+        return envoltura
+    
+    def _medir(self, nombre, funcion, args, kwargs):
+        """Ejecuta una acción midiendo su duración (y su perfil si es la más externa)"""
+        perfil = None
+        if self.capturar_perfil and not self._en_curso:
+            perfil = cProfile.Profile()
+            perfil.enable()
+        self._en_curso.append(nombre)
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            self._en_curso.pop()
+            if perfil is not None:
+                perfil.disable()
+            
+            estadistica = self._acciones.setdefault(nombre, {'accion': nombre, 'ejecuciones': 0,
+                                                             'total_ms': 0.0, 'maximo_ms': 0.0})
+            estadistica['ejecuciones'] += 1
+            estadistica['total_ms'] += ms
+            estadistica['maximo_ms'] = max(estadistica['maximo_ms'], ms)
+            
+            if ms >= self.umbral_ms:
+                self._escribir({
+                    'tipo': 'accion',
+                    'accion': nombre,
+                    'dentro_de': self._en_curso[-1] if self._en_curso else None,
+                    'ms': round(ms, 3),
+                    'sql': self._ultima_consulta(),
+                    'perfil': self._resumir(perfil) if perfil is not None else None
+                })
+    
+    def activar(self, capturar_perfil=False, umbral_ms=50, ruta_informe=None):
+        """
+        Empieza a medir acciones y a vigilar el bucle de eventos
+        
+        Debe llamarse desde el hilo principal con la QApplication creada.
+        
+        Args:
+            capturar_perfil: Si es True, cada acción se ejecuta bajo cProfile y
+                las lentas se registran con sus funciones más costosas
+            umbral_ms: Duración a partir de la cual una acción o un bloqueo se registra
+            ruta_informe: Archivo del informe (por defecto data/logs/perfil_ui.log)
+        """
+        self.capturar_perfil = capturar_perfil
+        self.umbral_ms = umbral_ms
+        self.ruta_informe = Path(ruta_informe or db.directorio_datos / 'logs' / 'perfil_ui.log')
+        if self.activo:
+            return
+        self.activo = True
+        
+        self._latido = time.perf_counter()
+        self._captura = None
+        self._timer = QTimer()
+        self._timer.timeout.connect(self._latir)
+        self._timer.start(self.INTERVALO_LATIDO_MS)
+        
+        self._detener.clear()
+        self._vigia = threading.Thread(target=self._vigilar, name="vigia-bucle-eventos", daemon=True)
+        self._vigia.start()
+    
+    def desactivar(self):
+        """Deja de medir (conserva las estadísticas acumuladas)"""
+        if not self.activo:
+            return
+        self.activo = False
+        self._timer.stop()
+        self._timer = None
+        self._detener.set()
+        self._vigia.join()
+        self._vigia = None
+    
+    def activar_desde_configuracion(self):
+        """Activa el perfilador según la variable de entorno o, si no está, la configuración guardada"""
+        modo = os.environ.get(VARIABLE_ENTORNO)
+        if modo is None:
+            modo = db.obtener_configuracion(CLAVE_PERFIL, '')
+        modo = modo.strip().lower()
+        if modo and modo not in ('0', 'no', 'false'):
+            self.activar(capturar_perfil=modo == 'cprofile')
+    
+    def estadisticas(self) -> List[Dict]:
+        """Tiempos por acción, de mayor a menor tiempo total"""
+        return sorted((dict(e, promedio_ms=e['total_ms'] / e['ejecuciones']) for e in self._acciones.values()),
+                      key=lambda e: e['total_ms'], reverse=True)
+    
+    def reiniciar(self):
+        """Descarta las estadísticas y los bloqueos acumulados"""
+        self._acciones = {}
+        self.bloqueos.clear()
+    
+    def _latir(self):
+        """Latido del hilo principal: registra el bloqueo si el anterior se atrasó"""
+        ahora = time.perf_counter()
+        anterior, self._latido = self._latido, ahora
+        ms = (ahora - anterior) * 1000 - self.INTERVALO_LATIDO_MS
+        if ms < self.umbral_ms:
+            return
+        
+        captura, self._captura = self._captura, None
+        pila, accion, sql = (captura[1:] if captura and captura[0] == anterior
+                             else (None, None, self._ultima_consulta()))
+        bloqueo = {
+            'tipo': 'bloqueo',
+            'ms': round(ms, 3),
+            'accion': accion,
+            'sql': sql,
+            'pila': pila
+        }
+        self.bloqueos.append(dict(bloqueo, fecha=datetime.now().isoformat(timespec='seconds')))
+        self._escribir(bloqueo)
+    
+    def _vigilar(self):
+        """Hilo vigía: toma la pila del hilo principal mientras el latido está atrasado"""
+        intervalo = self.INTERVALO_LATIDO_MS / 1000
+        while not self._detener.wait(intervalo):
+            latido = self._latido
+            atraso_ms = (time.perf_counter() - latido) * 1000 - self.INTERVALO_LATIDO_MS
+            if atraso_ms < self.umbral_ms or (self._captura and self._captura[0] == latido):
+                continue
+            marco = sys._current_frames().get(self._hilo_principal)
+            pila = traceback.format_stack(marco)[-15:] if marco is not None else None
+            accion = self._en_curso[-1] if self._en_curso else None
+            self._captura = (latido, pila, accion, self._ultima_consulta())
+    
+    def _ultima_consulta(self):
+        """Última consulta ejecutada por el gestor global (normalizada, sin valores)"""
+        return normalizar_sql(db.ultima_consulta) if db.ultima_consulta else None
+    
+    def _resumir(self, perfil) -> List[str]:
+        """Las funciones con más tiempo acumulado de un perfil"""
+        salida = io.StringIO()
+        pstats.Stats(perfil, stream=salida).sort_stats('cumulative').print_stats(20)
+        return [linea for linea in salida.getvalue().splitlines() if linea.strip()]
+    
+    def _escribir(self, registro):
+        """Agrega un evento al informe"""
+        registro = {'fecha': datetime.now().isoformat(timespec='seconds'), **registro}
+        try:
+            self.ruta_informe.parent.mkdir(parents=True, exist_ok=True)
+            if self.ruta_informe.exists() and self.ruta_informe.stat().st_size > self.MAX_BYTES_INFORME:
+                self.ruta_informe.replace(self.ruta_informe.with_name(self.ruta_informe.name + '.1'))
+            with open(self.ruta_informe, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"No se pudo escribir el informe de perfil: {e}", file=sys.stderr)
+
+# Instancia global del perfilador
+perfilador = PerfiladorUI()
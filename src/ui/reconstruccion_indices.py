@@ -0,0 +1,145 @@
+"""
+Reconstrucción de índices derivados en segundo plano
+Las estadísticas del corpus (TF-IDF) y el índice de similitud se
+reconstruyen la primera vez, al cambiar su versión o al restaurar un backup.
+Con miles de sesiones eso tarda segundos, así que se calcula en el
+QThreadPool; mientras tanto las palabras clave se ordenan por frecuencia y
+la búsqueda de sesiones similares avisa que el índice se está actualizando.
+
+Como en AnalisisLocalWorker, las consultas y la escritura se hacen en el
+hilo principal (la conexión SQLite pertenece a ese hilo) y solo el cálculo
+corre en el pool. La lectura se hace por bloques, uno por vuelta del bucle
+de eventos, para no congelar la interfaz con cientos de miles de sesiones.
+"""
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from src.database.db_manager import db
+
+
+class SeñalesReconstruccion(QObject):
+    """Señales de ReconstruccionWorker (un QRunnable no puede emitir señales)"""
+    
+    progreso = pyqtSignal(int, int)
+    terminado = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+
+class ReconstruccionWorker(QRunnable):
+    """Tarea del QThreadPool que calcula un índice con el calcular de su controlador"""
+    
+    def __init__(self, calcular, datos):
+        """
+        Args:
+            calcular: Función (datos, al_avanzar) -> resultado, sin acceso a la base
+            datos: Lo leído de la base en el hilo principal
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+        self.señales = SeñalesReconstruccion()
+        self.calcular = calcular
+        self.datos = datos
+    
+    def run(self):
+        try:
+            resultado = self.calcular(self.datos, al_avanzar=self.señales.progreso.emit)
+            self.señales.terminado.emit(resultado)
+        except Exception as e:
+            self.señales.error.emit(str(e))
+
+
+class ReconstruccionIndices(QObject):
+    """
+    Lanza las reconstrucciones pendientes y guarda sus resultados
+    
+    La ventana principal llama a iniciar al arrancar, y la configuración
+    después de restaurar un backup; los avisos de progreso salen por la
+    señal mensaje (texto vacío al terminar todas).
+    """
+    
+    mensaje = pyqtSignal(str)
+    
+    # Sesiones leídas por vuelta del bucle de eventos
+    TAMAÑO_BLOQUE = 5000
+    
+    def __init__(self):
+        super().__init__()
+        # nombre -> (worker, o None mientras se lee; conexión de la que se lee)
+        self.trabajos = {}
+    
+    @property
+    def en_curso(self) -> bool:
+        return bool(self.trabajos)
+    
+    def indices(self):
+        """
+        Índices a mantener
+        
+        Returns:
+            Lista de (nombre, controlador, función que lee sus datos, descripción);
+            la función recibe (despues_de_id, limite) y devuelve un bloque de
+            tuplas que empiezan con el ID, en orden de ID
+        """
+        from src.controllers.corpus_controller import CorpusController
+        from src.controllers.similitud_controller import SimilitudController
+        return [
+            ('corpus', CorpusController, CorpusController.leer_textos, "las palabras clave"),
+            ('similitud', SimilitudController, SimilitudController.leer_sesiones, "las sesiones similares"),
+        ]
+    
+    def iniciar(self):
+        """Lanza la reconstrucción de cada índice que la necesite y no esté en curso"""
+        if not db.conectado:
+            return
+        for nombre, controlador, leer, descripcion in self.indices():
+            if nombre in self.trabajos or not controlador.necesita_reconstruccion():
+                continue
+            
+            self.trabajos[nombre] = (None, db.connection)
+            self.mensaje.emit(f"Indexando sesiones para {descripcion}...")
+            self.leer_bloque(nombre, controlador, leer, descripcion, [])
+    
+    def leer_bloque(self, nombre: str, controlador, leer, descripcion: str, datos: list):
+        """Lee el siguiente bloque de un índice y, al terminar, lanza su cálculo"""
+        _, conexion = self.trabajos[nombre]
+        if db.connection is not conexion:
+            # Se restauró un backup mientras tanto: empezar de nuevo
+            del self.trabajos[nombre]
+            self.iniciar()
+            if not self.trabajos:
+                self.mensaje.emit("")
+            return
+        
+        bloque = leer(datos[-1][0] if datos else 0, self.TAMAÑO_BLOQUE)
+        datos.extend(bloque)
+        if len(bloque) == self.TAMAÑO_BLOQUE:
+            QTimer.singleShot(0, lambda: self.leer_bloque(nombre, controlador, leer, descripcion, datos))
+            return
+        
+        trabajo = ReconstruccionWorker(controlador.calcular, datos)
+        trabajo.señales.progreso.connect(
+            lambda procesadas, total:
+                self.mensaje.emit(f"Indexando sesiones para {descripcion}: {procesadas} de {total}")
+        )
+        trabajo.señales.terminado.connect(lambda resultado: self.guardar(nombre, controlador, resultado))
+        trabajo.señales.error.connect(lambda mensaje: self.error(nombre, mensaje))
+        self.trabajos[nombre] = (trabajo, conexion)
+        QThreadPool.globalInstance().start(trabajo)
+    
+    def guardar(self, nombre: str, controlador, resultado):
+        """Guarda un índice calculado (en el hilo principal)"""
+        _, conexion = self.trabajos.pop(nombre)
+        if db.connection is conexion:
+            controlador.guardar_reconstruccion(*resultado)
+        # Si se restauró un backup mientras tanto lo leído ya no vale: iniciar
+        # vuelve a lanzarla
+        self.iniciar()
+        if not self.trabajos:
+            self.mensaje.emit("")
+    
+    def error(self, nombre: str, mensaje: str):
+        self.trabajos.pop(nombre)
+        print(f"Error al reconstruir el índice {nombre}: {mensaje}")
+        if not self.trabajos:
+            self.mensaje.emit("")
+
+# Instancia global de la reconstrucción de índices
+reconstruccion_indices = ReconstruccionIndices()
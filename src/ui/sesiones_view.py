@@ -10,13 +10,17 @@ from PyQt6.QtGui import QFont
 from src.controllers.sesion_controller import SesionController
 from src.controllers.paciente_controller import PacienteController
 from src.models.sesion import Sesion
+from src.controllers.analisis_controller import AnalisisController
 from src.services.ia_analysis_service import ia_service
+from src.ui.analisis_ia_view import AnalisisLLMWorker
 
 class SesionesView(QWidget):
     def __init__(self):
         super().__init__()
         self.paciente_actual = None
         self.sesion_actual = None
+        self.worker = None
+        self.analisis_pendiente = None  # (sesion, hash_contenido) en análisis con el LLM
         self.init_ui()
     
     def init_ui(self):
@@ -166,6 +170,18 @@ class SesionesView(QWidget):
         self.btn_analizar.setEnabled(False)
         buttons_layout.addWidget(self.btn_analizar)
         
+        # Botón cancelar (solo visible durante el análisis con el LLM)
+        self.btn_cancelar_ia = QPushButton("⏹ Cancelar")
+        self.btn_cancelar_ia.clicked.connect(self.cancelar_analisis)
+        self.btn_cancelar_ia.setStyleSheet("background-color: #e74c3c;")
+        self.btn_cancelar_ia.setVisible(False)
+        buttons_layout.addWidget(self.btn_cancelar_ia)
+        
+        self.btn_similares = QPushButton("🔎 Similares")
+        self.btn_similares.clicked.connect(self.mostrar_similares)
+        self.btn_similares.setEnabled(False)
+        buttons_layout.addWidget(self.btn_similares)
+        
         layout_der.addLayout(buttons_layout)
         
         splitter.addWidget(panel_der)
@@ -234,7 +250,8 @@ class SesionesView(QWidget):
             self.mostrar_detalles_sesion()
             self.btn_editar.setEnabled(True)
             self.btn_eliminar.setEnabled(True)
-            self.btn_analizar.setEnabled(True)
+            self.btn_analizar.setEnabled(self.worker is None or not self.worker.isRunning())
+            self.btn_similares.setEnabled(True)
     
     def mostrar_detalles_sesion(self):
         """Muestra los detalles de la sesión actual"""
@@ -336,13 +353,68 @@ class SesionesView(QWidget):
         if not self.sesion_actual:
             return
         
-        # Preparar texto de la sesión
-        texto_sesion = f"{self.sesion_actual.objetivos} {self.sesion_actual.notas} {self.sesion_actual.intervenciones} {self.sesion_actual.observaciones}"
+        # Los clics repetidos se suman al análisis en curso
+        if self.worker is not None and self.worker.isRunning():
+            return
         
-        # Realizar análisis
-        analisis = ia_service.analizar_sesion(texto_sesion)
+        # Sin el LLM el análisis es local y rápido; con el LLM solo se
+        # reutiliza aquí el guardado, la consulta va en un hilo aparte
+        if not ia_service.available:
+            self.mostrar_analisis(self.sesion_actual, AnalisisController.analizar_sesion(self.sesion_actual))
+            return
         
-        # Mostrar resultados en un diálogo
+        texto = self.sesion_actual.texto_analisis
+        hash_contenido = AnalisisController.hash_contenido(texto)
+        analisis = AnalisisController.obtener_analisis_guardado(self.sesion_actual.id, hash_contenido)
+        if analisis is not None:
+            self.mostrar_analisis(self.sesion_actual, analisis)
+            return
+        
+        self.iniciar_analisis_llm(self.sesion_actual, texto, hash_contenido)
+    
+    def iniciar_analisis_llm(self, sesion, texto, hash_contenido):
+        """Lanza el análisis de la sesión con el LLM en un hilo aparte"""
+        self.analisis_pendiente = (sesion, hash_contenido)
+        self.btn_analizar.setEnabled(False)
+        self.btn_analizar.setText("⏳ Analizando...")
+        self.btn_cancelar_ia.setVisible(True)
+        self.btn_cancelar_ia.setEnabled(True)
+        
+        self.worker = AnalisisLLMWorker(ia_service.cliente_llm, [(sesion.id, texto)])
+        self.worker.resultado_sesion.connect(self.recibir_analisis)
+        self.worker.finished.connect(self.finalizar_analisis_llm)
+        self.worker.start()
+    
+    def recibir_analisis(self, sesion_id: int, analisis: dict):
+        """Guarda el análisis recibido y lo muestra si la sesión sigue seleccionada"""
+        if self.analisis_pendiente is None or self.analisis_pendiente[0].id != sesion_id:
+            return
+        sesion, hash_contenido = self.analisis_pendiente
+        self.analisis_pendiente = None
+        AnalisisController.guardar_analisis(sesion, hash_contenido, analisis)
+        if self.sesion_actual and self.sesion_actual.id == sesion_id:
+            self.mostrar_analisis(sesion, analisis)
+    
+    def cancelar_analisis(self):
+        """Cancela el análisis con el LLM en curso"""
+        if self.worker is not None and self.worker.isRunning():
+            self.btn_cancelar_ia.setEnabled(False)
+            self.worker.cancelar()
+    
+    def finalizar_analisis_llm(self):
+        """Se ejecuta cuando termina (o se cancela) el análisis en segundo plano"""
+        self.btn_cancelar_ia.setVisible(False)
+        self.btn_analizar.setText("🤖 Analizar con IA")
+        self.btn_analizar.setEnabled(self.sesion_actual is not None and self.btn_editar.isEnabled())
+        
+        if self.analisis_pendiente is not None:
+            # Cancelado o con errores
+            self.analisis_pendiente = None
+            QMessageBox.warning(self, "Análisis incompleto",
+                              "La sesión quedó sin analizar.")
+    
+    def mostrar_analisis(self, sesion, analisis: dict):
+        """Muestra el análisis de una sesión en un diálogo"""
         dialogo = QMessageBox(self)
         dialogo.setWindowTitle("Análisis con IA")
         dialogo.setIcon(QMessageBox.Icon.Information)
@@ -350,7 +422,7 @@ class SesionesView(QWidget):
         resultado = f"""
 🤖 ANÁLISIS DE SESIÓN
 
-📅 Fecha: {self.sesion_actual.fecha}
+📅 Fecha: {sesion.fecha}
 
 😊 Sentimiento: {analisis.get('sentimiento', 'N/A').upper()}
 
@@ -370,6 +442,32 @@ class SesionesView(QWidget):
         dialogo.setStyleSheet("QLabel { min-width: 400px; }")
         dialogo.exec()
     
+    def mostrar_similares(self):
+        """Muestra las sesiones de contenido más parecido a la actual"""
+        if not self.sesion_actual:
+            return
+        
+        similares = SesionController.buscar_sesiones_similares(self.sesion_actual, k=5)
+        
+        dialogo = QMessageBox(self)
+        dialogo.setWindowTitle("Sesiones similares")
+        dialogo.setIcon(QMessageBox.Icon.Information)
+        
+        if similares is None:
+            resultado = "El índice de sesiones se está actualizando. Intente de nuevo en unos segundos."
+        elif not similares:
+            resultado = "No hay otras sesiones para comparar."
+        else:
+            resultado = f"🔎 SESIONES PARECIDAS A LA DEL {self.sesion_actual.fecha}\n"
+            for sesion, similitud in similares:
+                paciente = PacienteController.obtener_paciente(sesion.paciente_id)
+                nombre = f"{paciente.apellido}, {paciente.nombre}" if paciente else "Paciente eliminado"
+                resultado += f"\n{similitud:.0%} - 📅 {sesion.fecha} - {nombre}\n  {(sesion.notas or '')[:80]}...\n"
+        
+        dialogo.setText(resultado)
+        dialogo.setStyleSheet("QLabel { min-width: 400px; }")
+        dialogo.exec()
+    
     def showEvent(self, event):
         """Se ejecuta cuando la vista se muestra"""
         super().showEvent(event)
@@ -0,0 +1,88 @@
+"""
+Tiempos de arranque
+Registra cuánto tarda la aplicación en mostrar el login y, después de
+autenticarse, en mostrar el dashboard. Se importa primero en main.py (solo
+usa la biblioteca estándar) para que el cero sea el inicio del programa.
+
+Cada arranque se agrega como una línea JSON a data/logs/arranque.log.
+"""
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+
+# Etapas en orden; las demoras del informe se calculan entre ellas
+ETAPAS = ('importaciones', 'login', 'autenticado', 'ventana', 'dashboard')
+
+
+class TiemposArranque:
+    """
+    Marcas de tiempo de las etapas del arranque, en ms desde el inicio
+    
+    Las demoras que informa excluyen el tiempo que el usuario tarda en
+    escribir la contraseña: el dashboard se mide desde que se autenticó.
+    """
+    
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.marcas = {}
+    
+    def marcar(self, etapa: str):
+        """Registra el momento de una etapa (solo la primera vez)"""
+        self.marcas.setdefault(etapa, (time.perf_counter() - self.inicio) * 1000)
+    
+    def resumen(self) -> Dict[str, float]:
+        """
+        Demoras del arranque en ms
+        
+        Returns:
+            Dict con hasta_login_ms (inicio -> login visible), hasta_dashboard_ms
+            (autenticado -> dashboard visible), ventana_ms (construcción de la
+            ventana principal) y cada marca con su nombre
+        """
+        m = self.marcas
+        resumen = {etapa: round(m[etapa], 1) for etapa in ETAPAS if etapa in m}
+        if 'login' in m:
+            resumen['hasta_login_ms'] = round(m['login'], 1)
+        if 'autenticado' in m and 'dashboard' in m:
+            resumen['hasta_dashboard_ms'] = round(m['dashboard'] - m['autenticado'], 1)
+        if 'autenticado' in m and 'ventana' in m:
+            resumen['ventana_ms'] = round(m['ventana'] - m['autenticado'], 1)
+        return resumen
+    
+    def informe(self) -> str:
+        """Una línea legible con las demoras principales"""
+        resumen = self.resumen()
+        partes = [f"login en {resumen['hasta_login_ms']:.0f} ms" if 'hasta_login_ms' in resumen else None,
+                  f"dashboard en {resumen['hasta_dashboard_ms']:.0f} ms" if 'hasta_dashboard_ms' in resumen else None]
+        return "Arranque: " + ", ".join(p for p in partes if p)
+    
+    def finalizar(self, ruta_informe):
+        """
+        Escribe el informe (consola y archivo) y publica las demoras como métricas
+        
+        Args:
+            ruta_informe: Archivo al que se agrega la línea JSON del arranque
+        """
+        resumen = self.resumen()
+        print(self.informe())
+        
+        from src.services.metricas import metricas
+        medidor = metricas.medidor('psicolarg_arranque_ms', "Demoras del último arranque (ms)", ('etapa',))
+        for clave in ('hasta_login_ms', 'hasta_dashboard_ms', 'ventana_ms'):
+            if clave in resumen:
+                medidor.fijar(resumen[clave], etapa=clave[:-3])
+        
+        ruta_informe = Path(ruta_informe)
+        try:
+            ruta_informe.parent.mkdir(parents=True, exist_ok=True)
+            with open(ruta_informe, 'a', encoding='utf-8') as f:
+                registro = {'fecha': datetime.now().isoformat(timespec='seconds'), **resumen}
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"No se pudo escribir el informe de arranque: {e}", file=sys.stderr)
+
+# Instancia global de los tiempos de arranque
+tiempos_arranque = TiemposArranque()